@@ -13,12 +13,61 @@ In addition, you should have the following subfolders
     Sounds        (sound effects for the game)
     Images        (image files to use in the game)
 
-Moving any of these folders or files will prevent the game from working properly"""
-from kivy.app import App
-from kivy.config import Config
-import controller
+Moving any of these folders or files will prevent the game from working properly
+
+Run with --trace (or with the environment variable BREAKOUT_TRACE set) to
+print how long each step of start up took, once the first frame is drawn.
+
+Run with --record FILE to record the seed and every touch to FILE; the
+game can then be replayed without a window with replay.py.
+
+Run with --balls N to allow up to N balls in play, with a power up that
+splits the balls.
+
+Run with --autopilot to let the game play itself (attract mode); F6 turns
+the autopilot on and off while playing.
+
+Run with --stress to allow walls of up to STRESS_COLUMNS x STRESS_ROWS
+bricks.  The board is then made big enough for the wall, and the view zooms
+out and scrolls to show it."""
+import startup
 import sys
 
+# The trace must be on before the imports below to time them
+if '--trace' in sys.argv:
+    sys.argv.remove('--trace')
+    startup.enable()
+
+# Largest wall allowed by fix_bricks, without and with --stress
+MAX_BRICKS = 24
+STRESS_COLUMNS = 200
+STRESS_ROWS = 100
+
+with startup.phase('import kivy'):
+    from kivy.app import App
+    from kivy.config import Config
+with startup.phase('import controller'):
+    import controller
+
+if '--stress' in sys.argv:
+    sys.argv.remove('--stress')
+    controller.STRESS = True
+
+# File to record the game to (see module replay), or None
+RECORD = None
+if '--record' in sys.argv[:-1]:
+    RECORD = sys.argv.pop(sys.argv.index('--record')+1)
+    sys.argv.remove('--record')
+
+if '--autopilot' in sys.argv:
+    sys.argv.remove('--autopilot')
+    controller.AUTOPILOT = True
+
+if '--balls' in sys.argv[:-1]:
+    controller.MAX_BALLS = max(1,int(sys.argv.pop(sys.argv.index('--balls')+1)))
+    controller.STRESS_BALLS = max(controller.STRESS_BALLS,controller.MAX_BALLS)
+    sys.argv.remove('--balls')
+
 
 class BreakoutApp(App):
     """Application class for Breakout.
@@ -31,9 +80,14 @@ class BreakoutApp(App):
         """Creates the new Window and instantiates the game controller."""""
         Config.set('graphics', 'width', str(controller.GAME_WIDTH))
         Config.set('graphics', 'height', str(controller.GAME_HEIGHT))
-        self._controller = controller.Breakout()
+        with startup.phase('build'):
+            self._controller = controller.Breakout(record=RECORD)
         return self._controller.view
 
+    def on_stop(self):
+        """Finishes the recording, if there is one, when the window closes."""
+        self._controller.close()
+
 
 def fix_bricks(args):
     """Changes constants BRICKS_IN_ROW, BRICK_ROWS, and BRICK_WIDTH to match command line arguments
@@ -47,17 +101,22 @@ def fix_bricks(args):
     Convert the third element to an int and store it in BRICK_ROWS.
     Recompute BRICK_WIDTH using the formula given in its declaration in module controller.
 
+    Sizes past MAX_BRICKS are ignored, unless controller.STRESS is True; the
+    limits are then STRESS_COLUMNS and STRESS_ROWS.
+
     To reset the above three 'constants', note that you can treat global variables in a module
     just like they were fields.  Simply use the command
 
         controller.BRICKS_IN_ROW = new_value
 
     Precondition: args is a list of strings."""
+    (columns, rows) = (STRESS_COLUMNS,STRESS_ROWS) if controller.STRESS else (MAX_BRICKS,MAX_BRICKS)
     try:
-        if int(args[1])<25:
+        if int(args[1])<=columns:
             controller.BRICKS_IN_ROW = int(args[1])
-            controller.BRICK_WIDTH = float(controller.GAME_WIDTH)/ int(args[1]) - controller.BRICK_SEP_H
-        if int(args[2])<25:
+            width = controller.boardSize(int(args[1]),1)[0] if controller.STRESS else controller.GAME_WIDTH
+            controller.BRICK_WIDTH = float(width)/ int(args[1]) - controller.BRICK_SEP_H
+        if int(args[2])<=rows:
             controller.BRICK_ROWS = int(args[2])
         else:
             pass
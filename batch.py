@@ -0,0 +1,264 @@
+# batch.py
+# Many games of Breakout at once, using NumPy
+
+"""Batch simulation module for Breakout
+
+This module steps many independent games of Breakout in lockstep.  Instead
+of one Simulation object per game, the state of every game is held in NumPy
+arrays: one entry per game for the ball, paddle, score, turns and state, and
+a boolean array of shape (n, rows, columns) for the bricks still standing.
+Each call to step advances every game by one physics tick with a handful of
+array operations, so the cost per game is tiny.
+
+The rules are those of module simulation with swept=False: the ball jumps a
+whole tick at a time, bounces off the paddle, bricks and walls the same way,
+scores brick.y-300 per brick and loses a turn when it falls off the bottom.
+There are no power ups.  A game that is waiting for its next ball is served
+on the following tick, as if the player clicked straight away.  The random
+numbers come from NumPy, so a batch does not reproduce a Simulation with the
+same seed, only the same rules.
+
+This module needs NumPy; the rest of the game does not."""
+import numpy
+
+from simulation import *
+
+
+class BatchSimulation(object):
+    """Instance is a batch of n games of Breakout, stepped together.
+
+    The fields are NumPy arrays with one entry per game (the first axis).
+    They can be read freely, but should only be changed through the methods."""
+    # FIELDS.
+
+    # Current play state of each game
+    # Invariant: int8 array of shape (n,), each one of STATE_PAUSED,
+    # STATE_ACTIVE or STATE_COMPLETE
+    state = None
+
+    # Bricks still standing
+    # Invariant: bool array of shape (n, rows, columns)
+    alive = None
+
+    # Ball position (bottom left corner) and velocity in pixels per tick
+    # Invariant: float arrays of shape (n,); meaningless when the game is
+    # not STATE_ACTIVE
+    ballx = None
+    bally = None
+    ballvx = None
+    ballvy = None
+
+    # Left edge of each paddle
+    # Invariant: float array of shape (n,), between 0 and GAME_WIDTH-paddlewidth
+    paddlex = None
+
+    # Score of each game
+    # Invariant: float array of shape (n,)
+    score = None
+
+    # Number of turns left in each game
+    # Invariant: int array of shape (n,), between 0 and turns
+    turnsLeft = None
+
+    # Number of ticks each game has been played (not counting finished ticks)
+    # Invariant: int array of shape (n,)
+    frames = None
+
+    def __init__(self,n,columns=None,rows=None,paddlewidth=None,balldiameter=None,
+                 turns=None,seed=None):
+        """Constructor: creates n new games, each waiting for its first ball
+
+        Every argument other than n is optional; if it is None, the module
+        constant of the same meaning is used instead.
+
+        Precondition: n, columns, rows and turns are positive ints;
+        paddlewidth and balldiameter are positive numbers; seed is None or
+        an int"""
+        self.n = n
+        self.columns = BRICKS_IN_ROW if columns is None else columns
+        self.rows = BRICK_ROWS if rows is None else rows
+        self.paddlewidth = float(PADDLE_WIDTH if paddlewidth is None else paddlewidth)
+        self.balldiameter = float(BALL_DIAMETER if balldiameter is None else balldiameter)
+        self.turns = NUMBER_TURNS if turns is None else turns
+        self.brickwidth = float(GAME_WIDTH)/self.columns-BRICK_SEP_H
+        self.rng = numpy.random.RandomState(seed)
+
+        # Brick geometry, computed exactly as in Simulation.newGame
+        self._brickx = BRICK_SEP_H/2.0+numpy.arange(self.columns)*(self.brickwidth+float(BRICK_SEP_H))
+        self._bricky = GAME_HEIGHT-(BRICK_Y_OFFSET+(BRICK_SEP_V+BRICK_HEIGHT)*(numpy.arange(self.rows)+1.0))
+        self._pitchx = self.brickwidth+float(BRICK_SEP_H)
+        self._pitchy = float(BRICK_SEP_V+BRICK_HEIGHT)
+        self._servey = GAME_HEIGHT-(BRICK_Y_OFFSET+(BRICK_SEP_V+BRICK_HEIGHT)*self.rows)-35
+
+        self.state = numpy.zeros(n,numpy.int8)
+        self.alive = numpy.zeros((n,self.rows,self.columns),bool)
+        self.ballx = numpy.zeros(n)
+        self.bally = numpy.zeros(n)
+        self.ballvx = numpy.zeros(n)
+        self.ballvy = numpy.zeros(n)
+        self.paddlex = numpy.zeros(n)
+        self.score = numpy.zeros(n)
+        self.turnsLeft = numpy.zeros(n,int)
+        self.frames = numpy.zeros(n,int)
+        self.reset()
+
+    @property
+    def done(self):
+        """Bool array of shape (n,), True for each game that is over. Read only"""
+        return self.state == STATE_COMPLETE
+
+    @property
+    def bricksLeft(self):
+        """Int array of shape (n,) with the number of bricks standing. Read only"""
+        return self.alive.sum(axis=(1,2))
+
+    @property
+    def won(self):
+        """Bool array of shape (n,), True for each game won. Read only"""
+        return self.done & (self.bricksLeft == 0)
+
+    def reset(self,mask=None):
+        """Starts new games: full wall, paddle at the left, waiting to serve
+
+        Precondition: mask is None (reset every game) or a bool array of
+        shape (n,) selecting the games to reset"""
+        if mask is None:
+            mask = numpy.ones(self.n,bool)
+        self.state[mask] = STATE_PAUSED
+        self.alive[mask] = True
+        self.paddlex[mask] = 0.0
+        self.score[mask] = 0.0
+        self.turnsLeft[mask] = self.turns
+        self.frames[mask] = 0
+
+    def step(self,paddlex=None):
+        """Animate a single physics tick in every game that is not over.
+
+        Moves each paddle to paddlex (kept inside the game display), serves
+        a ball in each game waiting for one, and then moves every ball,
+        bouncing it and removing bricks as in Simulation.update.
+
+        Returns a float array of shape (n,) with the score gained this tick
+
+        Precondition: paddlex is None (paddles stay put) or a number or
+        float array of shape (n,) giving the new left edge of each paddle"""
+        live = self.state != STATE_COMPLETE
+        if paddlex is not None:
+            moved = numpy.clip(paddlex,0.0,GAME_WIDTH-self.paddlewidth)
+            self.paddlex = numpy.where(live,moved,self.paddlex)
+        self._serve(self.state == STATE_PAUSED)
+
+        active = self.state == STATE_ACTIVE
+        self.frames += active
+        before = self.score.copy()
+        self._collide(active)
+        self._move(active)
+        return self.score-before
+
+    def _serve(self,mask):
+        """Puts a new ball in play in each game selected by mask"""
+        count = int(mask.sum())
+        if count:
+            self.ballx[mask] = 0.0
+            self.bally[mask] = self._servey
+            self.ballvx[mask] = self.rng.uniform(1.0,5.0,count)
+            self.ballvy[mask] = -5.0
+            self.state[mask] = STATE_ACTIVE
+
+    def _paddleHas(self,x,y):
+        """Returns: bool array, True where the point (x,y) is on the paddle"""
+        return ((self.paddlex <= x) & (x <= self.paddlex+self.paddlewidth) &
+                (PADDLE_OFFSET <= y) & (y <= PADDLE_OFFSET+PADDLE_HEIGHT))
+
+    def _brickAt(self,x,y):
+        """Returns: (row, col, hit) arrays for the brick under the point (x,y)
+
+        hit is True where the point is on a brick that is still standing;
+        row and col are only meaningful there."""
+        col = numpy.floor((x-BRICK_SEP_H/2.0)/self._pitchx).astype(int)
+        row = numpy.ceil((GAME_HEIGHT-BRICK_Y_OFFSET-y)/self._pitchy).astype(int)-1
+        inside = (col >= 0) & (col < self.columns) & (row >= 0) & (row < self.rows)
+        col = numpy.clip(col,0,self.columns-1)
+        row = numpy.clip(row,0,self.rows-1)
+        bx = self._brickx[col]
+        by = self._bricky[row]
+        hit = (inside & (bx <= x) & (x <= bx+self.brickwidth) &
+               (by <= y) & (y <= by+BRICK_HEIGHT))
+        hit &= self.alive[numpy.arange(self.n),row,col]
+        return (row,col,hit)
+
+    def _collide(self,active):
+        """Bounces the balls off the paddles and bricks, as in _getCollidingObject"""
+        d = self.balldiameter
+        x = self.ballx
+        y = self.bally
+
+        # Paddle, right corner first
+        right = active & self._paddleHas(x+d,y)
+        side = right & self._paddleHas(x+d,y+5)
+        self._speedUp(right & ~side)
+        left = active & ~right & self._paddleHas(x,y)
+        lside = left & self._paddleHas(x,y+5)
+        self.ballvy[left & ~lside] *= -1
+        self.ballvx[side | lside] *= -1
+
+        # Bricks; the first one in column order wins
+        search = active & ~right & ~left
+        nobrick = self.rows*self.columns
+        best = numpy.full(self.n,nobrick)
+        for (px,py) in ((x,y),(x,y+d),(x+d,y+d),(x+d,y)):
+            row, col, hit = self._brickAt(px,py)
+            key = numpy.where(hit & search,col*self.rows+row,nobrick)
+            best = numpy.minimum(best,key)
+        found = best < nobrick
+        if not found.any():
+            return
+        games = numpy.nonzero(found)[0]
+        col = best[games]//self.rows
+        row = best[games]%self.rows
+        bx = self._brickx[col]
+        by = self._bricky[row]
+        gx = x[games]
+        gy = y[games]
+
+        def on(px,py):
+            return ((bx <= px) & (px <= bx+self.brickwidth) &
+                    (by <= py) & (py <= by+BRICK_HEIGHT))
+
+        flipy = on(gx+5,gy) | on(gx+5,gy+d)
+        flipx = ~flipy & (on(gx,gy+5) | on(gx+d,gy+5))
+        self.ballvy[games[flipy]] *= -1
+        self.ballvx[games[flipx]] *= -1
+
+        self.alive[games,row,col] = False
+        self.score[games] += by-300
+        cleared = games[~self.alive[games].any(axis=(1,2))]
+        self.state[cleared] = STATE_COMPLETE
+
+    def _speedUp(self,mask):
+        """Bounces the selected balls off the top of the paddle, as in Simulation._speedUp"""
+        vy = -self.ballvy[mask]
+        vy = numpy.where(vy > 0,vy+vy/10.0,vy-vy/10.0)
+        vx = self.ballvx[mask]+self.ballvx[mask]/10.0
+        scale = numpy.minimum(1.0,MAX_BALL_SPEED/numpy.hypot(vx,vy))
+        self.ballvx[mask] = vx*scale
+        self.ballvy[mask] = vy*scale
+
+    def _move(self,active):
+        """Moves the balls, bounces them off the walls and checks for losses"""
+        d = self.balldiameter
+        self.ballx[active] += self.ballvx[active]
+        self.bally[active] += self.ballvy[active]
+        x = self.ballx
+        y = self.bally
+
+        leftwall = active & (x < 0.1) & (self.ballvx < 0.0)
+        rightwall = active & ~leftwall & (x+d > GAME_WIDTH-0.1)
+        self.ballvx[leftwall | rightwall] *= -1
+        ceiling = active & (y+d > GAME_HEIGHT-0.1)
+        self.ballvy[ceiling] *= -1
+
+        lost = active & ~ceiling & (y < 5.0)
+        self.turnsLeft[lost] -= 1
+        self.state[lost & (self.turnsLeft > 0)] = STATE_PAUSED
+        self.state[lost & (self.turnsLeft == 0)] = STATE_COMPLETE
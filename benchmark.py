@@ -0,0 +1,351 @@
+"""Frame cost benchmark for Breakout
+
+This module plays scripted, seeded sessions of the real game (the Breakout
+controller, its widgets and Kivy's drawing) in a hidden window, one board
+size at a time, and records what each frame cost:
+
+    python benchmark.py results.json --sizes 5x10,24x24,96x24 --seeds 0,1
+
+Each scenario (a board size and a seed) is played in its own process for a
+fixed number of frames.  The scripted player serves every ball, moves the
+paddle as simulation.autopilot would and starts a new game whenever one
+ends, so a scenario always plays the same way.  Every rendered frame runs
+exactly one physics tick, and the frame rate is not capped, so frame times
+measure the work done rather than the time waited.
+
+For every scenario the results file records
+
+    frame_ms        percentiles of the time between frames, in milliseconds
+    phases_ms       percentiles of each phase timed by the controller (see
+                    GameController.PHASES and Breakout.PHASES)
+    stress          whether the wall was played in stress mode (see STRESS_SIZE)
+    widgets         the most and the last number of widgets in the view
+    allocations     net allocations of garbage collected objects per frame,
+                    and the growth in live objects over the session
+    cache           texture cache misses and widget pool misses during play
+
+With --baseline, the results are compared against an earlier results file,
+and any scenario whose median or 99th percentile frame time got worse by
+more than --tolerance is reported; the exit status is then 1."""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# Board sizes (columns, rows) played by default.  The board is set directly
+# in module controller, so sizes past the limit of __main__.fix_bricks work.
+SIZES = [(5,10),(10,10),(24,24),(48,24),(96,24)]
+
+# Most bricks per row or column played on the normal board, as in
+# __main__.MAX_BRICKS.  Bigger walls are played in stress mode, as with
+# __main__.py --stress: the board is sized with boardSize and the view
+# zooms out, so the bricks are not squeezed onto the normal board.
+STRESS_SIZE = 24
+
+# Frames played per scenario, after loading is done
+FRAMES = 1800
+
+# Percentiles recorded for every time
+PERCENTILES = (50,90,99)
+
+# Net allocations after which the garbage is collected between frames
+GC_EVERY = 10000
+
+# Largest slowdown (as a fraction) of a frame time percentile that is not
+# reported as a regression
+TOLERANCE = 0.1
+
+
+def percentiles(values):
+    """Returns: dictionary of PERCENTILES (as 'p50' and so on) and the maximum of values
+
+    Uses the nearest rank.  All values are 0.0 if values is empty.
+
+    Precondition: values is a list of numbers"""
+    ordered = sorted(values)
+    result = {}
+    for p in PERCENTILES:
+        rank = int(round(p/100.0*len(ordered)+0.5))-1
+        result['p'+str(p)] = ordered[min(max(rank,0),len(ordered)-1)] if ordered else 0.0
+    result['max'] = ordered[-1] if ordered else 0.0
+    return result
+
+
+def count_widgets(widget):
+    """Returns: the number of widgets below widget (not counting widget itself)
+
+    Precondition: widget is a Kivy widget"""
+    return sum(1+count_widgets(child) for child in widget.children)
+
+
+class _Touch(object):
+    """A scripted touch, with the only attribute the controller reads"""
+
+    def __init__(self,x):
+        self.x = x
+        self.y = 0
+
+
+class Session(object):
+    """Instance plays one scripted scenario with a Breakout controller.
+
+    It takes over the frames of the controller: once the controller has
+    started and loaded its assets, every Kivy frame runs the scripted input
+    and then one frame (one physics tick) of the controller, and the costs
+    of that frame are recorded."""
+
+    def __init__(self,game,frames,filename):
+        """Constructor: a session for the controller game, writing to filename
+
+        Precondition: game is a Breakout that has not started; frames is an
+        int > 0; filename is a string"""
+        self.game = game
+        self.frames = frames
+        self.filename = filename
+        self._played = 0
+        self._last = None
+        self._holding = False
+        self._frameTimes = []
+        self._phases = dict((p,[]) for p in game.PHASES)
+        self._allocations = []
+        self._before = 0
+        self._collections = 0
+        self._widgets = 0
+        self._liveStart = 0
+        self._missesStart = 0
+
+    def tick(self,dt):
+        """Plays one frame of the session.  Called by the Kivy clock every frame."""
+        game = self.game
+        if game._sim is None or game._loader is None or not game._loader.done:
+            return True
+        if self._last is None:
+            self._start()
+        else:
+            now = game.timer.clock()
+            self._frameTimes.append((now-self._last)*1000)
+            if self._played > 1:
+                # The first row stored still has frames from before the session
+                row = game.timer.frame(len(game.timer)-1)
+                for (phase,seconds) in zip(game.timer.phases,row):
+                    self._phases[phase].append(seconds*1000)
+            self._allocations.append(gc.get_count()[0]-self._before)
+            if self._played == self.frames:
+                self._finish()
+                return False
+            if gc.get_count()[0] > GC_EVERY:
+                gc.collect()
+                self._collections += 1
+
+        self._before = gc.get_count()[0]
+        self._last = game.timer.clock()
+        self._play()
+        game._frame(game.timestep)
+        self._widgets = max(self._widgets,count_widgets(game.view))
+        self._played += 1
+        return True
+
+    def _start(self):
+        """Takes over the frames of the controller and starts measuring"""
+        from kivy.clock import Clock
+        Clock.unschedule(self.game._frame)
+        gc.collect()
+        gc.disable()
+        self._liveStart = len(gc.get_objects())
+        self._missesStart = self._misses()
+
+    def _misses(self):
+        """Returns: texture cache misses plus widget pool misses so far"""
+        import graphics
+        game = self.game
+        pools = (game._ballPool,game._powerPool,game._messagePool,
+                 game._powerMesPool,game._imagePool)
+        return graphics.textures.misses+sum(p.misses for p in pools)
+
+    def _play(self):
+        """Sends the scripted input for this frame to the controller"""
+        import simulation
+        game = self.game
+        sim = game._sim
+        view = game.view
+        # Touches are on the screen, which is zoomed out in stress mode
+        screenX = game._camera.screenX
+        if sim.state in (simulation.STATE_INACTIVE,simulation.STATE_COMPLETE):
+            game._touch_down(view,_Touch(screenX(0)))
+            game._touch_up(view,_Touch(screenX(0)))
+            self._holding = False
+        elif sim.state == simulation.STATE_PAUSED or not self._holding:
+            # Press on the paddle itself, so the paddle is where the finger is
+            game._touch_down(view,_Touch(screenX(sim.paddle.x)))
+            self._holding = True
+        elif sim.ball != None:
+            game._touch_move(view,_Touch(screenX(simulation.autopilotX(sim))))
+
+    def _finish(self):
+        """Writes the results to the file and stops the application"""
+        from kivy.app import App
+        gc.enable()
+        game = self.game
+        allocations = self._allocations
+        import controller
+        result = {'columns': game._sim.columns, 'rows': game._sim.rows,
+                  'stress': controller.STRESS,
+                  'frames': len(self._frameTimes),
+                  'frame_ms': percentiles(self._frameTimes),
+                  'phases_ms': dict((p,percentiles(t)) for (p,t) in self._phases.items()),
+                  'widgets': {'max': self._widgets, 'last': count_widgets(game.view)},
+                  'allocations': {'per_frame': percentiles(allocations),
+                                  'mean': float(sum(allocations))/max(len(allocations),1),
+                                  'live_growth': len(gc.get_objects())-self._liveStart,
+                                  'collections': self._collections},
+                  'cache': {'misses': self._misses()-self._missesStart}}
+        with open(self.filename,'w') as f:
+            json.dump(result,f)
+        App.get_running_app().stop()
+
+
+def play(columns,rows,seed,frames,filename):
+    """Plays one scenario in this process, writing its results to filename
+
+    This starts (and stops) a Kivy application, so it can only be done once
+    per process; `run` calls it in a new process for every scenario.
+
+    Precondition: columns, rows and frames are ints > 0; seed is an int;
+    filename is a string"""
+    os.environ['BREAKOUT_AUDIO'] = 'null'
+    os.environ['KIVY_NO_ARGS'] = '1'
+    from kivy.config import Config
+    import simulation
+    Config.set('graphics','window_state','hidden')
+    Config.set('graphics','maxfps','0')
+    Config.set('graphics','width',str(simulation.GAME_WIDTH))
+    Config.set('graphics','height',str(simulation.GAME_HEIGHT))
+    from kivy.app import App
+    from kivy.clock import Clock
+    import controller
+    controller.BRICKS_IN_ROW = columns
+    controller.BRICK_ROWS = rows
+    controller.STRESS = columns > STRESS_SIZE or rows > STRESS_SIZE
+
+    class BenchmarkApp(App):
+        """Application that plays the session in a hidden window"""
+
+        def build(self):
+            game = controller.Breakout(seed=seed)
+            self.session = Session(game,frames,filename)
+            Clock.schedule_interval(self.session.tick,0)
+            return game.view
+
+    BenchmarkApp().run()
+
+
+def scenario_name(columns,rows,seed):
+    """Returns: the key of a scenario in the results file"""
+    return '%dx%d/%d' % (columns,rows,seed)
+
+
+def run(sizes,seeds,frames=FRAMES):
+    """Returns: dictionary of results, playing every size with every seed
+
+    Each scenario is played in its own process.  Progress is printed as
+    each one finishes.
+
+    Precondition: sizes is a list of (columns, rows) pairs of ints > 0;
+    seeds is a list of ints; frames is an int > 0"""
+    results = {}
+    for (columns,rows) in sizes:
+        for seed in seeds:
+            handle, filename = tempfile.mkstemp(suffix='.json')
+            os.close(handle)
+            try:
+                status = subprocess.call([sys.executable,os.path.abspath(__file__),'--play',
+                                          '%d,%d,%d,%d' % (columns,rows,seed,frames),filename])
+                if status != 0:
+                    raise RuntimeError('scenario %s failed' % scenario_name(columns,rows,seed))
+                with open(filename) as f:
+                    result = json.load(f)
+            finally:
+                os.remove(filename)
+            results[scenario_name(columns,rows,seed)] = result
+            print('%-12s frame ms p50 %6.2f  p99 %6.2f  widgets %d' %
+                  (scenario_name(columns,rows,seed),result['frame_ms']['p50'],
+                   result['frame_ms']['p99'],result['widgets']['max']))
+    return results
+
+
+def compare(results,baseline,tolerance=TOLERANCE):
+    """Returns: list of (scenario, percentile, old, new) for every regression
+
+    A regression is a median or 99th percentile frame time that is more than
+    tolerance (as a fraction) slower than in baseline.  Scenarios that are
+    not in both are skipped.
+
+    Precondition: results and baseline are dictionaries as made by `run`;
+    tolerance is a non-negative number"""
+    worse = []
+    for name in sorted(results):
+        if not name in baseline:
+            continue
+        for key in ('p50','p99'):
+            old = baseline[name]['frame_ms'][key]
+            new = results[name]['frame_ms'][key]
+            if new > old*(1+tolerance):
+                worse.append((name,key,old,new))
+    return worse
+
+
+def _sizes(text):
+    """Returns: list of (columns, rows) pairs in a string 'CxR,CxR,...'"""
+    return [tuple(int(n) for n in size.split('x')) for size in text.split(',')]
+
+
+def main(args):
+    """Runs the benchmark described by the command line arguments args
+
+    Returns the exit status: 1 if there were regressions, 0 otherwise.
+
+    Precondition: args is a list of strings (without the program name)"""
+    if args[:1] == ['--play']:
+        (columns, rows, seed, frames) = [int(n) for n in args[1].split(',')]
+        play(columns,rows,seed,frames,args[2])
+        return 0
+
+    parser = argparse.ArgumentParser(description='Measure the frame cost of Breakout.')
+    parser.add_argument('output',help='JSON file to write the results to')
+    parser.add_argument('--sizes',default=','.join('%dx%d' % s for s in SIZES),
+                        help="board sizes as 'COLUMNSxROWS' (comma separated)")
+    parser.add_argument('--seeds',default='0',help='seeds (comma separated)')
+    parser.add_argument('--frames',type=int,default=FRAMES,help='frames per scenario')
+    parser.add_argument('--baseline',default=None,help='results file to compare against')
+    parser.add_argument('--tolerance',type=float,default=TOLERANCE,
+                        help='slowdown (as a fraction) allowed before it is a regression')
+    options = parser.parse_args(args)
+
+    results = run(_sizes(options.sizes),[int(s) for s in options.seeds.split(',')],
+                  options.frames)
+    report = {'python': platform.python_version(), 'platform': platform.platform(),
+              'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'frames': options.frames,
+              'scenarios': results}
+    with open(options.output,'w') as f:
+        json.dump(report,f,indent=2,sort_keys=True)
+
+    if options.baseline is None:
+        return 0
+    with open(options.baseline) as f:
+        baseline = json.load(f)['scenarios']
+    worse = compare(results,baseline,options.tolerance)
+    for (name,key,old,new) in worse:
+        print('slower: %-12s %s %.2f ms -> %.2f ms' % (name,key,old,new))
+    if worse == []:
+        print('no regressions against %s' % options.baseline)
+    return 1 if worse else 0
+
+
+# Application code
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
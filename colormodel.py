@@ -1,120 +1,126 @@
 """Classes for three different color models.
 
 The classes are RGB, CMYK, HSV.  The constants in this module are all
-defined in the RGB color space."""
+defined in the RGB color space.
+
+Colors are immutable and interned: asking for the same color twice gives
+back the same object, so a color can be compared, shared and assigned
+again at no cost.  The openGL form of a color (see `glColor`) is computed
+once, when the color is first made.  To change a color, make a new one.
+
+For many colors at once, the functions at the end of this module convert
+whole NumPy arrays between the three models and pack them into RGBA
+buffers for openGL.  They use the same ranges as the classes: RGB channels
+from 0 to 255, CMYK from 0 to 100, hue in degrees and saturation and value
+from 0 to 1.  Color channels are on the last axis of each array.  These
+functions need NumPy; the classes do not."""
 import colorsys
+import weakref
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 # To handle round off error
 _epsilon = 1e-13
 
 class RGB(object):
     """An instance is an RGB color value."""
-    
+    __slots__ = ('_red','_green','_blue','_alpha','_gl','__weakref__')
+
+    # The colors made so far, keyed by their channels.  Colors that are no
+    # longer used anywhere drop out automatically.
+    _interned = weakref.WeakValueDictionary()
+
     @property
     def red(self):
         """The red channel.
-        
-        **Invariant**: Value must be an int between 0 and 255, inclusive."""
+
+        **Invariant**: Value must be an int between 0 and 255, inclusive. Immutable"""
         return self._red
-       
-    @red.setter
-    def red(self, value):
-        assert (type(value) == int), "value %s is not an int" % `value`
-        assert (value >= 0 and value <= 255), "value %s is outside of range [0,255]" % `value`
-        self._red = value
-       
-    @red.deleter
-    def red(self):
-        del self._red 
-    
+
     @property
     def green(self):
         """The green channel.
-        
-        **Invariant**: Value must be an int between 0 and 255, inclusive."""
+
+        **Invariant**: Value must be an int between 0 and 255, inclusive. Immutable"""
         return self._green
-    
-    @green.setter
-    def green(self, value):
-        assert (type(value) == int), "value %s is not an int" % `value`
-        assert (value >= 0 and value <= 255), "value %s is outside of range [0,255]" % `value`
-        self._green = value
-        
-    @green.deleter
-    def green(self):
-        del self._green     
-    
+
     @property
     def blue(self):
         """The blue channel.
-        
-        **Invariant**: Value must be an int between 0 and 255, inclusive."""
+
+        **Invariant**: Value must be an int between 0 and 255, inclusive. Immutable"""
         return self._blue
-    
-    @blue.setter
-    def blue(self, value):
-        assert (type(value) == int), "value %s is not an int" % `value`
-        assert (value >= 0 and value <= 255), "value %s is outside of range [0,255]" % `value`
-        self._blue = value
-        
-    @blue.deleter
-    def blue(self):
-        del self._blue     
- 
+
     @property
     def alpha(self):
         """The alpha channel.
-        
+
         Used for transparency effects (but not in this course).
-        
-        **Invariant**: Value must be an int between 0 and 255, inclusive."""
+
+        **Invariant**: Value must be an int between 0 and 255, inclusive. Immutable"""
         return self._alpha
-        
-    @alpha.setter
-    def alpha(self, value):
-        assert (type(value) == int), "value %s is not an int" % `value`
-        assert (value >= 0 and value <= 255), "value %s is outside of range [0,255]" % `value`
-        self._alpha = value
-            
-    @alpha.deleter
-    def alpha(self):
-        del self._alpha     
 
     # METHODS
-    
+
+    def __new__(cls, r, g, b, a=255):
+        """Returns: the RGB color (r,g,b,a), reusing an existing one if possible"""
+        key = (r,g,b,a)
+        # Checked before the lookup, as 255.0 or True would find an int color
+        for value in key:
+            assert (type(value) == int), "value %s is not an int" % `value`
+            assert (value >= 0 and value <= 255), "value %s is outside of range [0,255]" % `value`
+        color = cls._interned.get(key)
+        if color is None:
+            color = object.__new__(cls)
+            object.__setattr__(color,'_red',r)
+            object.__setattr__(color,'_green',g)
+            object.__setattr__(color,'_blue',b)
+            object.__setattr__(color,'_alpha',a)
+            object.__setattr__(color,'_gl',(r/255.0, g/255.0, b/255.0, a/255.0))
+            cls._interned[key] = color
+        return color
+
     def __init__(self, r, g, b, a=255):
         """**Constructor**: creates a new RGB value (r,g,b,a).
-        
+
             :param r: initial red value
             **Precondition**: int between 0 and 255, inclusive.
-        
+
             :param g: initial green value
             **Precondition**: int between 0 and 255, inclusive.
-        
+
             :param b: initial blue value
             **Precondition**: int between 0 and 255, inclusive.
-        
+
             :param a: initial alpha value (default 255)
             **Precondition**: int between 0 and 255, inclusive.
-        
-        The alpha channel is 255 by default, unless otherwise specified."""        
-        self.red = r
-        self.green = g
-        self.blue = b
-        self.alpha = a
-            
+
+        The alpha channel is 255 by default, unless otherwise specified.
+        If this color was made before, the existing object is returned."""
+        pass
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RGB colors are immutable")
+
     def __eq__(self, other):
         """Returns: True if self and other are equivalent RGB colors. """
-        return (type(other) == RGB and self.red == other.red and 
+        return (type(other) == RGB and self.red == other.red and
                 self.green == other.green and self.blue == other.blue and
                 self.alpha == other.alpha)
 
     def __ne__(self, other):
         """Returns: True if self and other are not equivalent RGB colors. """
-        return (type(other) != RGB or self.red != other.red or 
+        return (type(other) != RGB or self.red != other.red or
                 self.green != other.green or self.blue != other.blue or
                 self.alpha != other.alpha)
 
+    def __hash__(self):
+        """Returns: hash of this color, the same for equivalent colors. """
+        return hash((self._red,self._green,self._blue,self._alpha))
+
     def __str__(self):
         """Returns: Readable string representation of this color. """
         return "("+str(self.red)+","+str(self.green)+","+str(self.blue)+","+str(self.alpha)+")"
@@ -124,134 +130,99 @@ class RGB(object):
         return "(red="+str(self.red)+",green="+str(self.green)+",blue="+str(self.blue)+",alpha="+str(self.alpha)+")"
 
     def glColor(self):
-        """**Returns**: 4 element list of the attributes in the range 0 to 1
-        
+        """**Returns**: 4 element tuple of the attributes in the range 0 to 1
+
         This is a conversion of this object into a format that can be used in
-        openGL graphics"""
-        return [self.red/255.0, self.green/255.0, self.blue/255.0, self.alpha/255.0]
+        openGL graphics.  The tuple is computed once and shared."""
+        return self._gl
 
 
 class CMYK(object):
     """An instance is a CMYK color value."""
-    
+    __slots__ = ('_cyan','_magenta','_yellow','_black','__weakref__')
+
+    # The colors made so far, keyed by their channels.
+    _interned = weakref.WeakValueDictionary()
+
     @property
     def cyan(self):
         """The cyan channel.
-        
-        **Invariant**: Value must be a float between 0.0 and 100.0, inclusive."""
+
+        **Invariant**: Value must be a float between 0.0 and 100.0, inclusive. Immutable"""
         return self._cyan
-    
-    @cyan.setter
-    def cyan(self, value):
-        assert (type(value) == int or type(value) == float), "value %s is not a number" % `value`
-        if (value > 100.0):
-            value = min(value,100.0) if value < 100.0+_epsilon else value
-        if (value < 0.0):
-            value = max(value,0.0) if value > -_epsilon else value
-        assert (value >= 0.0 and value <= 100.0), "value %s is outside of range [0.0,100.0]" % `value`
-        self._cyan = float(value)
-    
-    @cyan.deleter
-    def cyan(self):
-        del self._cyan
 
     @property
     def magenta(self):
         """The magenta channel.
-        
-        **Invariant**: Value must be a float between 0.0 and 100.0, inclusive."""
+
+        **Invariant**: Value must be a float between 0.0 and 100.0, inclusive. Immutable"""
         return self._magenta
-    
-    @magenta.setter
-    def magenta(self, value):
-        assert (type(value) == int or type(value) == float), "value %s is not a number" % `value`
-        if (value > 100.0):
-            value = min(value,100.0) if value < 100.0+_epsilon else value
-        if (value < 0.0):
-            value = max(value,0.0) if value > -_epsilon else value
-        assert (value >= 0.0 and value <= 100.0), "value %s is outside of range [0.0,100.0]" % `value`
-        self._magenta = float(value)
-        
-    @magenta.deleter
-    def magenta(self):
-        del self._magenta     
-    
+
     @property
     def yellow(self):
         """The yellow channel.
-        
-        **Invariant**: Value must be a float between 0.0 and 100.0, inclusive."""
+
+        **Invariant**: Value must be a float between 0.0 and 100.0, inclusive. Immutable"""
         return self._yellow
-    
-    @yellow.setter
-    def yellow(self, value):
-        assert (type(value) == int or type(value) == float), "value %s is not a number" % `value`
-        if (value > 100.0):
-            value = min(value,100.0) if value < 100.0+_epsilon else value
-        if (value < 0.0):
-            value = max(value,0.0) if value > -_epsilon else value
-        assert (value >= 0.0 and value <= 100.0), "value %s is outside of range [0.0,100.0]" % `value`
-        self._yellow = float(value)
-        
-    @yellow.deleter
-    def yellow(self):
-        del self._yellow     
- 
+
     @property
     def black(self):
         """The black channel.
-        
-        **Invariant**: Value must be a float between 0.0 and 100.0, inclusive."""
+
+        **Invariant**: Value must be a float between 0.0 and 100.0, inclusive. Immutable"""
         return self._black
-        
-    @black.setter
-    def black(self, value):
-        assert (type(value) == int or type(value) == float), "value %s is not a number" % `value`
-        if (value > 100.0):
-            value = min(value,100.0) if value < 100.0+_epsilon else value
-        if (value < 0.0):
-            value = max(value,0.0) if value > -_epsilon else value
-        assert (value >= 0 and value <= 255), "value %s is outside of range [0,255]" % `value`
-        self._black = float(value)
-            
-    @black.deleter
-    def black(self):
-        del self._black     
+
+    def __new__(cls, c, m, y, k):
+        """Returns: the CMYK color (c,m,y,k), reusing an existing one if possible"""
+        key = (_percent(c),_percent(m),_percent(y),_percent(k))
+        color = cls._interned.get(key)
+        if color is None:
+            color = object.__new__(cls)
+            object.__setattr__(color,'_cyan',key[0])
+            object.__setattr__(color,'_magenta',key[1])
+            object.__setattr__(color,'_yellow',key[2])
+            object.__setattr__(color,'_black',key[3])
+            cls._interned[key] = color
+        return color
 
     def __init__(self, c, m, y, k):
         """**Constructor**: creates a new CMYK color (c,m,y,k).
-        
+
             :param c: initial cyan value
             **Precondition**: float between 0.0 and 100.0, inclusive.
-        
+
             :param m: initial magenta value
             **Precondition**: float between 0.0 and 100.0, inclusive.
-        
+
             :param y: initial yellow value
             **Precondition**: float between 0.0 and 100.0, inclusive.
-        
+
             :param k: initial black value
             **Precondition**: float between 0.0 and 100.0, inclusive.
-        
-        No arguments are optional."""
-
-        self.cyan = c
-        self.magenta = m
-        self.yellow = y
-        self.black = k
-    
+
+        No arguments are optional.  If this color was made before, the
+        existing object is returned."""
+        pass
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CMYK colors are immutable")
+
     def __eq__(self, other):
         """Returns: True if self and other are equivalent CMYK colors. """
-        return (type(other) == CMYK and self.cyan == other.cyan and 
+        return (type(other) == CMYK and self.cyan == other.cyan and
                 self.magenta == other.magenta and self.yellow == other.yellow and
-                self.black == other.black)   
+                self.black == other.black)
 
     def __ne__(self, other):
         """Returns: True if self and other are not equivalent CMYK colors. """
-        return (type(other) != CMYK or self.cyan != other.cyan or 
+        return (type(other) != CMYK or self.cyan != other.cyan or
                 self.magenta != other.magenta or self.yellow != other.yellow or
                 self.black != other.black)
 
+    def __hash__(self):
+        """Returns: hash of this color, the same for equivalent colors. """
+        return hash((self._cyan,self._magenta,self._yellow,self._black))
+
     def __str__(self):
         """Returns: Readable String representation of this color. """
         return "("+str(self.cyan)+","+str(self.magenta)+","+str(self.yellow)+","+str(self.black)+")"
@@ -263,95 +234,86 @@ class CMYK(object):
 
 class HSV(object):
     """An instance is a HSV color value."""
+    __slots__ = ('_hue','_saturation','_value','_gl','__weakref__')
+
+    # The colors made so far, keyed by their channels.
+    _interned = weakref.WeakValueDictionary()
 
     @property
     def hue(self):
         """The hue channel.
-        
-        **Invariant**: Value must be a float between 0.0 and 360.0, not including 360.0."""
+
+        **Invariant**: Value must be a float between 0.0 and 360.0, not including 360.0. Immutable"""
         return self._hue
-       
-    @hue.setter
-    def hue(self, value):
-        assert (type(value) == int or type(value) == float), "value %s is not a number" % `value`
-        if (value < 0.0):
-            value = max(value,0.0) if value > -_epsilon else value
-        assert (value >= 0.0 and value < 360.0), "value %s is outside of range [0.0,360.0)" % `value`
-        self._hue = float(value)
-       
-    @hue.deleter
-    def hue(self):
-        del self._hue 
-    
+
     @property
     def saturation(self):
         """The staturation channel.
-        
-        **Invariant**: Value must be a float between 0.0 and 1.0, inclusive."""
+
+        **Invariant**: Value must be a float between 0.0 and 1.0, inclusive. Immutable"""
         return self._saturation
-    
-    @saturation.setter
-    def saturation(self, value):
-        assert (type(value) == int or type(value) == float), "value %s is not a number" % `value`
-        if (value > 1.0):
-            value = min(value,1.0) if value < 100.0+_epsilon else value
-        if (value < 0.0):
-            value = max(value,0.0) if value > -_epsilon else value
-        assert (value >= 0.0 and value <= 1.0), "value %s is outside of range [0.0,1.0]" % `value`
-        self._saturation = float(value)
-        
-    @saturation.deleter
-    def saturation(self):
-        del self._saturation     
-    
+
     @property
     def value(self):
         """The value channel.
-        
-        **Invariant**: Value must be a float between 0.0 and 1.0, inclusive."""
+
+        **Invariant**: Value must be a float between 0.0 and 1.0, inclusive. Immutable"""
         return self._value
-    
-    @value.setter
-    def value(self, val):
-        assert (type(val) == int or type(val) == float), "value %s is not a number" % `val`
-        if (val > 1.0):
-            val = min(val,1.0) if value < 100.0+_epsilon else val
-        if (val < 0.0):
-            val = max(val,0.0) if value > -_epsilon else val
-        assert (val >= 0.0 and val <= 1.0), "value %s is outside of range [0.0,1.0]" % `val`
-        self._value = float(val)
-        
-    @value.deleter
-    def value(self):
-        del self._value     
-        
+
+    def __new__(cls, h, s, v):
+        """Returns: the HSV color (h,s,v), reusing an existing one if possible"""
+        assert (type(h) == int or type(h) == float), "value %s is not a number" % `h`
+        if (h < 0.0):
+            h = max(h,0.0) if h > -_epsilon else h
+        assert (h >= 0.0 and h < 360.0), "value %s is outside of range [0.0,360.0)" % `h`
+        h = float(h)
+        s = _unit(s)
+        v = _unit(v)
+        key = (h,s,v)
+        color = cls._interned.get(key)
+        if color is None:
+            color = object.__new__(cls)
+            object.__setattr__(color,'_hue',h)
+            object.__setattr__(color,'_saturation',s)
+            object.__setattr__(color,'_value',v)
+            rgb = colorsys.hsv_to_rgb(h/360.0,s,v)
+            object.__setattr__(color,'_gl',(rgb[0], rgb[1], rgb[2], 1.0))
+            cls._interned[key] = color
+        return color
+
     def __init__(self, h, s, v):
         """**Constructor**: creates a new HSV color (h,s,v).
-            
+
             :param h: the initial hue
             **Precondition**: float between 0.0 and 360.0, not including 360.0.
-        
-            :param s: the initial saturation 
+
+            :param s: the initial saturation
             **Precondition**: float between 0.0 and 1.0, inclusive.
-        
+
             :param v: the initial value
             **Precondition**: float between 0.0 and 1.0, inclusive.
-        
-        No arguments are optional."""
-        self.hue = h
-        self.saturation = s
-        self.value = v
-    
+
+        No arguments are optional.  If this color was made before, the
+        existing object is returned."""
+        pass
+
+    def __setattr__(self, name, value):
+        raise AttributeError("HSV colors are immutable")
+
     def __eq__(self, other):
         """Returns: True if self and other are equivalent HSV colors. """
-        return (type(other) == HSV and self.hue == other.hue and 
+        return (type(other) == HSV and self.hue == other.hue and
                 self.saturation == other.saturation and self.value == other.value)
-    
+
     def __ne__(self, other):
         """Returns: True if self and other are equivalent HSV colors. """
-        return (type(other) != HSV or self.hue != other.hue or 
+        return (type(other) != HSV or self.hue != other.hue or
                 self.saturation != other.saturation or self.value != other.value)
 
+    def __hash__(self):
+        """Returns: hash of this color, the same for equivalent colors. """
+        return hash((self._hue,self._saturation,self._value))
+
     def __str__(self):
         """Returns: Readable String representation of this color. """
         return "("+str(self.hue)+","+str(self.saturation)+","+str(self.value)+")"
@@ -361,13 +323,39 @@ class HSV(object):
         return "(hue="+str(self.hue)+",saturation="+str(self.saturation)+",value="+str(self.value)+")"
 
     def glColor(self):
-        """**Returns**: 4 element list of the equivalent rgba color.
-        
+        """**Returns**: 4 element tuple of the equivalent rgba color.
+
         This method converts this object to an RGB object and then extracts
-        a 4 element list with color values between 0 and 1. This is a conversion
-        of this object into a format that can be used in openGL graphics"""
-        rgb = colorsys.hsv_to_rgb(self.hue/360.0,self.saturation,self.value)
-        return [rgb[0], rgb[1], rgb[2], 1.0]
+        a 4 element tuple with color values between 0 and 1. This is a conversion
+        of this object into a format that can be used in openGL graphics.
+        The tuple is computed once and shared."""
+        return self._gl
+
+
+def _percent(value):
+    """Returns: value as a float between 0.0 and 100.0, allowing for round off error
+
+    Precondition: value is a number between 0.0 and 100.0, inclusive"""
+    assert (type(value) == int or type(value) == float), "value %s is not a number" % `value`
+    if (value > 100.0):
+        value = min(value,100.0) if value < 100.0+_epsilon else value
+    if (value < 0.0):
+        value = max(value,0.0) if value > -_epsilon else value
+    assert (value >= 0.0 and value <= 100.0), "value %s is outside of range [0.0,100.0]" % `value`
+    return float(value)
+
+
+def _unit(value):
+    """Returns: value as a float between 0.0 and 1.0, allowing for round off error
+
+    Precondition: value is a number between 0.0 and 1.0, inclusive"""
+    assert (type(value) == int or type(value) == float), "value %s is not a number" % `value`
+    if (value > 1.0):
+        value = min(value,1.0) if value < 1.0+_epsilon else value
+    if (value < 0.0):
+        value = max(value,0.0) if value > -_epsilon else value
+    assert (value >= 0.0 and value <= 1.0), "value %s is outside of range [0.0,1.0]" % `value`
+    return float(value)
 
 
 # Color Constants
@@ -409,4 +397,168 @@ MAGENTA = RGB(255, 0, 255)
 CYAN = RGB(0, 255, 255)
 
 #: The color blue in the default RGB space.
-BLUE = RGB(0, 0, 255)
\ No newline at end of file
+BLUE = RGB(0, 0, 255)
+
+
+# Array Conversions
+
+def _array(values, channels):
+    """Returns: values as a float array with at least channels on the last axis
+
+    Precondition: values is an array-like of numbers"""
+    assert not numpy is None, 'the array functions need NumPy'
+    values = numpy.asarray(values,dtype=numpy.float64)
+    assert values.ndim >= 1 and values.shape[-1] >= channels, \
+        'last axis of %s must have at least %d channels' % (`values.shape`,channels)
+    return values
+
+
+def rgbToHsv(rgb):
+    """**Returns**: array of HSV colors with the same leading shape as rgb
+
+        :param rgb: the RGB colors; a fourth (alpha) channel is ignored
+        **Precondition**: array-like of numbers between 0 and 255, with at least
+        3 channels on the last axis
+
+    The result has 3 channels: hue in [0.0,360.0), saturation and value in
+    [0.0,1.0].  It agrees with the HSV class and `colorsys`."""
+    rgb = _array(rgb,3)[...,:3]/255.0
+    r = rgb[...,0]
+    g = rgb[...,1]
+    b = rgb[...,2]
+    high = rgb.max(axis=-1)
+    span = high-rgb.min(axis=-1)
+    safe = numpy.where(span == 0,1.0,span)
+    hue = numpy.where(high == r,(g-b)/safe,
+                      numpy.where(high == g,2.0+(b-r)/safe,4.0+(r-g)/safe))
+    hue = numpy.where(span == 0,0.0,(hue/6.0) % 1.0)*360.0
+    sat = numpy.where(high == 0,0.0,span/numpy.where(high == 0,1.0,high))
+    return numpy.stack((hue,sat,high),axis=-1)
+
+
+def hsvToRgb(hsv):
+    """**Returns**: array of RGB colors with the same leading shape as hsv
+
+        :param hsv: the HSV colors
+        **Precondition**: array-like with 3 channels on the last axis: hue in
+        degrees, saturation and value between 0.0 and 1.0
+
+    The result has 3 float channels between 0.0 and 255.0.  Round it (and
+    change the type) before using it for RGB objects."""
+    hsv = _array(hsv,3)
+    h = (hsv[...,0]/60.0) % 6.0
+    s = hsv[...,1]
+    v = hsv[...,2]
+    sector = numpy.floor(h).astype(int)
+    f = h-sector
+    p = v*(1.0-s)
+    q = v*(1.0-s*f)
+    t = v*(1.0-s*(1.0-f))
+    r = numpy.choose(sector,(v,q,p,p,t,v))
+    g = numpy.choose(sector,(t,v,v,q,p,p))
+    b = numpy.choose(sector,(p,p,t,v,v,q))
+    return numpy.stack((r,g,b),axis=-1)*255.0
+
+
+def rgbToCmyk(rgb):
+    """**Returns**: array of CMYK colors with the same leading shape as rgb
+
+        :param rgb: the RGB colors; a fourth (alpha) channel is ignored
+        **Precondition**: array-like of numbers between 0 and 255, with at least
+        3 channels on the last axis
+
+    The result has 4 channels, each between 0.0 and 100.0."""
+    rgb = _array(rgb,3)[...,:3]/255.0
+    black = 1.0-rgb.max(axis=-1)
+    white = 1.0-black
+    scale = numpy.where(white == 0,0.0,1.0/numpy.where(white == 0,1.0,white))
+    cmy = (white[...,None]-rgb)*scale[...,None]
+    return numpy.concatenate((cmy,black[...,None]),axis=-1)*100.0
+
+
+def cmykToRgb(cmyk):
+    """**Returns**: array of RGB colors with the same leading shape as cmyk
+
+        :param cmyk: the CMYK colors
+        **Precondition**: array-like of numbers between 0.0 and 100.0, with
+        4 channels on the last axis
+
+    The result has 3 float channels between 0.0 and 255.0."""
+    cmyk = _array(cmyk,4)/100.0
+    white = 1.0-cmyk[...,3:4]
+    return (1.0-cmyk[...,:3])*white*255.0
+
+
+def glArray(rgb, alpha=255):
+    """**Returns**: float32 array of RGBA colors in the range 0 to 1
+
+        :param rgb: the RGB colors, with or without an alpha channel
+        **Precondition**: array-like of numbers between 0 and 255, with 3 or 4
+        channels on the last axis
+
+        :param alpha: the alpha used when rgb has no alpha channel (default 255)
+        **Precondition**: number or array-like broadcastable to the leading
+        shape of rgb, between 0 and 255
+
+    The result has 4 channels and is C-contiguous, so it can go straight into
+    a vertex buffer.  Each row is the same as `glColor` of the matching RGB
+    object."""
+    return _pack(rgb,alpha,numpy.float32)/numpy.float32(255.0)
+
+
+def byteArray(rgb, alpha=255):
+    """**Returns**: uint8 array of RGBA colors in the range 0 to 255
+
+        :param rgb: the RGB colors, with or without an alpha channel
+        **Precondition**: array-like of numbers between 0 and 255, with 3 or 4
+        channels on the last axis
+
+        :param alpha: the alpha used when rgb has no alpha channel (default 255)
+        **Precondition**: number or array-like broadcastable to the leading
+        shape of rgb, between 0 and 255
+
+    Channels are rounded to the nearest int.  The result is C-contiguous,
+    with 4 bytes per color."""
+    return _pack(numpy.rint(_array(rgb,3)),alpha,numpy.uint8)
+
+
+def _pack(rgb, alpha, dtype):
+    """Returns: rgb with an alpha channel, as a contiguous array of type dtype"""
+    rgb = _array(rgb,3)
+    out = numpy.empty(rgb.shape[:-1]+(4,),dtype=dtype)
+    out[...,:3] = rgb[...,:3]
+    out[...,3] = rgb[...,3] if rgb.shape[-1] > 3 else numpy.rint(alpha)
+    return out
+
+
+def colorArray(colors):
+    """**Returns**: float32 array of shape (n,4) with the glColor of each color
+
+        :param colors: the colors to convert
+        **Precondition**: a sequence of RGB or HSV objects
+
+    Use this to start an array computation from existing color objects."""
+    assert not numpy is None, 'the array functions need NumPy'
+    return numpy.array([c.glColor() for c in colors],dtype=numpy.float32).reshape(-1,4)
+
+
+def gradient(start, end, n):
+    """**Returns**: float array of shape (n,4) blending from start to end
+
+        :param start: the first color
+        **Precondition**: an RGB object
+
+        :param end: the last color
+        **Precondition**: an RGB object
+
+        :param n: the number of colors
+        **Precondition**: an int > 0
+
+    The colors are evenly spaced RGBA values between 0.0 and 255.0, ready for
+    `glArray` or `byteArray`."""
+    assert not numpy is None, 'the array functions need NumPy'
+    assert type(n) == int and n > 0, `n`+' is not a positive int'
+    first = numpy.array((start.red,start.green,start.blue,start.alpha),dtype=numpy.float64)
+    last = numpy.array((end.red,end.green,end.blue,end.alpha),dtype=numpy.float64)
+    steps = numpy.linspace(0.0,1.0,n)[:,None]
+    return first+(last-first)*steps
@@ -4,7 +4,7 @@
 
 # Extensions: Score, Power Ups, and Increasing Ball Speed as game goes on
 # Increasing ball speed causes some glitches when update cannot keep up
-# Ball may go through certain bricks at high speed
+# Ball may go through certain bricks at high speed (unless SWEPT_COLLISIONS is on)
 
 """Controller module for Breakout
 This module contains a class and global constants for the game Breakout.
@@ -14,59 +14,70 @@ anything in this file. You can change any of the constants in this file
 import colormodel
 import random
 from graphics import *
+from simulation import *
+import replay
 
 # CONSTANTS
 
-# Width of the game display (all coordinates are in pixels)
-GAME_WIDTH  = 400
-# Height of the game display
-GAME_HEIGHT = 620
-
-# Width of the paddle
-PADDLE_WIDTH = 58
-# Height of the paddle
-PADDLE_HEIGHT = 11
-# Distance of the (bottom of the) paddle up from the bottom
-PADDLE_OFFSET = 30
-
-# Horizontal separation between bricks
-BRICK_SEP_H = 3
-# Vertical separation between bricks
-BRICK_SEP_V = 3
-
-# Offset of the top brick row from the top
-BRICK_Y_OFFSET = 70
-
-# Number of bricks per row
-BRICKS_IN_ROW = 5
-# Number of rows of bricks, in range 1..10.
-BRICK_ROWS = 10
-# Width of a brick
-BRICK_WIDTH = GAME_WIDTH / BRICKS_IN_ROW - BRICK_SEP_H
-# Height of a brick
-BRICK_HEIGHT = 15
-
-# Diameter of the ball in pixels
-BALL_DIAMETER = 18
-
-# Number of attempts in a game
-NUMBER_TURNS = 3
-
-# Basic game states
-# Game has not started yet
-STATE_INACTIVE = 0
-# Game is active, but waiting for next ball
-STATE_PAUSED   = 1
-# Ball is in play and being animated
-STATE_ACTIVE   = 2
-# Game is over, deactivate all actions
-STATE_COMPLETE = 3
+# The board, physics and game states are described by the constants in
+# module simulation, which are all imported here.  Changing BRICKS_IN_ROW,
+# BRICK_ROWS, PADDLE_WIDTH, BALL_DIAMETER or NUMBER_TURNS in this module
+# changes the board of the next game the controller creates.
 
 # Brick Colors
 BRICK_COLORS = [colormodel.RED, colormodel.RED, colormodel.ORANGE, colormodel.ORANGE,
                 colormodel.YELLOW, colormodel.YELLOW, colormodel.GREEN,
                 colormodel.GREEN, colormodel.CYAN, colormodel.CYAN]
 
+# Messages shown when a power up is activated
+POWER_MESSAGES = {POWER_SLOW:'ball speed decreased!!!',
+                  POWER_PADDLE:'paddle size increased!!!',
+                  POWER_KILL:'random brick kill!!!',
+                  POWER_BIG:'ball size increased!!!',
+                  POWER_SPLIT:'multi ball!!!'}
+
+# Shortest time between two redraws of the lives and score text, in seconds
+HUD_INTERVAL = 0.1
+
+# Mixer buffer size in samples; smaller plays sounds sooner after a hit
+SOUND_BUFFER = 512
+
+# Most bounce sounds heard at once; fast bursts of hits cut off the oldest
+BOUNCE_VOICES = 3
+
+# Images shown full screen, and the power up image, with the size they are shown at
+SCREEN_IMAGES = ["futurama" + str(n) + ".png" for n in range(10)] + ["winner.png", "loser.png"]
+IMAGES = ([(name,(GAME_WIDTH,GAME_HEIGHT)) for name in SCREEN_IMAGES] +
+          [('star.png',(POWER_SIZE,POWER_SIZE))])
+
+# Fonts used by the messages, with the size and weight they are shown at
+FONTS = [('ComicSans.ttf',20,True),('Arial.ttf',20,True)]
+
+# Size and position of the loading progress bar on the start screen
+PROGRESS_WIDTH = 300
+PROGRESS_HEIGHT = 8
+PROGRESS_OFFSET = 200
+
+# Whether the board is made big enough for the wall (see boardSize), for
+# walls of thousands of bricks; the view then zooms out and scrolls
+STRESS = False
+# Fraction of the way to its target the camera scrolls in one tick
+CAMERA_EASE = 0.1
+# Most balls in play at once in stress mode (MAX_BALLS otherwise)
+STRESS_BALLS = 300
+
+# Ticks of play kept for rewinding (a snapshot is taken every tick)
+REWIND_CAPACITY = 600
+# Ticks gone back by one press of REWIND_KEY (F5)
+REWIND_TICKS = 120
+REWIND_KEY = 286
+
+# Whether the autopilot plays the game (attract mode); F6 turns it on and off
+AUTOPILOT = False
+AUTOPILOT_KEY = 287
+# Ticks the autopilot waits before serving or starting a new game
+AUTOPILOT_WAIT = 60
+
 LOSE_MSG = "Well, I'll build my own breakout game!  With blackjack!  And hookers!  In fact, FORGET the breakout game."
 WIN_MSG = ""
 
@@ -84,242 +95,301 @@ class Breakout(GameController):
 
         The on_touch methods handle mouse (or finger) input.
 
+    The physics and rules of the game are in a Simulation (module
+    simulation), which knows nothing about widgets.  This controller passes
+    the touches and physics ticks on to the simulation, and then mirrors the
+    simulation into the widgets in the view and plays the sounds.
+
     The class also has fields that provide state to this controller.
     The fields can all be hidden; you do not need properties. However,
     you should clearly state the field invariants, as the various
     methods will rely on them to determine game state."""
     # FIELDS.
 
-    # Current play state of the game; needed by the on_touch methods
-    # Invariant: One of STATE_INACTIVE, STATE_PAUSED, STATE_ACTIVE, STATE_COMPLETE
-    _state  = STATE_INACTIVE
+    # The game being played.  Holds the state, score, turns and positions
+    # Invariant: A Simulation object; None before initialize is called
+    _sim = None
 
-    # List of currently active "bricks" in the game.
-    #Invariant: A list of  objects that are instances of GRectangle (or a
-    #subclass) If list is  empty, then state is STATE_INACTIVE (game over)
-    _bricks = []
+    # The widget that draws the whole wall of bricks
+    # Invariant: A BrickField, kept for the whole session, whose rectangle
+    # indices are the brick indices of _sim.bricks
+    # None before the first game starts
+    _field = None
 
     # The player paddle
     # Invariant: An object that is an instance of GRectangle (or a subclass)
     # Also can be None; if None, then state is STATE_INACTIVE (game over)
     _paddle = None
 
-    # The ball to bounce about the game board
-    # Invariant: An object that is an instance of GEllipse (or a subclass)
-    # Also can be None; if None, then state is STATE_INACTIVE (game over) or
-    # STATE_PAUSED (waiting for next ball)
-    _ball = None
+    # The balls bouncing about the game board
+    # Invariant: A dictionary from each Body in _sim.balls to the Ball widget
+    # drawing it (see _syncBalls); empty when there is no ball in play
+    _balls = None
 
     # ADD MORE FIELDS (AND THEIR INVARIANTS) AS NECESSARY
 
     # Message displayed on welcome screen.
     # Invariant: Must be GLabel object with text displaying message
     # telling user to click to start game
-    # Is None when game starts. Then stays a GLabel object that is hidden form view
+    # Is None when no message is on screen (it is then back in its pool)
     _message=None
 
-    # Position of X before touch motion
-    # Invariant: Must be float of integer
-    _initPadX=0
-
-    # Position of X before touch motion
-    # Invariant: Must be float of integer
-    _initTouchX=0
-
-    # Number of turns player has left
-    # Invariant: Must be an integer that is either 0 1 2 or 3
-    _turnsLeft = NUMBER_TURNS
-
     # Power ups in play
     # Invariant: Must be a PowerUp object (a subclass of GImage)
     # None when no powerUps are in play
     _powerUps = None
 
-    # bounceSound
-    # Invariant: must be a sound object
-    # Does not change throughout the game
-    _bounce=Sound('bounce.wav')
-
-    # power up sound
-    # Invariant: must be a sound object
+    # sound effects (the bounce and power up sounds)
+    # Invariant: must be a SoundBank object
     # Does not change throughout the game
-    _power = Sound('bonus.wav')
+    _sounds = None
 
     # power up message
     # Invariant: must be a GLabel object
     # Also can be None when no powerUps are in play
     _powerMes = None
 
-    # lives left message
-    # Invariant: must be a GLabel object
+    # lives left and score display
+    # Invariant: must be a Hud object
     # Also can be None before game is initialized
-    _lives = None
-
-    # score label for viewer
-    # Invariant: must be a GLabel object
-    # Also can be None when game has not been initialized
-    _scoreLabel = None
-
-    # score
-    # Invariant: positive integer representing the score
-    _score = 0
+    _hud = None
 
     # the image associated with the winning message
     # Invariant: GImage object containing the winning message
     # None when state is not STATE_COMPLETE
     _completeImage = None
 
-    # the object the ball bumps into
-    # Invariant: Must be a brick
-    _bump = None
+    # the background image behind the bricks
+    # Invariant: GImage object, kept for the whole session
+    # None before the first game starts
+    _background = None
+
+    # Pools of reusable widgets, so that steady play makes no new widgets
+    # Invariant: Pool objects for Ball, PowerUp, GLabel (full screen messages
+    # and power up messages) and GImage (end of game image)
+    _ballPool = None
+    _powerPool = None
+    _messagePool = None
+    _powerMesPool = None
+    _imagePool = None
+
+    # Loads the images, sounds and fonts while the start screen is up
+    # Invariant: AssetLoader object; None before initialize is called
+    _loader = None
+
+    # Seed of the random numbers of the simulation
+    # Invariant: None or an int
+    _seed = None
+
+    # Bar showing how much has been loaded
+    # Invariant: ProgressBar object; None before initialize is called
+    _progress = None
+
+    # The part of the board shown in the view
+    # Invariant: Camera object for the board of _sim; None before initialize
+    _camera = None
+
+    # Where the touches go: the simulation, or a recorder in front of it
+    # Invariant: _sim, or a replay.Recorder of _sim if the game is recorded;
+    # None before initialize is called
+    _input = None
+
+    # File to record the game to
+    # Invariant: None (not recorded) or a string
+    _record = None
+
+    # Snapshots of the last REWIND_CAPACITY ticks of the current game
+    # Invariant: Rewind object for _sim; None before initialize is called
+    _rewind = None
+
+    # Whether the autopilot is playing (see _steer)
+    # Invariant: a bool; turned off when the player touches the screen
+    _autopilot = False
+
+    # Whether the touch being handled was made by the autopilot
+    # Invariant: a bool, True only inside _steer
+    _steering = False
+
+    # Ticks the autopilot has waited for a game to be served or started
+    # Invariant: an int >= 0
+    _idle = 0
+
+    # The phases of a frame that are timed: those of every GameController,
+    # and the parts of update (moving and colliding the ball in the
+    # simulation, removing bricks, moving the widgets, redrawing the hud)
+    PHASES = GameController.PHASES+('collision','bricks','ball','hud')
+
+    def __init__(self,seed=None,record=None):
+        """Constructor: Creates a game that runs its physics at a fixed TIMESTEP
+
+        If record is given, the seed and every touch are recorded to that
+        file (see module replay), so that the session can be replayed.
+
+        Precondition: seed is None (a different game every time) or an int;
+        games with the same seed and the same input play out the same way.
+        record is None or a string"""
+        super(Breakout,self).__init__(timestep=TIMESTEP)
+        if record != None and seed is None:
+            seed = replay.newSeed()
+        self._seed = seed
+        self._record = record
+        self._autopilot = AUTOPILOT
+        self._balls = {}
+        self._ballPool = Pool(Ball)
+        self._powerPool = Pool(PowerUp)
+        self._messagePool = Pool(GLabel)
+        self._powerMesPool = Pool(GLabel)
+        self._imagePool = Pool(GImage)
+        self._sounds = SoundBank(buffer=SOUND_BUFFER)
 
     def initialize(self):
         """Initialize the game state.
 
         Initialize any state fields as necessary to statisfy invariants.
         When done, set the state to STATE_INACTIVE, and display a message
-        saying that the user should press to play a game."""
-        self._power.set_volume(0.5)
-        self._score = 0
+        saying that the user should press to play a game.
+
+        The images, sounds and fonts are loaded in the background while
+        the start screen is up, with a bar showing the progress, so that
+        none of them has to load in the middle of a game."""
+        self._sounds.set_volume('bonus.wav',0.5)
+        self._sounds.voices('bounce.wav',BOUNCE_VOICES)
+        (width, height) = boardSize(BRICKS_IN_ROW,BRICK_ROWS) if STRESS else (None,None)
+        self._sim = Simulation(columns=BRICKS_IN_ROW,rows=BRICK_ROWS,
+                               paddlewidth=PADDLE_WIDTH,balldiameter=BALL_DIAMETER,
+                               turns=NUMBER_TURNS,seed=self._seed,
+                               width=width,height=height,
+                               maxballs=STRESS_BALLS if STRESS else MAX_BALLS)
+        self._camera = Camera(self._sim.width,self._sim.height)
+        self._rewind = Rewind(self._sim,REWIND_CAPACITY)
+        self._input = self._sim
+        if self._record != None:
+            self._input = replay.Recorder(self._sim,self._record)
         self.view.add(GRectangle(size=(GAME_WIDTH,GAME_HEIGHT),x=0,y=0,
                                  fillcolor=colormodel.BLACK))
-        self._message=GLabel(text='Click to Start',linecolor=colormodel.WHITE,
-                        width=400,height=620,font_size=20,font_name='ComicSans.ttf',
-                        bold=True,halign='center',valign='middle')
+        self._message=self._newMessage('Click to Start','ComicSans.ttf')
         self.view.add(self._message)
-        Breakout._state=STATE_INACTIVE
+        self._hud = Hud(self.view)
+        self._progress = ProgressBar(self.view)
+        self._progress.show()
+        self._loader = AssetLoader(images=IMAGES,sounds=self._sounds,fonts=FONTS,
+                                   callback=self._showProgress)
+        self._loader.start()
+
+    def _showProgress(self,loader):
+        """Moves the progress bar on, and removes it once everything is loaded
+
+        Precondition: loader is the AssetLoader _loader"""
+        self._progress.update(loader.progress)
+        if loader.done:
+            self._progress.hide()
 
     def update(self, dt):
         """Animate a single frame in the game.
 
-        This is the method that does most of the work.  It moves the ball, and
-        looks for any collisions.  If there is a collision, it changes the
-        velocity of the ball and removes any bricks if necessary.
-
-        This method may need to change the state of the game.  If the ball
-        goes off the screen, change the state to either STATE_PAUSED (if the
-        player still has some tries left) or STATE_COMPLETE (the player has
-        lost the game).  If the last brick is removed, it needs to change
-        to STATE_COMPLETE (game over; the player has won).
-
-        Precondition: dt is the time since last update (a float).  This
-        parameter can be safely ignored."""
-        if self._state==STATE_ACTIVE:
-            if self._lives!=None:
-                self.view.remove(self._lives)
-            self._lives=GLabel(top = GAME_HEIGHT,size=(90,100),
-                               linecolor=colormodel.WHITE,
-                               x=0,halign='center',valign='top',font_size=20,
-                               text='Lives: '+ str(self._turnsLeft))
-            self.view.add(self._lives)
-            if self._scoreLabel!=None:
-                self.view.remove(self._scoreLabel)
-            self._scoreLabel=GLabel(top = GAME_HEIGHT,size=(90,100),x=GAME_WIDTH-90,
-                                    halign='right',valign='top',font_size=20,
-                                    text='Score: '+ str(self._score),
-                                    linecolor=colormodel.RED)
-            self.view.add(self._scoreLabel)
-            self._bump = self._ball._getCollidingObject()
-            if self._bump!=None:
-                self.updateBrick()
-            elif self._hitsPaddle():
-                self.activatePower()
-            try:
-                self._powerUps.y += self._powerUps.vy
-            except:
-                pass
-            try:
-                self.updateBall()
-            except:
-                pass
-
-    def updateBrick(self):
-        """ Helper function for update. Updates bricks and checks for wins
-
-        This function will remove bricks that have touched the ball. Also
-        checks if game is finished and randomly assigns powerups"""
-        self.view.remove(self._bump)
-        Breakout._bricks.remove(self._bump)
-        self._score += self._bump.y-300
-        if random.random()<0.25 and self._powerUps==None:
-            self._powerUps = PowerUp(self._bump.x,self._bump.y)
-            self.view.add(self._powerUps)
-        if Breakout._bricks == []:
-            self._state=STATE_COMPLETE
-            self._completeImage=GImage(size=(GAME_WIDTH,GAME_HEIGHT),x=0,y=0,
-                                 source="winner.png")
-            self._message = GLabel(text=WIN_MSG,
-                                  linecolor = colormodel.WHITE,
-                                  width=400,height=620,font_size=20,
-                                  font_name='ComicSans.ttf',
-                                  bold=True,halign='center',valign='middle')
-            self.view.add(self._completeImage)
-            self.view.add(self._message)
+        Advances the simulation by one tick.  The simulation moves the ball,
+        looks for any collisions, removes any bricks if necessary and
+        changes the state of the game.  This method then brings the view
+        up to date with the events of that tick: it removes broken bricks,
+        shows power ups and messages, and plays the sounds.
+
+        Precondition: dt is the time since last update (a float).  The game
+        runs in fixed-timestep mode, so this is always TIMESTEP and can be
+        safely ignored."""
+        if self._autopilot:
+            self._steer()
+        if self._sim.state==STATE_ACTIVE:
+            timer = self.timer
+            now = timer.clock()
+            self._rewind.push()
+            events = self._sim.update()
+            timer.add('collision',timer.clock()-now)
+            for event in events:
+                if event[0] == EVENT_BRICK:
+                    now = timer.clock()
+                    self.updateBrick(event[1])
+                    timer.add('bricks',timer.clock()-now)
+                elif event[0] == EVENT_BOUNCE:
+                    self._sounds.play('bounce.wav')
+                elif event[0] == EVENT_DROP:
+                    self._powerUps = self._powerPool.acquire(x=event[1].x,y=event[1].y)
+                    self._powerUps.size = (POWER_SIZE*self._camera.zoom,)*2
+                    self.view.add(self._powerUps)
+                elif event[0] == EVENT_POWER:
+                    self._removePowerUp()
+                    self.activatePower(event[1])
+                elif event[0] == EVENT_MISS:
+                    self._removePowerUp()
+                elif event[0] == EVENT_WIN:
+                    self._complete("winner.png",WIN_MSG,'ComicSans.ttf')
+                elif event[0] == EVENT_LOST or event[0] == EVENT_LOSE:
+                    self.loseBall()
+            now = timer.clock()
+            self._hud.update(self._sim.turnsLeft,self._sim.score,dt)
+            timer.add('hud',timer.clock()-now)
+            now = timer.clock()
+            if self._sim.ball != None:
+                self._camera.follow(self._sim.ball.y)
+            self.updateBall()
+            timer.add('ball',timer.clock()-now)
+
+    def updateBrick(self,brick):
+        """ Helper function for update. Stops drawing a broken brick
+
+        Precondition: brick is the index of a brick the simulation just removed"""
+        self._field.remove(brick)
 
     def updateBall(self):
-        """Helper function for Update. Updates ball position and checks for losses
-
-        This function updates the position of the ball, and checks to see if game
-        has been lost"""
-        self._ball.x += self._ball._vx
-        self._ball.y += self._ball._vy
-        if self._ball.x<0.1 and self._ball._vx<0.0:
-            self._ball._vx = -1 * self._ball._vx
-        elif self._ball.x+self._ball.width>GAME_WIDTH-0.1:
-            self._ball._vx = -1 * self._ball._vx
-        if self._ball.y+self._ball.height>GAME_HEIGHT-0.1:
-            self._ball._vy = -1 * self._ball._vy
-        elif self._ball.y<5.0:
-            self._paddle.size = (PADDLE_WIDTH,PADDLE_HEIGHT)
-            self.view.remove(self._ball)
-            self._turnsLeft -= 1
-            if self._turnsLeft == 0:
-                self._state=STATE_COMPLETE
-                self._message = GLabel(text=LOSE_MSG,
-                            linecolor=colormodel.WHITE, width=400,height=620,
-                            font_size=20,font_name='Arial.ttf',
-                            bold=True,halign='center',valign='middle')
-                self.view.add(self._message)
-                self._completeImage=GImage(size=(GAME_WIDTH,GAME_HEIGHT),x=0,y=0,
-                                 source="loser.png")
-                self.view.add(self._completeImage)
-            else:
-                if self._powerUps!=None:
-                    self.view.remove(self._powerUps)
-                    self._powerUps = None
-                    self.view.remove(self._powerMes)
-                    self._powerMes = None
-                self._state=STATE_PAUSED
-                self._ball=None
-
-    def activatePower(self):
-        """This is a helper function for update that activates Power Ups.
-
-        When user 'catches' a power up star, this helper function is called
-        Adds 50 to user's score. Randomly chooses and implements one of
-        four different power ups Creates a GLabel message telling user she or
-        he has activated the power up. Power ups include a longer paddle, slower
-        ball, less bricks, and larger ball"""
-        self._score += 50
-        self._power.play()
-        j=random.choice([1,2,3,4])
-        if j == 1:
-            self.displayPower('ball speed decreased!!!')
-            self._ball.vx=self._ball.vx * 0.75
-            self._ball.vy=self._ball.vy * 0.75
-        elif j == 2:
-            self.displayPower('paddle size increased!!!')
-            Breakout._paddle.width += PADDLE_WIDTH/4.0
-        elif j ==3:
-            self.displayPower('random brick kill!!!')
-            for c in Breakout._bricks:
-                if random.random()<.20:
-                    self.view.remove(c)
-                    self._bricks.remove(c)
-        elif j==4:
-            self.displayPower('ball size increased!!!')
-            self._ball.width += BALL_DIAMETER/5.0
-            self._ball.height += BALL_DIAMETER/5.0
+        """Helper function for Update. Moves the widgets to match the simulation
+
+        Updates the position and size of the balls, the paddle and the power
+        up, as seen through the camera, and moves the wall to match"""
+        sim = self._sim
+        camera = self._camera
+        zoom = camera.zoom
+        self._syncBalls()
+        for (ball, widget) in self._balls.items():
+            widget.pos = (camera.screenX(ball.x),camera.screenY(ball.y))
+            widget.size = (ball.width*zoom,ball.height*zoom)
+        if self._paddle != None and sim.paddle != None:
+            self._paddle.pos = (camera.screenX(sim.paddle.x),camera.screenY(sim.paddle.y))
+            self._paddle.size = (sim.paddle.width*zoom,sim.paddle.height*zoom)
+        if self._powerUps != None and sim.powerup != None:
+            self._powerUps.pos = (camera.screenX(sim.powerup.x),camera.screenY(sim.powerup.y))
+        if self._field != None:
+            self._field.zoom = zoom
+            self._field.scroll = (0,camera.scroll)
+
+    def loseBall(self):
+        """Helper function for update. Removes the ball after it falls off the bottom
+
+        If that was the last turn, shows the losing message.  Otherwise
+        removes any power up, waiting for the player to serve again."""
+        self._syncBalls()
+        self._hud.update(self._sim.turnsLeft,self._sim.score,0,True)
+        if self._sim.state == STATE_COMPLETE:
+            self._complete("loser.png",LOSE_MSG,'Arial.ttf')
+        else:
+            self._removePowerUp()
+            if self._powerMes!=None:
+                self.view.remove(self._powerMes)
+                self._powerMesPool.release(self._powerMes)
+                self._powerMes = None
+
+    def activatePower(self,kind):
+        """This is a helper function for update that shows an activated Power Up.
+
+        When user 'catches' a power up star, the simulation randomly chooses
+        and applies one of four (or five) different power ups.  Plays the
+        power up sound and creates a GLabel message telling user she or he has
+        activated the power up. Power ups include a longer paddle, slower
+        ball, less bricks, larger ball and, if more than one ball is allowed,
+        splitting the balls
+
+        Precondition: kind is one of POWER_SLOW, POWER_PADDLE, POWER_KILL,
+        POWER_BIG or POWER_SPLIT"""
+        self._sounds.play('bonus.wav')
+        self.displayPower(POWER_MESSAGES[kind])
 
     def displayPower(self,msg):
         '''Created a GLabel Object informing user that a PowerUp is active
@@ -327,7 +397,8 @@ class Breakout(GameController):
         Precondition: msg must be a string'''
         if self._powerMes!=None:
             self.view.remove(self._powerMes)
-        self._powerMes = GLabel(size=(GAME_WIDTH,BRICK_Y_OFFSET),
+            self._powerMesPool.release(self._powerMes)
+        self._powerMes = self._powerMesPool.acquire(size=(GAME_WIDTH,BRICK_Y_OFFSET),
                                 linecolor=colormodel.WHITE,
                                 top=GAME_HEIGHT,left=0,
                                 text=msg,halign='center',
@@ -345,66 +416,72 @@ class Breakout(GameController):
         Precondition: view is just the view attribute (unused because we have
         access to the view attribute).  touch is a MotionEvent (see
         documentation) with the touch information."""
-        if self._state==STATE_INACTIVE:
+        if not self._steering:
+            self._autopilot = False
+        state = self._sim.state
+        self._input.touch_down(self._camera.worldX(touch.x))
+        if state==STATE_INACTIVE:
             print "INACTIVE"
             self.view.remove(self._message)
-            Breakout._state=STATE_PAUSED
+            self._messagePool.release(self._message)
+            self._message = None
+            self._progress.hide()
             self.set_bricks()
             Breakout._paddle=GRectangle(fillcolor=colormodel.BLUE,
                             size=(PADDLE_WIDTH,PADDLE_HEIGHT),x=0,y=PADDLE_OFFSET)
             self.view.add(Breakout._paddle)
-            self._scoreLabel=GLabel(top = GAME_HEIGHT,size=(90,100),x=GAME_WIDTH-90,
-                                    halign='right', valign='top',font_size=20,
-                                    text='Score: '+ str(self._score),
-                                    linecolor=colormodel.RED)
-            self.view.add(self._scoreLabel)
-        elif self._state==STATE_PAUSED:
-            self.view.remove(self._message)
-            Breakout._initPadX=Breakout._paddle.x
-            Breakout._initTouchX=touch.x
-            self.delay(self._serve,0)
-            if self._ball!=None:
-                self._state=STATE_ACTIVE
-        elif self._state==STATE_ACTIVE:
+            self._hud.update(self._sim.turnsLeft,self._sim.score,0,True)
+            self._hud.show()
+        elif state==STATE_PAUSED:
+            if self._message != None:
+                self.view.remove(self._message)
+                self._messagePool.release(self._message)
+                self._message = None
+            self._serve()
+        elif state==STATE_ACTIVE:
             print "ACTIVE"
-            Breakout._initPadX=Breakout._paddle.x
-            Breakout._initTouchX=touch.x
-        elif self._state==STATE_COMPLETE:
+        elif state==STATE_COMPLETE:
             print "COMPLETE"
             self.view.remove(self._completeImage)
+            self._imagePool.release(self._completeImage)
+            self._completeImage = None
             self.view.remove(self._message)
-            self.view.remove(self._lives)
-            for p in self._bricks:
-                try:
-                    self.view.remove(p)
-                except:
-                    pass
-            self._turnsLeft=NUMBER_TURNS
-            self._state=STATE_INACTIVE
-            self._score=0
-            self.view.add(GRectangle(size=(GAME_WIDTH,GAME_HEIGHT),x=0,y=0,
-                                 fillcolor=colormodel.BLACK))
-            self._message=GLabel(text='Click to Play Again',linecolor=colormodel.WHITE,
-                        width=400,height=620,font_size=20,font_name='ComicSans.ttf',
-                        bold=True,halign='center',valign='middle')
-            Breakout._paddle=GRectangle(fillcolor=colormodel.BLUE,
-                            size=(PADDLE_WIDTH,PADDLE_HEIGHT),x=0,y=PADDLE_OFFSET)
+            self._messagePool.release(self._message)
+            self._removePowerUp()
+            if self._powerMes!=None:
+                self.view.remove(self._powerMes)
+                self._powerMesPool.release(self._powerMes)
+                self._powerMes = None
+            self._message=self._newMessage('Click to Play Again','ComicSans.ttf')
             self.set_bricks()
-            self._ball=Ball()
             self.view.add(self._message)
-            self.view.add(Breakout._paddle)
-            self.view.add(self._ball)
-            Breakout._state=STATE_PAUSED
-            self._state=STATE_PAUSED
+            self._hud.update(self._sim.turnsLeft,self._sim.score,0,True)
+            self._hud.show()
+        self.updateBall()
 
     def _serve(self):
         """Serves the Ball
 
-        Adds it to view, and changes state to limbo"""
-        if self._ball==None:
-            self._ball=Ball()
-            self.view.add(self._ball)
-        self._state=STATE_ACTIVE
+        Adds the ball widget to the view if the simulation just made a new ball"""
+        self._syncBalls()
+
+    def _syncBalls(self):
+        """Gives every ball in the simulation a widget, and takes back those of balls gone
+
+        Does nothing (but look the balls up) if no ball came or went."""
+        balls = self._sim.balls
+        widgets = self._balls
+        if len(balls) == len(widgets) and all(ball in widgets for ball in balls):
+            return
+        current = set(balls)
+        for ball in list(widgets.keys()):
+            if not ball in current:
+                self.view.remove(widgets[ball])
+                self._ballPool.release(widgets.pop(ball))
+        for ball in balls:
+            if not ball in widgets:
+                widgets[ball] = self._ballPool.acquire()
+                self.view.add(widgets[ball])
 
     def on_touch_move(self,view,touch):
         """Respond to the mouse (or finger) being moved.
@@ -417,9 +494,8 @@ class Breakout(GameController):
         Precondition: view is just the view attribute (unused because we have
         access to the view attribute).  touch is a MotionEvent (see
         documentation) with the touch information."""
-        if self._state==STATE_ACTIVE or self._state==STATE_PAUSED:
-            Breakout._paddle.x=min(max(0,touch.x+self._initPadX-self._initTouchX),
-                                   GAME_WIDTH-PADDLE_WIDTH)
+        self._input.touch_move(self._camera.worldX(touch.x))
+        self.updateBall()
 
     def on_touch_up(self,view,touch):
         """Respond to the mouse (or finger) being released.
@@ -430,77 +506,317 @@ class Breakout(GameController):
         Precondition: view is just the view attribute (unused because we have
         access to the view attribute).  touch is a MotionEvent (see
         documentation) with the touch information."""
-        if self._state==STATE_ACTIVE:
-            Breakout._paddle.x=Breakout._paddle.x
-        else:
-            pass
+        self._input.touch_up(self._camera.worldX(touch.x))
+
+    def on_key_down(self,key):
+        """Goes back REWIND_TICKS ticks on REWIND_KEY, and turns the autopilot on or off on AUTOPILOT_KEY
+
+        Precondition: key is a Kivy key code (an int)"""
+        if key == REWIND_KEY:
+            self.rewind(REWIND_TICKS)
+            return True
+        elif key == AUTOPILOT_KEY:
+            self.setAutopilot(not self._autopilot)
+            return True
+        return False
+
+    def setAutopilot(self,on):
+        """Turns the autopilot on or off
+
+        The autopilot moves the paddle to where the ball will come down (see
+        simulation.autopilotX), and serves and starts new games by itself,
+        so the game plays on its own (attract mode).  It plays through the
+        same touches as the player, so a recorded game stays replayable.
+        Touching the screen turns it off.
+
+        Precondition: on is a bool"""
+        self._autopilot = on
+        self._idle = 0
+        if on and self._sim.state == STATE_ACTIVE:
+            # Drag from where the paddle is now
+            self._input.touch_down(self._sim.paddle.x)
+
+    def _steer(self):
+        """Plays one tick for the player: moves the paddle, or serves or restarts after a wait"""
+        sim = self._sim
+        if sim.state == STATE_ACTIVE:
+            self._idle = 0
+            self._input.touch_move(autopilotX(sim))
+        elif self._loader.done:
+            self._idle += 1
+            if self._idle >= AUTOPILOT_WAIT:
+                self._idle = 0
+                x = sim.paddle.x if sim.paddle != None else 0
+                self._steering = True
+                self.on_touch_down(self.view,_Touch(self._camera.screenX(x)))
+                self._steering = False
+
+    def rewind(self,ticks):
+        """Puts the game back the given number of ticks, as far as the snapshots go
+
+        Only a game in play can be rewound, and not while it is recorded
+        (a replay could not follow it).
+
+        Precondition: ticks is an int > 0"""
+        if self._input is not self._sim or len(self._rewind) == 0:
+            return
+        if self._sim.state != STATE_ACTIVE and self._sim.state != STATE_PAUSED:
+            return
+        self._rewind.rewind(min(ticks,len(self._rewind))-1)
+        self._drawBricks()
+        self._syncBalls()
+        if self._sim.powerup != None and self._powerUps == None:
+            self._powerUps = self._powerPool.acquire(x=self._sim.powerup.x,y=self._sim.powerup.y)
+            self._powerUps.size = (POWER_SIZE*self._camera.zoom,)*2
+            self.view.add(self._powerUps)
+        elif self._sim.powerup == None:
+            self._removePowerUp()
+        self._hud.update(self._sim.turnsLeft,self._sim.score,0,True)
+        self.updateBall()
+
+    def close(self):
+        """Ends the session, finishing the recording if the game is recorded"""
+        if self._input is not self._sim:
+            self._input.close()
 
     def set_bricks(self):
         """Sets up bricks for game play
 
-        Makes a list of bricks and adds it to the field _bricks
-        Adds each brick to the game view."""
-        for c in range(BRICKS_IN_ROW):
-            for q in range(BRICK_ROWS):
-                self._bricks.append(GRectangle(y=GAME_HEIGHT-
-                    (BRICK_Y_OFFSET+(BRICK_SEP_V+BRICK_HEIGHT)*(q+1)),
-                    x=BRICK_SEP_H/2.0+c*(float(BRICK_WIDTH)+float(BRICK_SEP_H)),
-                    linecolor=BRICK_COLORS[q%10], fillcolor=BRICK_COLORS[q%10],
-                    height=BRICK_HEIGHT, width=BRICK_WIDTH))
-        self.view.add(GImage(size=(GAME_WIDTH,GAME_HEIGHT),x=0,y=0,
-            source="futurama" + str(random.randrange(10)) + ".png"))
-        for p in self._bricks:
-            self.view.add(p)
-
-    def _hitsPaddle(self):
-        """Checks to see if the user successfully catches the power up
-
-        Checks if paddle collides with both lower corners of power up image.
-        Returns Boolean value
-        Removes power up image from view and sets power up field to None"""
+        Draws each brick in the simulation in the BrickField _field, replacing
+        any bricks left from the last game, so that a brick has the same index
+        in the field as in the simulation.  Picks a new background for the game,
+        shows the top of the board, and calls off anything still delayed from
+        the last game."""
+        source = "futurama" + str(random.randrange(10)) + ".png"
+        if self._background == None:
+            self._background = GImage(size=(GAME_WIDTH,GAME_HEIGHT),x=0,y=0,source=source)
+            self.view.add(self._background)
+            self._field = BrickField(size=(GAME_WIDTH,GAME_HEIGHT),x=0,y=0)
+            self.view.add(self._field)
+        else:
+            self._background.source = source
+        self._camera.reset()
+        self._rewind.clear()
+        self.cancel_delays()
+        self._drawBricks()
+
+    def _drawBricks(self):
+        """Draws the bricks of the simulation in _field, in place of the ones there
+
+        Every brick is added, so that a brick has the same index in the
+        field as in the simulation, and then the broken ones are removed."""
+        self._field.clear()
+        bricks = self._sim.bricks
+        for i in range(len(bricks.alive)):
+            self._field.add(bricks.x[i],bricks.y[i],bricks.width,bricks.height,
+                            BRICK_COLORS[bricks.color[i] % len(BRICK_COLORS)])
+        if bricks.count < len(bricks.alive):
+            for i in range(len(bricks.alive)):
+                if not bricks.alive[i]:
+                    self._field.remove(i)
+
+    def _complete(self,source,msg,font):
+        """Shows the end of game image and message
+
+        Precondition: source is the name of an image file, msg is a string and
+        font is the name of a .ttf file"""
+        self._completeImage=self._imagePool.acquire(size=(GAME_WIDTH,GAME_HEIGHT),x=0,y=0,
+                                                    source=source)
+        self._message = self._newMessage(msg,font)
+        self.view.add(self._completeImage)
+        self.view.add(self._message)
+        self._hud.update(self._sim.turnsLeft,self._sim.score,0,True)
+        self._hud.show()
+
+    def _newMessage(self,msg,font):
+        """Returns: a full screen GLabel (from the pool) showing msg in white
+
+        Precondition: msg is a string and font is the name of a .ttf file"""
+        return self._messagePool.acquire(text=msg,linecolor=colormodel.WHITE,
+                                         width=400,height=620,font_size=20,
+                                         font_name=font,bold=True,
+                                         halign='center',valign='middle')
+
+    def _removePowerUp(self):
+        """Removes the power up image from view, if there is one"""
         if self._powerUps!=None:
-            if (self._paddle.collide_point(self._powerUps.x
-                or self._powerUps+20,self._powerUps.y)):
-                self.view.remove(self._powerUps)
-                self._powerUps = None
-                return True
-            elif self._powerUps.y<1.0:
-                self.view.remove(self._powerUps)
-                self._powerUps = None
-                return False
+            self.view.remove(self._powerUps)
+            self._powerPool.release(self._powerUps)
+            self._powerUps = None
+
+
+class Hud(object):
+    """Instance is the heads-up display showing the lives left and the score.
+
+    The two labels are made once and kept for the whole session.  Their
+    text is only redrawn when the value shown actually changes, and at most
+    once every HUD_INTERVAL seconds; a change that comes sooner is shown
+    when the interval is over.  Redrawing a label means rendering a new
+    text texture, so the number of redraws is counted in rebuilds."""
+
+    # Number of times a label text has been redrawn
+    # Invariant: non-negative int
+    rebuilds = 0
+
+    def __init__(self,view,interval=HUD_INTERVAL):
+        """Constructor: creates the (hidden) labels for the given view
+
+        Precondition: view is a GameView; interval is a non-negative number"""
+        self._view = view
+        self._interval = interval
+        self._elapsed = 0.0
+        self._shownLives = None
+        self._shownScore = None
+        self.rebuilds = 0
+        self._lives = GLabel(top = GAME_HEIGHT,size=(90,100),
+                             linecolor=colormodel.WHITE,
+                             x=0,halign='center',valign='top',font_size=20,
+                             text='Lives: ')
+        self._score = GLabel(top = GAME_HEIGHT,size=(90,100),x=GAME_WIDTH-90,
+                             halign='right',valign='top',font_size=20,
+                             text='Score: ',linecolor=colormodel.RED)
+
+    def show(self):
+        """Puts the labels on top of everything else in the view"""
+        self.hide()
+        self._view.add(self._lives)
+        self._view.add(self._score)
+
+    def hide(self):
+        """Removes the labels from the view"""
+        self._view.remove(self._lives)
+        self._view.remove(self._score)
+
+    def update(self,lives,score,dt,force=False):
+        """Shows the given lives and score, redrawing only what changed
+
+        Precondition: lives and score are numbers; dt is the time since the
+        last call in seconds; force is a bool, True to redraw right away
+        regardless of HUD_INTERVAL"""
+        self._elapsed += dt
+        if lives == self._shownLives and score == self._shownScore:
+            return
+        if not force and self._elapsed < self._interval:
+            return
+        self._elapsed = 0.0
+        if lives != self._shownLives:
+            self._lives.text = 'Lives: '+str(lives)
+            self._shownLives = lives
+            self.rebuilds += 1
+        if score != self._shownScore:
+            self._score.text = 'Score: '+str(score)
+            self._shownScore = score
+            self.rebuilds += 1
+
+
+class ProgressBar(object):
+    """Instance is the bar on the start screen showing how much has loaded.
+
+    It is a dark gray track with a white bar across it that grows from the
+    left as the fraction loaded goes from 0 to 1."""
+
+    def __init__(self,view):
+        """Constructor: creates the (hidden) bar for the given view
+
+        Precondition: view is a GameView"""
+        self._view = view
+        x = (GAME_WIDTH-PROGRESS_WIDTH)/2.0
+        self._track = GRectangle(x=x,y=PROGRESS_OFFSET,
+                                 size=(PROGRESS_WIDTH,PROGRESS_HEIGHT),
+                                 fillcolor=colormodel.DARK_GRAY)
+        self._bar = GRectangle(x=x,y=PROGRESS_OFFSET,size=(0,PROGRESS_HEIGHT),
+                               fillcolor=colormodel.WHITE)
+
+    def show(self):
+        """Puts the bar on top of everything else in the view"""
+        self.hide()
+        self._view.add(self._track)
+        self._view.add(self._bar)
+
+    def hide(self):
+        """Removes the bar from the view"""
+        self._view.remove(self._track)
+        self._view.remove(self._bar)
+
+    def update(self,fraction):
+        """Shows the given fraction as loaded
+
+        Precondition: fraction is a float between 0.0 and 1.0"""
+        self._bar.width = PROGRESS_WIDTH*fraction
+
+
+class _Touch(object):
+    """A touch made by the autopilot, with the only attribute the controller reads"""
+
+    def __init__(self,x):
+        self.x = x
+        self.y = 0
+
+
+class Camera(object):
+    """Instance is the part of the board that is shown in the view.
+
+    A board bigger than the view is zoomed out until its width fits, and if
+    it is then still too tall, the view scrolls up and down the board to
+    follow the ball.  On a board of GAME_WIDTH x GAME_HEIGHT the camera
+    changes nothing: board and view coordinates are the same."""
+    # FIELDS.
 
+    # Scale from board to view
+    # Invariant: a float > 0 and <= 1
+    zoom = 1.0
 
-class Ball(GEllipse):
-    """Instance is a game ball.
+    # Board y coordinate shown at the bottom of the view
+    # Invariant: a float between 0 and _limit
+    scroll = 0.0
 
-    We extends GEllipse because a ball does not just have a position; it
-    also has a velocity.  You should add a constructor to initialize the
-    ball, as well as one to move it.
+    # Largest scroll, where the top of the board is at the top of the view
+    # Invariant: a float >= 0
+    _limit = 0.0
 
-    Note: The ball does not have to be a GEllipse. It could be an instance
-    of GImage (why?). This change is allowed, but you must modify the class
-    header up above."""
+    def __init__(self,width,height):
+        """Constructor: a camera on a board of the given size, showing its top
 
-    # Velocity in x direction.  A number (int or float)
-    _vx = 0.0
-    # Velocity in y direction.  A number (int or float)
-    _vy = 0.0
+        Precondition: width and height are numbers, at least GAME_WIDTH and
+        GAME_HEIGHT"""
+        self.zoom = min(1.0,float(GAME_WIDTH)/width)
+        self._limit = max(0.0,height-GAME_HEIGHT/self.zoom)
+        self.reset()
 
-    @property
-    def vx(self):
-        return self._vx
+    def reset(self):
+        """Shows the top of the board"""
+        self.scroll = self._limit
 
-    @vx.setter
-    def vx(self, value):
-        self._vx = float(value)
+    def follow(self,y):
+        """Scrolls part of the way towards having board y in the middle of the view
+
+        Precondition: y is a number"""
+        target = min(max(0.0,y-GAME_HEIGHT/self.zoom/2.0),self._limit)
+        self.scroll += (target-self.scroll)*CAMERA_EASE
+
+    def screenX(self,x):
+        """Returns: the view x coordinate of board x coordinate x"""
+        return x*self.zoom
+
+    def screenY(self,y):
+        """Returns: the view y coordinate of board y coordinate y"""
+        return (y-self.scroll)*self.zoom
+
+    def worldX(self,x):
+        """Returns: the board x coordinate of view x coordinate x"""
+        return x/self.zoom
+
+
+class Ball(GEllipse):
+    """Instance is a game ball.
 
-    @property
-    def vy(self):
-        return self._vy
+    The position, size and velocity of the ball are kept in the Body of the
+    simulation; this widget only draws it.  We extend GEllipse because the
+    ball is round.
 
-    @vy.setter
-    def vy(self, value):
-        self._vy = float(value)
+    Note: The ball does not have to be a GEllipse. It could be an instance
+    of GImage (why?). This change is allowed, but you must modify the class
+    header up above."""
 
     def __init__(self):
         """Constructor: Takes no arguments. Created a game ball with random color """
@@ -509,78 +825,26 @@ class Ball(GEllipse):
                 width=BALL_DIAMETER,height=BALL_DIAMETER,
                 fillcolor=colormodel.RGB(random.randrange(255),random.randrange(255),
                 random.randrange(255)), linecolor=colormodel.WHITE)
-        self._vx = random.uniform(1.0,5.0)
-        self._vy = -5.0
-
-    def _getCollidingObject(self):
-        """Returns object the ball hits
-
-        Checks paddle for collisions with ball. Then goes through list
-        of bricks and checks for collisions. Changes velocity of ball as appropriate
-
-        Does not return value if colliding object is paddle"""
-        if Breakout._paddle.collide_point(self.x+self.width,self.y):
-            Breakout._bounce.play()
-            if Breakout._paddle.collide_point(self.x+self.width,self.y+5):
-                self._vx = -1 * self._vx
-            else:
-                self._vy = self._vy * -1
-                if self.vy>0:
-                    self.vy+=self.vy/10.0
-                else:
-                    self.vy-=self.vy/10.0
-                self._vx += self._vx/10.0
-        elif Breakout._paddle.collide_point(self.x,self.y):
-            if Breakout._paddle.collide_point(self.x,self.y+5):
-                self._vx = -1 * self._vx
-            else:
-                self._vy = self._vy * -1
 
-        else:
-            for b in Breakout._bricks:
-                if (b.collide_point(self.x,self.y)
-                    or b.collide_point(self.x,self.y+self.height)
-                    or b.collide_point(self.x+self.width,self.y+self.height)
-                    or b.collide_point(self.x+self.width,self.y)):
-                    if (b.collide_point(self.x+5,self.y)
-                        or b.collide_point(self.x+5,self.y+self.height)):
-                        self._vy = self._vy * -1
-                    elif (b.collide_point(self.x,self.y+5)
-                          or b.collide_point(self.x+self.width,self.y+5)):
-                        self._vx = self._vx * -1
-                    return b
+    def reset(self):
+        """Gets a pooled ball ready for a new serve, with a new random color"""
+        super(Ball,self).reset(x=0,y=GAME_HEIGHT-(BRICK_Y_OFFSET+
+                (BRICK_SEP_V+BRICK_HEIGHT)*(BRICK_ROWS))-35,
+                width=BALL_DIAMETER,height=BALL_DIAMETER,
+                fillcolor=colormodel.RGB(random.randrange(255),random.randrange(255),
+                random.randrange(255)))
 
 
 class PowerUp(GImage):
     """Instance is a power up.
 
-    We extends GImage because a power up does not just have a position;
-    it also has a velocity """
-
-    # Velocity in x direction.  A number (int or float)
-    _vx = 0.0
-    # Velocity in y direction.  A number (int or float)
-    _vy = 0.0
-
-    @property
-    def vx(self):
-        return self._vx
-
-    @vx.setter
-    def vx(self, value):
-        self._vx = float(value)
-
-    @property
-    def vy(self):
-        return self._vy
-
-    @vy.setter
-    def vy(self, value):
-        self._vy = float(value)
+    The simulation moves the power up; this widget only draws it."""
 
     def __init__(self,x,y):
         """Constructor: input x and y to set start position of power up"""
-        super(PowerUp,self).__init__(source='star.png',pos=(x+BRICK_WIDTH/2.0,y),
-                                     width=20,height=20)
-        self._vx = 0.0
-        self._vy = -4.0
+        super(PowerUp,self).__init__(source='star.png',pos=(x,y),
+                                     width=POWER_SIZE,height=POWER_SIZE)
+
+    def reset(self,x,y):
+        """Moves a pooled power up to the start position (x,y)"""
+        super(PowerUp,self).reset(pos=(x,y))
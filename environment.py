@@ -0,0 +1,246 @@
+# environment.py
+# Reset/step environments for training game playing agents, using NumPy
+
+"""Learning environment module for Breakout
+
+This module wraps the game rules in the reset/step interface used by
+reinforcement learning libraries (in the style of Gym), with no window,
+widgets or clock involved:
+
+    env = environment.BreakoutEnv(seed=1)
+    observation = env.reset()
+    (observation, reward, done, info) = env.step(environment.RIGHT)
+
+An action is STAY, LEFT or RIGHT: the paddle stays put or moves PADDLE_SPEED
+pixels per tick.  Every step repeats the action for frameskip physics ticks
+(FRAME_SKIP by default) and the reward is the score gained over them.  An
+episode is done when the last turn is lost or the last brick is knocked out.
+A ball waiting to be served is served straight away, as if the player
+clicked.
+
+An observation is a dictionary of two NumPy arrays:
+
+    state       float32 array [ball x, ball y, ball vx, ball vy, paddle x]
+                (the bottom left corner of the ball and its velocity in
+                pixels per tick, all 0 when no ball is in play)
+    bricks      bool array of shape (rows, columns), True for each brick
+                still standing (row 0 is the top row)
+
+BreakoutEnv plays one game with a Simulation (module simulation), power ups
+and all.  VectorEnv plays n games at once with a BatchSimulation (module
+batch), which steps every game with a few array operations; its
+observations are the same arrays with an extra first axis of length n, and
+games that end are started again at once.  It plays by the rules of
+BatchSimulation, which has no power ups.
+
+To measure how many steps a second a VectorEnv takes with random actions:
+
+    python environment.py --envs 256 --steps 1000
+
+This module needs NumPy; the rest of the game does not."""
+import argparse
+import sys
+import timeit
+
+import numpy
+
+import batch
+import simulation
+
+# Actions
+STAY  = 0
+LEFT  = 1
+RIGHT = 2
+
+# Number of actions
+ACTIONS = 3
+
+# Distance the paddle moves per tick, in pixels.  The autopilot is held to
+# the same speed, which is more than MAX_BALL_SPEED, so a policy can always
+# get the paddle under the ball in time.
+PADDLE_SPEED = simulation.AUTOPILOT_SPEED
+
+# Physics ticks played per step
+FRAME_SKIP = 4
+
+# Length of the state array of an observation
+FEATURES = 5
+
+# Paddle movement of each action, indexed by action
+_MOVES = numpy.array([0.0,-PADDLE_SPEED,PADDLE_SPEED])
+
+
+class BreakoutEnv(object):
+    """Instance is an environment playing one game of Breakout at a time.
+
+    Call reset to start a game, then step with an action until done.  The
+    game being played is the field sim, which can be read freely."""
+    # FIELDS.
+
+    # The game being played
+    # Invariant: a Simulation, in STATE_PAUSED, STATE_ACTIVE or STATE_COMPLETE
+    # once reset has been called
+    sim = None
+
+    # Physics ticks played per step
+    # Invariant: an int > 0
+    frameskip = FRAME_SKIP
+
+    def __init__(self,frameskip=None,seed=None,**settings):
+        """Constructor: an environment for games made with settings
+
+        reset must be called before the first step.
+
+        Precondition: frameskip is None (FRAME_SKIP) or an int > 0; seed is
+        any value accepted by Simulation; settings are other keyword
+        arguments of the Simulation constructor"""
+        self.frameskip = FRAME_SKIP if frameskip is None else frameskip
+        self._settings = settings
+        self.sim = simulation.Simulation(seed=seed,**settings)
+
+    def reset(self,seed=None):
+        """Starts a new game.  Returns: the first observation
+
+        If seed is None, the game carries on with the random numbers of the
+        last one, so a series of episodes is set by the seed given to the
+        constructor.
+
+        Precondition: seed is None or any value accepted by Simulation"""
+        if seed is not None:
+            self.sim = simulation.Simulation(seed=seed,**self._settings)
+        self.sim.newGame()
+        return self.observation()
+
+    def step(self,action):
+        """Plays action for frameskip ticks.  Returns: (observation, reward, done, info)
+
+        reward is the score gained, done is True if the game is over (the
+        ticks left are then skipped), and info is a dictionary with the
+        ticks played so far, the turns left and the bricks left.
+
+        Precondition: action is STAY, LEFT or RIGHT, and the game is not over"""
+        sim = self.sim
+        move = _MOVES[action]
+        score = sim.score
+        for _ in range(self.frameskip):
+            if sim.state == simulation.STATE_PAUSED:
+                sim.touch_down(sim.paddle.x)
+            if move:
+                sim.movePaddle(sim.paddle.x+move)
+            sim.update()
+            if sim.state == simulation.STATE_COMPLETE:
+                break
+        info = {'ticks': sim.ticks, 'turns': sim.turnsLeft, 'bricks': len(sim.bricks)}
+        return (self.observation(),float(sim.score-score),
+                sim.state == simulation.STATE_COMPLETE,info)
+
+    def observation(self):
+        """Returns: the observation of the game now (see the module docstring)"""
+        sim = self.sim
+        state = numpy.zeros(FEATURES,numpy.float32)
+        ball = sim.ball
+        if ball is not None:
+            state[:4] = (ball.x,ball.y,ball.vx,ball.vy)
+        state[4] = sim.paddle.x
+        # The store numbers the bricks column by column
+        alive = numpy.frombuffer(sim.bricks.alive,numpy.uint8)
+        bricks = alive.reshape(sim.columns,sim.rows).T.astype(bool)
+        return {'state': state, 'bricks': bricks}
+
+
+class VectorEnv(object):
+    """Instance is an environment playing n games of Breakout at once.
+
+    Every game is started by the constructor; step takes an action for
+    each game and returns arrays with one entry per game.  A game that
+    ends is started again straight away, so the observation returned for it
+    is the first of its next game.  The games being played are the field
+    sims, which can be read freely."""
+    # FIELDS.
+
+    # The games being played
+    # Invariant: a BatchSimulation
+    sims = None
+
+    # Physics ticks played per step
+    # Invariant: an int > 0
+    frameskip = FRAME_SKIP
+
+    def __init__(self,n,frameskip=None,seed=None,**settings):
+        """Constructor: an environment of n games made with settings
+
+        Precondition: n is an int > 0; frameskip is None (FRAME_SKIP) or an
+        int > 0; seed is None or an int; settings are other keyword
+        arguments of the BatchSimulation constructor"""
+        self.n = n
+        self.frameskip = FRAME_SKIP if frameskip is None else frameskip
+        self.sims = batch.BatchSimulation(n,seed=seed,**settings)
+
+    def reset(self):
+        """Starts every game again.  Returns: the first observations"""
+        self.sims.reset()
+        return self.observation()
+
+    def step(self,actions):
+        """Plays actions for frameskip ticks.  Returns: (observations, rewards, dones, info)
+
+        rewards is a float32 array of the score each game gained, and dones
+        a bool array, True for each game that ended (and was started again).
+        info is a dictionary with the final 'score' of each game and
+        whether it was 'won' (arrays, only meaningful where dones is True).
+
+        Precondition: actions is an int array of shape (n,) of STAY, LEFT
+        and RIGHT"""
+        sims = self.sims
+        moves = _MOVES[actions]
+        rewards = numpy.zeros(self.n,numpy.float32)
+        for _ in range(self.frameskip):
+            rewards += sims.step(sims.paddlex+moves)
+        dones = sims.done
+        info = {'score': sims.score.copy(), 'won': sims.won}
+        if dones.any():
+            sims.reset(dones)
+        return (self.observation(),rewards,dones,info)
+
+    def observation(self):
+        """Returns: the observations of the games now, with a first axis of length n"""
+        sims = self.sims
+        state = numpy.zeros((self.n,FEATURES),numpy.float32)
+        active = sims.state == simulation.STATE_ACTIVE
+        for (k,values) in enumerate((sims.ballx,sims.bally,sims.ballvx,sims.ballvy)):
+            state[:,k] = numpy.where(active,values,0.0)
+        state[:,4] = sims.paddlex
+        return {'state': state, 'bricks': sims.alive.copy()}
+
+
+def main(args):
+    """Measures the steps per second of a VectorEnv, as given by the command line arguments args
+
+    Returns the exit status (always 0).
+
+    Precondition: args is a list of strings (without the program name)"""
+    parser = argparse.ArgumentParser(description='Measure the throughput of Breakout environments.')
+    parser.add_argument('--envs',type=int,default=256,help='games played at once')
+    parser.add_argument('--steps',type=int,default=1000,help='steps to play')
+    parser.add_argument('--frameskip',type=int,default=FRAME_SKIP,help='ticks per step')
+    parser.add_argument('--seed',type=int,default=0,help='seed of the games and the actions')
+    options = parser.parse_args(args)
+
+    env = VectorEnv(options.envs,options.frameskip,options.seed)
+    rng = numpy.random.RandomState(options.seed)
+    env.reset()
+    episodes = 0
+    start = timeit.default_timer()
+    for _ in range(options.steps):
+        (observations, rewards, dones, info) = env.step(rng.randint(ACTIONS,size=options.envs))
+        episodes += int(dones.sum())
+    elapsed = timeit.default_timer()-start
+    steps = options.envs*options.steps
+    print('%d steps (%d ticks) in %.3f s: %.0f steps/s, %d episodes ended' %
+          (steps,steps*options.frameskip,elapsed,steps/max(elapsed,1e-9),episodes))
+    return 0
+
+
+# Application code
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,35 +1,89 @@
 
-from kivy.properties import ListProperty, StringProperty
+from kivy.properties import ListProperty, StringProperty, ObjectProperty
 from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.widget import Widget
 from kivy.uix.label import Label
 from kivy.clock import Clock
+from kivy.logger import Logger
+from kivy.graphics.texture import Texture
+from kivy.graphics import Color, Mesh, PushMatrix, PopMatrix, Scale, Translate
+import kivy.resources
 
 # Non-Kivy Imports
 import pygame.mixer
+import pygame.image
+import pygame.transform
 import colormodel
+import array
+import collections
+import csv
+import heapq
 import os.path
-
-# Import Kivy language file with visual interface information
-from kivy.lang import Builder
-Builder.load_file(str(os.path.join(os.path.dirname(__file__), 'graphics.kv')))
+import Queue
+import threading
+import time
+import timeit
+import startup
 
 # User-defined resources
 FONT_PATH  = str(os.path.join(os.path.dirname(__file__), 'Fonts'))
 SOUND_PATH = str(os.path.join(os.path.dirname(__file__), 'Sounds'))
 IMAGE_PATH = str(os.path.join(os.path.dirname(__file__), 'Images'))
 
-import kivy.resources
-kivy.resources.resource_add_path(FONT_PATH)
-kivy.resources.resource_add_path(SOUND_PATH)
-kivy.resources.resource_add_path(IMAGE_PATH)
-
-# Initialize the sound engine.
+# Whether the Kivy language file has been loaded.  See _load_rules
+_rules_loaded = False
+
+def _load_rules():
+    """Loads the Kivy language file with the visual interface information.
+
+    The file is compiled when the first view or graphics object is made,
+    rather than when this module is imported, and the resource directories
+    are registered with Kivy at the same time.  Later calls do nothing."""
+    global _rules_loaded
+    if _rules_loaded:
+        return
+    _rules_loaded = True
+    with startup.phase('kv rules'):
+        kivy.resources.resource_add_path(FONT_PATH)
+        kivy.resources.resource_add_path(SOUND_PATH)
+        kivy.resources.resource_add_path(IMAGE_PATH)
+        from kivy.lang import Builder
+        Builder.load_file(str(os.path.join(os.path.dirname(__file__), 'graphics.kv')))
+
+# Settings for the sound engine.  It is started by the first `Sound` or
+# `SoundBank` that needs it, not when this module is imported.
 FREQUENCY=44100
 BITSIZE=-16
 CHANNELS=2
 BUFFER=1024
-pygame.mixer.init(FREQUENCY,BITSIZE,CHANNELS,BUFFER)
+
+# Most copies of one sound that a `SoundBank` plays at the same time.
+SOUND_VOICES=2
+
+# Sound files a `SoundBank` loads from the **Sounds** directory.
+SOUND_TYPES=('.wav','.ogg')
+
+# Buffer size (in samples) the mixer was started with; None if not started.
+_mixer_buffer = None
+
+def _init_mixer(buffer=None):
+    """Starts the mixer with the given buffer size, restarting it if the size changed.
+
+    If buffer is None, a mixer that is already running is kept as is, and
+    a new one uses BUFFER.  Raises pygame.error if there is no audio device.
+
+    Precondition: buffer is None or a positive int (a power of 2)"""
+    global _mixer_buffer
+    if buffer is None:
+        buffer = BUFFER if _mixer_buffer is None else _mixer_buffer
+    if _mixer_buffer == buffer and pygame.mixer.get_init():
+        return
+    if pygame.mixer.get_init():
+        pygame.mixer.quit()
+    _mixer_buffer = None
+    with startup.phase('mixer'):
+        pygame.mixer.init(FREQUENCY,BITSIZE,CHANNELS,buffer)
+    _mixer_buffer = buffer
 
 def Sound(filename):
     """Creates a new Sound object for the given file.
@@ -41,19 +95,577 @@ def Sound(filename):
 
         :param filename: string providing the name of a sound file
 
-    See the online documentation for more information."""
+    Every call decodes the file again.  For sounds that are played over and
+    over, use a `SoundBank` instead.  See the online documentation for more
+    information."""
+    _init_mixer()
     absname = filename if os.path.isabs(filename) else str(os.path.join(SOUND_PATH, filename))
     return pygame.mixer.Sound(absname)
 
 
+class SoundBank(object):
+    """A set of sound effects, decoded once and played with a limit on voices.
+
+    A sound bank holds every sound file in a directory (by default the
+    **Sounds** directory), and plays them by file name.  The files are not
+    decoded, nor the mixer started, until `load` is called or a sound is
+    first played, so that making a bank does not slow down start up.  Each
+    sound may only be heard a few times at once (see `voices`).  When a sound
+    is played while all of its voices are busy, the voice that has been
+    playing it the longest is cut off and reused.  This keeps fast bursts of
+    the same sound from piling up in the mixer.
+
+    A null sound bank loads nothing and plays nothing, for running a game
+    with no audio.  A bank is null if asked to be, if the environment
+    variable BREAKOUT_AUDIO is 'null', or if the mixer cannot start."""
+
+    @property
+    def null(self):
+        """Whether this bank skips audio entirely.
+
+        This can change from False to True when the bank is loaded, if the
+        mixer cannot start.
+
+        **Invariant**: a bool"""
+        return self._null
+
+    @property
+    def names(self):
+        """The names of the sounds in this bank, sorted.
+
+        **Invariant**: a list of strings; a new list on each access"""
+        return sorted(self._names)
+
+    def __init__(self,path=SOUND_PATH,buffer=None,voices=SOUND_VOICES,null=None):
+        """**Constructor**: creates a sound bank with every sound file in path.
+
+            :param path: directory with the sound files
+            **Precondition**: a string naming a directory
+
+            :param buffer: mixer buffer size in samples; smaller is less latency
+            **Precondition**: None (keep the current mixer) or a positive int,
+            a power of 2
+
+            :param voices: default most copies of a sound played at once
+            **Precondition**: an int > 0
+
+            :param null: whether to skip audio; None decides as described above
+            **Precondition**: a bool or None"""
+        assert type(voices) == int and voices > 0, `voices`+' is not a valid voice count'
+        self._path = path
+        self._buffer = buffer
+        self._names = set(f for f in os.listdir(path) if os.path.splitext(f)[1].lower() in SOUND_TYPES)
+        self._sounds = {}
+        self._opened = False
+        self._volumes = {}
+        self._voices = {}
+        self._limits = {}
+        self._default = voices
+        self.plays = 0
+        self.steals = 0
+        if null is None:
+            null = os.environ.get('BREAKOUT_AUDIO') == 'null'
+        self._null = null
+
+    def load(self):
+        """Starts the mixer and decodes every sound, if not done already.
+
+        Call this at a quiet moment (such as just after the first frame) so
+        that the first sound played does not have to wait for it.  An
+        `AssetLoader` can do the same work in the background instead."""
+        if not self._open():
+            return
+        with startup.phase('sounds'):
+            for name in self._names:
+                if not name in self._sounds:
+                    self._store(name,self._decode(name))
+
+    def _open(self):
+        """Starts the mixer the first time it is called.
+
+        Returns: True if this bank plays audio, False if it is null"""
+        if not self._opened:
+            self._opened = True
+            if not self._null:
+                try:
+                    _init_mixer(self._buffer)
+                except pygame.error:
+                    self._null = True
+        return not self._null
+
+    def _decode(self,name):
+        """Returns: a new pygame Sound with the sound file name.
+
+        This may be called from any thread, once `_open` has returned True."""
+        return pygame.mixer.Sound(str(os.path.join(self._path,name)))
+
+    def _store(self,name,sound):
+        """Keeps sound as the sound for name, unless there already is one.
+
+        Returns: the sound kept for name"""
+        if not name in self._sounds:
+            if name in self._volumes:
+                sound.set_volume(self._volumes[name])
+            self._sounds[name] = sound
+        return self._sounds[name]
+
+    def __contains__(self,name):
+        """**Returns**: True if name is a sound in this bank"""
+        return name in self._names
+
+    def __len__(self):
+        """**Returns**: the number of sounds in this bank"""
+        return len(self._names)
+
+    def voices(self,name,count=None):
+        """**Returns**: the most copies of sound name played at once, after setting it to count
+
+            :param name: file name of a sound in this bank
+            **Precondition**: a string in `names`
+
+            :param count: the new limit; None to leave it unchanged
+            **Precondition**: an int > 0, or None"""
+        assert name in self._names, `name`+' is not a sound in this bank'
+        if not count is None:
+            assert type(count) == int and count > 0, `count`+' is not a valid voice count'
+            self._limits[name] = count
+        return self._limits.get(name,self._default)
+
+    def set_volume(self,name,value):
+        """Sets the volume of sound name.
+
+            :param name: file name of a sound in this bank
+            **Precondition**: a string in `names`
+
+            :param value: the new volume
+            **Precondition**: a number between 0.0 and 1.0, inclusive"""
+        assert name in self._names, `name`+' is not a sound in this bank'
+        self._volumes[name] = value
+        if name in self._sounds:
+            self._sounds[name].set_volume(value)
+
+    def play(self,name):
+        """Plays sound name, cutting off its oldest voice if all are busy.
+
+            :param name: file name of a sound in this bank
+            **Precondition**: a string in `names`
+
+        Returns the pygame Channel playing the sound, or None if the bank is
+        null or the mixer has no channel free."""
+        assert name in self._names, `name`+' is not a sound in this bank'
+        sound = self._sounds.get(name)
+        if sound is None:
+            if not self._open():
+                return None
+            sound = self._store(name,self._decode(name))
+        playing = self._voices.get(name)
+        if playing is None:
+            playing = collections.deque()
+            self._voices[name] = playing
+        # Forget voices that have finished or been taken by another sound
+        for i in range(len(playing)):
+            channel = playing.popleft()
+            if channel.get_busy() and channel.get_sound() is sound:
+                playing.append(channel)
+        if len(playing) >= self._limits.get(name,self._default):
+            channel = playing.popleft()
+            self.steals += 1
+        else:
+            channel = pygame.mixer.find_channel()
+            if channel is None:
+                return None
+        channel.play(sound)
+        playing.append(channel)
+        self.plays += 1
+        return channel
+
+    def stop(self):
+        """Stops every sound in this bank that is playing"""
+        for name in self._voices:
+            playing = self._voices[name]
+            for channel in playing:
+                if channel.get_sound() is self._sounds[name]:
+                    channel.stop()
+            playing.clear()
+
+
+# Most GPU memory (in bytes) that unused cached textures may take up.
+TEXTURE_BUDGET = 32*1024*1024
+
+class _TextureEntry(object):
+    """A texture in a `TextureCache`, with its reference count and size in bytes."""
+    __slots__ = ('texture','refs','nbytes')
+
+    def __init__(self,texture):
+        self.texture = texture
+        self.refs = 0
+        self.nbytes = texture.width*texture.height*4
+
+
+class TextureCache(object):
+    """A cache of decoded image textures, shared by all `GImage` objects.
+
+    Textures are keyed by image file name and target size, so that each image
+    is decoded (and scaled) once and then shared by every `GImage` that shows
+    it at that size.  An image that is on screen holds a reference to its
+    texture.  Textures with no references stay cached until the cache goes
+    over its byte budget, at which point the least recently used ones are
+    dropped.
+
+    Decoding an image can take long enough to drop a frame, so images that
+    are needed during play should be loaded up front with `preload`.
+
+    You should never need to make a TextureCache; use the one in the module
+    variable `textures`."""
+
+    @property
+    def budget(self):
+        """The most memory (in bytes) that the cached textures may take up.
+
+        Textures that are in use are never dropped, so the cache can go over
+        budget while they are on screen.
+
+        **Invariant**: a non-negative int"""
+        return self._budget
+
+    @budget.setter
+    def budget(self,value):
+        assert type(value) in (int,long) and value >= 0, `value`+' is not a valid budget'
+        self._budget = value
+        self._evict()
+
+    @property
+    def nbytes(self):
+        """The memory (in bytes) taken up by the cached textures.
+
+        **Invariant**: a non-negative int; immutable"""
+        return self._bytes
+
+    def __init__(self,budget=TEXTURE_BUDGET):
+        """**Constructor**: creates an empty texture cache.
+
+            :param budget: most memory (in bytes) the cached textures may take up
+            **Precondition**: a non-negative int"""
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._budget = budget
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        """**Returns**: the number of cached textures"""
+        return len(self._entries)
+
+    def get(self,source,size=None):
+        """**Returns**: the texture for the image file source at the given size
+
+            :param source: name of an image file in the **Images** directory
+            **Precondition**: a non-empty string
+
+            :param size: size to scale the image to; None for its own size
+            **Precondition**: a pair of positive ints, or None
+
+        The image is decoded on the first call and cached for later calls."""
+        return self._entry((source,size)).texture
+
+    def acquire(self,source,size=None,texture=None):
+        """**Returns**: the texture for source at size, adding a reference to it
+
+        Parameters are the same as for `get`.  A texture with a reference is
+        never dropped from the cache.  Every call to `acquire` should be
+        matched by a call to `release`.
+
+        If texture is given, and nothing is cached yet for source at size,
+        texture is cached for it instead of loading the image.  This is how
+        an `AssetLoader` hands over the images it has loaded."""
+        entry = self._entry((source,size),texture)
+        entry.refs += 1
+        return entry.texture
+
+    def release(self,source,size=None):
+        """Removes a reference added by `acquire`.
+
+        Parameters are the same as for `get`.  Once a texture has no
+        references left, it can be dropped to keep the cache within budget."""
+        entry = self._entries.get((source,size))
+        if not entry is None and entry.refs > 0:
+            entry.refs -= 1
+            if entry.refs == 0:
+                self._evict()
+
+    def preload(self,images):
+        """Decodes images ahead of time, so they are ready when needed.
+
+            :param images: the images to load
+            **Precondition**: a list of file names or (file name, size) pairs"""
+        for image in images:
+            if type(image) == tuple:
+                self.get(*image)
+            else:
+                self.get(image)
+
+    def clear(self):
+        """Drops every texture that has no references"""
+        for key in list(self._entries):
+            if self._entries[key].refs == 0:
+                self._drop(key)
+
+    def _entry(self,key,texture=None):
+        """Returns the entry for key, loading it on a miss, and marks it most recently used
+
+        On a miss, texture is used if it is not None, rather than loading it."""
+        entry = self._entries.pop(key,None)
+        if entry is None:
+            self.misses += 1
+            entry = _TextureEntry(_load_texture(*key) if texture is None else texture)
+            self._bytes += entry.nbytes
+            self._entries[key] = entry
+            self._evict()
+        else:
+            self.hits += 1
+            self._entries[key] = entry
+        return entry
+
+    def _evict(self):
+        """Drops least recently used textures with no references until within budget"""
+        if self._bytes <= self._budget:
+            return
+        for key in list(self._entries):
+            if self._bytes <= self._budget:
+                break
+            if self._entries[key].refs == 0:
+                self._drop(key)
+                self.evictions += 1
+
+    def _drop(self,key):
+        """Removes the entry for key from the cache"""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+
+
+def _load_texture(source,size=None):
+    """**Returns**: a new texture with the image in file source, scaled to size
+
+    Precondition: source names an image file in the **Images** directory (or
+    is an absolute path), and size is a pair of positive ints or None"""
+    return _upload_texture(*_decode_image(source,size))
+
+
+def _decode_image(source,size=None):
+    """**Returns**: (size, pixels) for the image in file source, scaled to size
+
+    The pixels are a string of RGBA bytes, bottom row first.  This does not
+    touch the GPU, so it may be called from any thread.
+
+    Precondition: source names an image file in the **Images** directory (or
+    is an absolute path), and size is a pair of positive ints or None"""
+    absname = source if os.path.isabs(source) else str(os.path.join(IMAGE_PATH, source))
+    surface = pygame.image.load(absname)
+    if not size is None and tuple(size) != surface.get_size():
+        if surface.get_bitsize() in (24,32):
+            surface = pygame.transform.smoothscale(surface,tuple(size))
+        else:
+            surface = pygame.transform.scale(surface,tuple(size))
+    tobytes = getattr(pygame.image,'tobytes',None) or pygame.image.tostring
+    return (surface.get_size(),tobytes(surface,'RGBA',True))
+
+
+def _upload_texture(size,pixels):
+    """**Returns**: a new texture of the given size holding pixels
+
+    Must be called from the main (OpenGL) thread.
+
+    Precondition: size is a pair of positive ints; pixels is a string of
+    RGBA bytes as made by `_decode_image`"""
+    texture = Texture.create(size=size,colorfmt='rgba')
+    texture.blit_buffer(pixels,colorfmt='rgba',bufferfmt='ubyte')
+    return texture
+
+#: The texture cache used by every `GImage`
+textures = TextureCache()
+
+
+# Worker threads an `AssetLoader` decodes files on.
+ASSET_WORKERS = 2
+
+# Most time (in seconds) an `AssetLoader` spends per frame on the main thread.
+ASSET_SLICE = 0.004
+
+class AssetLoader(object):
+    """Loads images, sounds and fonts in the background, reporting its progress.
+
+    Reading and decoding the files is done on worker threads.  The work that
+    has to happen on the main thread (uploading images to the GPU and
+    rendering each font once) is handed back and done a little each frame,
+    taking no more than ASSET_SLICE seconds, so the screen keeps drawing
+    while the assets load.
+
+    Loaded assets stay resident for the session: images are cached in
+    `textures` with a reference that is never released, sounds are kept in
+    their `SoundBank`, and fonts stay in Kivy's font cache.  An asset that
+    is needed before the loader gets to it is simply loaded then, as usual,
+    and the loader's copy is dropped.  An asset that fails to load (say, a
+    missing or corrupt file) is logged and counted as loaded, so that it is
+    left to be loaded when it is needed, as without the loader."""
+
+    @property
+    def total(self):
+        """The number of assets to load.
+
+        **Invariant**: a non-negative int; immutable"""
+        return len(self._jobs)
+
+    @property
+    def loaded(self):
+        """The number of assets loaded so far.
+
+        **Invariant**: an int between 0 and `total`, inclusive"""
+        return self._loaded
+
+    @property
+    def progress(self):
+        """The part of the assets loaded so far, from 0.0 to 1.0.
+
+        **Invariant**: a float between 0.0 and 1.0, inclusive"""
+        return 1.0 if self._jobs == [] else float(self._loaded)/len(self._jobs)
+
+    @property
+    def done(self):
+        """Whether every asset has been loaded.
+
+        **Invariant**: a bool"""
+        return self._loaded == len(self._jobs)
+
+    def __init__(self,images=(),sounds=None,fonts=(),callback=None,workers=ASSET_WORKERS):
+        """**Constructor**: creates a loader for the given assets.
+
+            :param images: the images to load, as for `TextureCache.preload`
+            **Precondition**: a list of file names or (file name, size) pairs
+
+            :param sounds: sound bank whose sounds are all loaded
+            **Precondition**: a `SoundBank` or None
+
+            :param fonts: the fonts to load, with the size and weight they are used at
+            **Precondition**: a list of (font file name, font size, bold) tuples
+
+            :param callback: function called after each frame that loads something,
+            and when loading is done
+            **Precondition**: None or a function taking this loader as its argument
+
+            :param workers: number of worker threads
+            **Precondition**: an int > 0
+
+        Nothing is loaded until `start` is called."""
+        assert type(workers) == int and workers > 0, `workers`+' is not a valid worker count'
+        self._jobs = []
+        for image in images:
+            self._jobs.append(('image',image if type(image) == tuple else (image,None)))
+        self._bank = sounds
+        if not sounds is None:
+            for name in sounds.names:
+                self._jobs.append(('sound',name))
+        for font in fonts:
+            self._jobs.append(('font',font))
+        self._callback = callback
+        self._workers = workers
+        self._todo = Queue.Queue()
+        self._results = Queue.Queue()
+        self._loaded = 0
+        self._started = False
+
+    def start(self):
+        """Starts loading in the background.
+
+        Must be called from the main thread.  Later calls do nothing."""
+        if self._started:
+            return
+        self._started = True
+        audio = self._bank is None or self._bank._open()
+        for job in self._jobs:
+            if job[0] == 'sound' and not audio:
+                # A null bank has nothing to load
+                self._results.put((job,None,None))
+            else:
+                self._todo.put(job)
+        for i in range(min(self._workers,self._todo.qsize())):
+            thread = threading.Thread(target=self._work,name='AssetLoader')
+            thread.daemon = True
+            thread.start()
+        Clock.schedule_interval(self._poll,0)
+
+    def _work(self):
+        """Decodes jobs until there are none left.  Runs on a worker thread."""
+        while True:
+            try:
+                job = self._todo.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                self._results.put((job,self._decode(job),None))
+            except Exception as e:
+                self._results.put((job,None,e))
+
+    def _decode(self,job):
+        """Returns: the decoded data for job, ready for `_finish`"""
+        (kind, key) = job
+        if kind == 'image':
+            return _decode_image(*key)
+        elif kind == 'sound':
+            return self._bank._decode(key)
+        # Reading a font file brings it into memory for when Kivy opens it
+        name = kivy.resources.resource_find(key[0]) or key[0]
+        with open(name,'rb') as f:
+            f.read()
+        return None
+
+    def _finish(self,job,data):
+        """Does the main thread part of loading job from the decoded data"""
+        (kind, key) = job
+        if kind == 'image':
+            textures.acquire(key[0],key[1],_upload_texture(*data))
+        elif kind == 'sound':
+            if not data is None:
+                self._bank._store(key,data)
+        else:
+            from kivy.core.text import Label as CoreLabel
+            CoreLabel(text='0',font_name=key[0],font_size=key[1],bold=key[2]).refresh()
+
+    def _poll(self,dt):
+        """Finishes decoded assets for up to ASSET_SLICE seconds.  Called every frame."""
+        began = time.time()
+        count = self._loaded
+        while time.time()-began < ASSET_SLICE:
+            try:
+                (job, data, error) = self._results.get_nowait()
+            except Queue.Empty:
+                break
+            if error is None:
+                try:
+                    self._finish(job,data)
+                except Exception as e:
+                    error = e
+            if not error is None:
+                Logger.warning('AssetLoader: could not preload %s %s: %s' % (job[0],`job[1]`,error))
+            self._loaded += 1
+        if (self._loaded > count or self.done) and not self._callback is None:
+            self._callback(self)
+        return not self.done
+
+
+# Keywords that place an object, in the order `GObject.reset` must apply them.
+# Sizes come before anchors such as top and right, which depend on the size.
+_GEOMETRY = ('size','width','height','pos','x','y','center','center_x','center_y',
+             'right','top')
+
 class GObject(Widget):
     """Base graphics object for a `GameView` class.
 
     You should never make a GObject directly.  Instead, you should use one of the
     subclasses: GRectangle, GEllipse, GLine, GImage, and GLabel."""
     # Fields.  See the associated property.
-    _fillcolor = colormodel.RGB(0,0,0,1)  # fill color field
-    _linecolor = colormodel.RGB(0,0,0,1)  # line color field
+    _fillcolor = colormodel.BLACK  # fill color field
+    _linecolor = colormodel.BLACK  # line color field
 
     # Kivy properties.  For integration with graphics.kv
     _kivy_fill_color = ListProperty([0,0,0,1]) # Kivy representation of fill color
@@ -72,8 +684,10 @@ class GObject(Widget):
     @fillcolor.setter
     def fillcolor(self,value):
         assert type(value) in (colormodel.RGB, colormodel.HSV), `value`+' is not a valid color'
+        if value is self._fillcolor:
+            return
         self._fillcolor = value
-        self._kivy_fill_color = value.glColor()
+        self._kivy_fill_color = list(value.glColor())
 
     @property
     def linecolor(self):
@@ -88,8 +702,10 @@ class GObject(Widget):
     @linecolor.setter
     def linecolor(self,value):
         assert type(value) in (colormodel.RGB, colormodel.HSV), `value`+' is not a valid color'
+        if value is self._linecolor:
+            return
         self._linecolor = value
-        self._kivy_line_color = value.glColor()
+        self._kivy_line_color = list(value.glColor())
 
     def __init__(self,**keywords):
         """**Constructor**: creates a new graphics object.
@@ -110,6 +726,7 @@ class GObject(Widget):
         Any attribute of this class may be used as a keyword.  The
         argument must satisfy the invariants of that attribute.  See
         the list of attributes of this class for more information."""
+        _load_rules()
         super(GObject,self).__init__(**keywords)
         if 'fillcolor' in keywords:
             self.fillcolor = keywords['fillcolor']
@@ -122,6 +739,30 @@ class GObject(Widget):
         # Prevent students from using this built-in method
         pass
 
+    def reset(self,**keywords):
+        """Reinitializes this object so that it can be reused.
+
+            :param keywords: dictionary of keyword arguments
+            **Precondition**: See below.
+
+        This method takes the same keywords as the constructor, and sets
+        each of the attributes named.  Attributes that are not named keep
+        their current values.  It is used by `Pool` to hand out an old
+        object in place of a new one."""
+        for key in keywords:
+            if not key in _GEOMETRY:
+                setattr(self,key,keywords[key])
+        for key in _GEOMETRY:
+            if key in keywords:
+                setattr(self,key,keywords[key])
+
+    # Called by `GameView` when this object is added to or removed from a view
+    def _attach(self):
+        pass
+
+    def _detach(self):
+        pass
+
 
 class GLine(GObject):
     """Instance represents a sequence of line segments in the `GameView`
@@ -274,8 +915,17 @@ class GImage(GObject):
     left corner is defined by attribute `pos` and whose width and height
     are defined by the attribute `size`.  If the `size` attribute does
     not agree with the actual size of the image, the image is scaled
-    to fit."""
+    to fit.
+
+    Images are decoded through the shared `TextureCache` in `textures`, so
+    showing the same image again (at the same size) does not decode it again."""
     source = StringProperty('')
+    # Kivy property.  The texture of the image, from the texture cache
+    texture = ObjectProperty(None,allownone=True)
+
+    # Hidden fields.  The cache key of the texture, and whether it is in a view
+    _key = None
+    _attached = False
 
     def __init__(self,**keywords):
         """**Constructor**: creates a new image.
@@ -296,6 +946,36 @@ class GImage(GObject):
         super(GImage,self).__init__(**keywords)
         if 'source' in keywords:
             self.source = keywords['source']
+        self.bind(source=self._retexture)
+        self._retexture()
+
+    # Look up the texture for the current source in the texture cache.
+    # While in a view, move the reference from the old texture to the new one.
+    def _retexture(self,instance=None,value=None):
+        old = self._key
+        if self.source == '':
+            self._key = None
+            self.texture = None
+        else:
+            self._key = (self.source,(int(self.width),int(self.height)))
+            if self._attached:
+                self.texture = textures.acquire(*self._key)
+            else:
+                self.texture = textures.get(*self._key)
+        if self._attached and not old is None:
+            textures.release(*old)
+
+    def _attach(self):
+        if not self._attached:
+            self._attached = True
+            if not self._key is None:
+                textures.acquire(*self._key)
+
+    def _detach(self):
+        if self._attached:
+            self._attached = False
+            if not self._key is None:
+                textures.release(*self._key)
 
 
 class GLabel(GObject):
@@ -446,7 +1126,7 @@ class GLabel(GObject):
         assert type(value) in (colormodel.RGB, colormodel.HSV), `value`+' is not a valid color'
         self._linecolor = value
         if not self._label is None:
-            self._label.color = value.glColor()
+            self._label.color = list(value.glColor())
 
     def __init__(self,**keywords):
         """**Constructor**: creates a new text label.
@@ -464,6 +1144,7 @@ class GLabel(GObject):
         This class supports the same keywords as `GObject`, as well
         as additional attributes for the text properties (e.g. font
         size and name)."""
+        _load_rules()
         self._label = Label(**keywords)
         self._label.size_hint = (None,None)
         super(GLabel,self).__init__(**keywords)
@@ -532,6 +1213,14 @@ class GLabel(GObject):
         else: # 'bottom'
             self._label.y = self.y
 
+    def reset(self,**keywords):
+        """Reinitializes this label so that it can be reused.
+
+        See `GObject.reset`.  The size of the label is recomputed from its
+        new text."""
+        super(GLabel,self).reset(**keywords)
+        self._resize()
+
 
 class GRectangle(GObject):
     """Instance represents a solid rectangle in `GameView`
@@ -595,46 +1284,567 @@ class GEllipse(GObject):
         super(GEllipse,self).__init__(**keywords)
 
 
-class _ClockEvent(object):
-    """Instances represent delayed graphics events.
+class BrickField(GObject):
+    """Instance represents a whole wall of solid rectangles in `GameView`
 
-    Internal class to make animation and pauses simpler."""
-    # Hidden Fields
-    _parent = None    # The view to update when the event occurs
-    _widget = None    # The widget to remove when the event occurs
-    _callback = None  # The function to call when the event occurs.
+    A wall made of one `GRectangle` per brick costs a widget and four canvas
+    instructions per brick, which adds up on a big board.  A BrickField
+    draws every rectangle of the same color as part of a single mesh, so the
+    whole wall is one widget with two canvas instructions per color.  A
+    mesh holds at most MESH_QUADS rectangles; a color with more than that
+    gets more meshes, so that a change only uploads a small mesh again.
 
-    def __init__(self,parent=None,widget=None,callback=None):
-        """**Constructor**: Creates a new clock delay event.
+    Rectangles are added with `add`, which returns an index for the
+    rectangle.  Removing a rectangle with `remove` only changes the four
+    vertices of that rectangle.  Use `collide_point` and `brick_at` to
+    test a point against the rectangles still in the field.
 
-            :param parent: The parent object
-            **Precondition**: A `GameView` or `GameController`
+    The rectangles are drawn through a camera: the point `scroll` is drawn
+    at the origin and everything is scaled by `zoom`.  This shows part of,
+    or all of, a wall bigger than the view without moving the rectangles.
 
-            :param widget: The widget to remove when the even occurs
-            **Precondition**: A `GObject` or None if parent is a `GameController`
+    Each rectangle is drawn in its own fill color; the `fillcolor` and
+    `linecolor` attributes of the field itself are unused."""
 
-            :param callback: The function to call when the event occurs.
-            **Precondition**: A function with no (additional) arguments
+    def __init__(self,**keywords):
+        """**Constructor**: creates a new, empty field of rectangles.
 
-        The delay interval is set by the parent object."""
-        self._parent = parent
-        self._widget = widget
-        self._callback = callback
+            :param keywords: dictionary of keyword arguments
+            **Precondition**: See below.
+
+        This class supports the same keywords as `GObject`.  The
+        rectangles are placed in view coordinates, so the `pos` and
+        `size` of the field do not move them."""
+        super(BrickField,self).__init__(**keywords)
+        self._meshes = {}   # Meshes of each color: glColor tuple -> list of [Mesh, vertices, indices]
+        self._rects = []    # Each rectangle: [x, y, width, height, mesh entry, offset, alive]
+        self._alive = 0
+        self._dirty = {}    # Changed meshes: id(Mesh) -> mesh entry
+        self._zoom = 1.0
+        self._scroll = (0.0,0.0)
+        with self.canvas.before:
+            PushMatrix()
+            self._scale = Scale(1.0)
+            self._translate = Translate(0.0,0.0)
+        with self.canvas.after:
+            PopMatrix()
+
+    @property
+    def zoom(self):
+        """The scale the rectangles are drawn at.
+
+        **Invariant**: a number (int or float) > 0"""
+        return self._zoom
+
+    @zoom.setter
+    def zoom(self,value):
+        assert type(value) in (int,float) and value > 0, `value`+' is not a valid zoom'
+        if value != self._zoom:
+            self._zoom = value
+            self._scale.x = value
+            self._scale.y = value
+
+    @property
+    def scroll(self):
+        """The point (in the coordinates of the rectangles) drawn at the origin.
+
+        **Invariant**: a pair of numbers (int or float)"""
+        return self._scroll
+
+    @scroll.setter
+    def scroll(self,value):
+        value = (value[0],value[1])
+        if value != self._scroll:
+            self._scroll = value
+            self._translate.x = -value[0]
+            self._translate.y = -value[1]
+
+    def __len__(self):
+        """**Returns**: the number of rectangles still in the field"""
+        return self._alive
 
-    def awaken(self,dt):
-        """Respond to the delayed event.
+    def add(self,x,y,width,height,fillcolor):
+        """**Returns**: the index of a new rectangle added to the field
 
-        Delete the widget if it is there. Call the callback if it exists."""
-        if not self._parent is None:
-            if not self._widget is None:
-                self._parent.remove(self._widget)
-            self._parent._events.remove(self)
+            :param x: the left edge of the rectangle
+            **Precondition**: a number (int or float)
+
+            :param y: the bottom edge of the rectangle
+            **Precondition**: a number (int or float)
+
+            :param width: the width of the rectangle
+            **Precondition**: a non-negative number (int or float)
+
+            :param height: the height of the rectangle
+            **Precondition**: a non-negative number (int or float)
+
+            :param fillcolor: the color of the rectangle
+            **Precondition**: an RGB or HSV object from module `colormodel`"""
+        assert type(fillcolor) in (colormodel.RGB, colormodel.HSV), `fillcolor`+' is not a valid color'
+        rgba = fillcolor.glColor()
+        entries = self._meshes.get(rgba)
+        if entries is None:
+            entries = []
+            self._meshes[rgba] = entries
+        if entries == [] or len(entries[-1][1]) >= 16*MESH_QUADS:
+            mesh = Mesh(mode='triangles')
+            entries.append([mesh,[],[]])
+            self.canvas.add(Color(*rgba))
+            self.canvas.add(mesh)
+        entry = entries[-1]
+        vertices = entry[1]
+        offset = len(vertices)
+        vertices.extend(_quad(x,y,width,height))
+        first = offset//4
+        entry[2].extend((first,first+1,first+2,first+2,first+3,first))
+        self._rects.append([x,y,width,height,entry,offset,True])
+        self._alive += 1
+        self._touch(entry)
+        return len(self._rects)-1
+
+    def remove(self,index):
+        """Removes a rectangle from the field.
+
+            :param index: the rectangle to remove
+            **Precondition**: an index returned by `add` since the last `clear`
+
+        This method does nothing if the rectangle was already removed."""
+        rect = self._rects[index]
+        if rect[6]:
+            rect[6] = False
+            self._alive -= 1
+            vertices = rect[4][1]
+            offset = rect[5]
+            vertices[offset:offset+16] = [0.0]*16
+            self._touch(rect[4])
+
+    def clear(self):
+        """Removes every rectangle from the field."""
+        self.canvas.clear()
+        self._meshes = {}
+        self._rects = []
+        self._alive = 0
+        self._dirty = {}
+
+    def brick_at(self,x,y):
+        """**Returns**: the index of a rectangle containing (x,y), or None
+
+            :param x: the x coordinate of the point
+            **Precondition**: a number (int or float)
+
+            :param y: the y coordinate of the point
+            **Precondition**: a number (int or float)"""
+        for index in range(len(self._rects)):
+            rect = self._rects[index]
+            if rect[6] and rect[0] <= x <= rect[0]+rect[2] and rect[1] <= y <= rect[1]+rect[3]:
+                return index
+        return None
+
+    def collide_point(self,x,y):
+        """**Returns**: True if (x,y) is inside a rectangle still in the field
+
+            :param x: the x coordinate of the point
+            **Precondition**: a number (int or float)
 
+            :param y: the y coordinate of the point
+            **Precondition**: a number (int or float)"""
+        return not self.brick_at(x,y) is None
+
+    # Mark a mesh as changed, and upload all changed meshes once before the next frame
+    def _touch(self,entry):
+        if not self._dirty:
+            Clock.schedule_once(self._flush,0)
+        self._dirty[id(entry[0])] = entry
+
+    def _flush(self,dt=None):
+        for entry in self._dirty.values():
+            entry[0].vertices = entry[1]
+            entry[0].indices = entry[2]
+        self._dirty = {}
+
+
+# Most rectangles in one mesh of a `BrickField`.  Kivy mesh indices are
+# 16 bit, so this must stay below 16384.
+MESH_QUADS = 1024
+
+def _quad(x,y,width,height):
+    """**Returns**: the mesh vertices (x, y, u, v) for the corners of a rectangle"""
+    return [x,y,0.0,0.0, x+width,y,1.0,0.0, x+width,y+height,1.0,1.0, x,y+height,0.0,1.0]
+
+
+class Pool(object):
+    """A pool of reusable graphics objects of one class.
+
+    Making a new `GObject` builds a new Kivy widget and its canvas, which
+    is slow.  A pool keeps the objects that are no longer on screen, and
+    hands them out again in place of new ones.  Get an object with
+    `acquire` and give it back with `release` once it has been removed from
+    the view; do not use an object after releasing it.
+
+    The pool counts how often it could reuse an object (`hits`), how often
+    it had to make a new one (`misses`), and the most objects out of the
+    pool at once (`highwater`)."""
+
+    @property
+    def free(self):
+        """The number of objects waiting in the pool.
+
+        **Invariant**: a non-negative int; immutable"""
+        return len(self._free)
+
+    @property
+    def used(self):
+        """The number of objects acquired and not yet released.
+
+        **Invariant**: a non-negative int; immutable"""
+        return self._used
+
+    def __init__(self,factory,limit=None):
+        """**Constructor**: creates an empty pool.
+
+            :param factory: class (or function) that makes a new object
+            **Precondition**: a callable taking the keywords given to `acquire`,
+            returning an object with a `reset` method (such as a `GObject`)
+
+            :param limit: most objects to keep waiting in the pool; None for no limit
+            **Precondition**: a non-negative int, or None"""
+        self._factory = factory
+        self._limit = limit
+        self._free = []
+        self._used = 0
+        self.hits = 0
+        self.misses = 0
+        self.highwater = 0
+
+    def acquire(self,**keywords):
+        """**Returns**: an object initialized with the given keywords
+
+            :param keywords: dictionary of keyword arguments
+            **Precondition**: the keywords of the factory
+
+        Reuses an object from the pool (calling its `reset` method with the
+        keywords) if there is one, and otherwise makes a new one."""
+        if self._free:
+            obj = self._free.pop()
+            obj.reset(**keywords)
+            self.hits += 1
+        else:
+            obj = self._factory(**keywords)
+            self.misses += 1
+        self._used += 1
+        self.highwater = max(self.highwater,self._used)
+        return obj
+
+    def release(self,obj):
+        """Returns an object to the pool.
+
+            :param obj: the object to return
+            **Precondition**: an object from `acquire` of this pool, no longer in a view
+
+        Releasing None does nothing."""
+        if obj is None:
+            return
+        self._used -= 1
+        if self._limit is None or len(self._free) < self._limit:
+            self._free.append(obj)
+
+
+# Number of frames of timings a `FrameTimer` keeps.
+FRAME_HISTORY = 600
+
+# Seconds between redraws of the timings overlay, and its text size.
+TIMING_REFRESH = 0.5
+TIMING_FONT_SIZE = 12
+
+# File the frame timings are written to by default.
+TIMING_FILE = 'timings.csv'
+
+# Kivy key codes of the keys that show the timings (F3) and write them out (F4).
+TIMING_KEY = 284
+EXPORT_KEY = 285
+
+class FrameTimer(object):
+    """A ring buffer of how long each phase of the recent frames took.
+
+    Each frame has one time (in seconds) per phase.  Time is added to a phase
+    of the current frame with `add`, any number of times, and `next` stores
+    the current frame and starts a new one.  Only the last `capacity` frames
+    are kept; older ones are overwritten.
+
+    Every `GameController` has one of these, in its `timer` attribute."""
+
+    #: The clock used for timing, in seconds
+    clock = staticmethod(timeit.default_timer)
+
+    @property
+    def phases(self):
+        """The names of the phases timed, in the order of the CSV columns.
+
+        **Invariant**: a tuple of strings; immutable"""
+        return self._phases
+
+    @property
+    def capacity(self):
+        """The most frames kept.
+
+        **Invariant**: an int > 0; immutable"""
+        return self._capacity
+
+    def __init__(self,phases,capacity=FRAME_HISTORY):
+        """**Constructor**: creates an empty timer for the given phases.
+
+            :param phases: the names of the phases to time
+            **Precondition**: a sequence of distinct strings
+
+            :param capacity: the most frames kept
+            **Precondition**: an int > 0"""
+        assert type(capacity) == int and capacity > 0, `capacity`+' is not a valid capacity'
+        self._phases = tuple(phases)
+        self._capacity = capacity
+        self._column = dict((p,i) for (i,p) in enumerate(self._phases))
+        self._width = len(self._phases)
+        self._data = array.array('d',[0.0])*(capacity*self._width)
+        self._current = [0.0]*self._width
+        self._next = 0
+        self._count = 0
+        self.frames = 0
+
+    def __len__(self):
+        """**Returns**: the number of frames kept"""
+        return self._count
+
+    def add(self,phase,seconds):
+        """Adds seconds to the time of phase in the current frame.
+
+            :param phase: the phase timed
+            **Precondition**: a string in `phases`
+
+            :param seconds: the time to add
+            **Precondition**: a number"""
+        self._current[self._column[phase]] += seconds
+
+    def next(self):
+        """Stores the current frame and starts a new one, with every time at 0"""
+        start = self._next*self._width
+        current = self._current
+        for i in range(self._width):
+            self._data[start+i] = current[i]
+            current[i] = 0.0
+        self._next = (self._next+1) % self._capacity
+        self._count = min(self._count+1,self._capacity)
+        self.frames += 1
+
+    def frame(self,i):
+        """**Returns**: list of the phase times of a kept frame
+
+            :param i: position of the frame, 0 being the oldest kept
+            **Precondition**: an int between 0 and len(self)-1"""
+        assert 0 <= i < self._count, `i`+' is not a kept frame'
+        start = ((self._next-self._count+i) % self._capacity)*self._width
+        return self._data[start:start+self._width].tolist()
+
+    def column(self,phase):
+        """**Returns**: list of the times of phase in each kept frame, oldest first
+
+            :param phase: the phase
+            **Precondition**: a string in `phases`"""
+        col = self._column[phase]
+        first = self._next-self._count
+        return [self._data[((first+i) % self._capacity)*self._width+col]
+                for i in range(self._count)]
+
+    def mean(self,phase):
+        """**Returns**: the average time of phase over the kept frames; 0.0 if none
+
+            :param phase: the phase
+            **Precondition**: a string in `phases`"""
+        times = self.column(phase)
+        return sum(times)/len(times) if times else 0.0
+
+    def worst(self,phase):
+        """**Returns**: the longest time of phase over the kept frames; 0.0 if none
+
+            :param phase: the phase
+            **Precondition**: a string in `phases`"""
+        times = self.column(phase)
+        return max(times) if times else 0.0
+
+    def clear(self):
+        """Forgets every kept frame and the current one"""
+        self._current = [0.0]*self._width
+        self._next = 0
+        self._count = 0
+
+    def write_csv(self,filename):
+        """Writes the kept frames to a CSV file, oldest first.
+
+            :param filename: the file to write
+            **Precondition**: a string
+
+        The file has a header row with 'number' and the phase names, then one
+        row per frame with its number and the phase times in milliseconds."""
+        with open(filename,'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(('number',)+self._phases)
+            first = self.frames-self._count
+            for i in range(self._count):
+                writer.writerow([first+i]+['%.4f' % (t*1000) for t in self.frame(i)])
+
+
+# Cancelled callbacks a `Scheduler` keeps in its heap before it may drop them all.
+SCHEDULER_SLACK = 64
+
+
+class TimerHandle(object):
+    """Instances are handles to callbacks waiting in a `Scheduler`.
+
+    A handle is returned by `Scheduler.schedule` (and by `GameController.delay`).
+    Use it to cancel the callback before it is called.  You should never make
+    one yourself."""
+    # Hidden Fields
+    _callback = None  # The function to call; None once cancelled or called
+    _args = ()        # The arguments to call it with
+    _owner = None     # The object the callback belongs to (see `Scheduler.clear`)
+    _scheduler = None # The scheduler the callback waits in
+
+    @property
+    def active(self):
+        """Whether the callback is still waiting to be called.
+
+        **Invariant**: a bool; False once the callback is called or cancelled"""
+        return not self._callback is None
+
+    def __init__(self,scheduler,callback,args,owner):
+        """**Constructor**: a handle to callback(*args), waiting in scheduler"""
+        self._scheduler = scheduler
+        self._callback = callback
+        self._args = args
+        self._owner = owner
+
+    def cancel(self):
+        """Cancels the callback, so that it is never called.
+
+        This takes constant time.  It does nothing if the callback has
+        already been called or cancelled."""
         if not self._callback is None:
-            if self._widget is None:
-                self._callback()
-            else:
-                self._callback(self._widget)
+            self._callback = None
+            self._args = ()
+            self._scheduler._cancelled()
+
+
+class Scheduler(object):
+    """Instances are queues of callbacks to call after a delay.
+
+    The callbacks wait in a heap ordered by the time they are due, so that
+    scheduling a callback takes O(log n) time, however many are waiting.
+    A scheduler has no clock of its own: its time only moves on when
+    `advance` is called, which the `GameController` does once per frame.
+    Callbacks due at the same time are called in the order they were
+    scheduled.
+
+    Every callback may have an owner.  All the callbacks of an owner (say,
+    the effects of a game that has just been reset) are cancelled at once
+    with `clear`.  A cancelled callback is only marked as such, and is
+    dropped from the heap when it comes up or when the cancelled callbacks
+    make up most of the heap."""
+    # Hidden Fields
+    _heap = None      # Waiting callbacks: list of [due, number, TimerHandle], a heap
+    _count = 0        # Number of callbacks ever scheduled (numbers them in order)
+    _dead = 0         # Number of cancelled callbacks still in the heap
+    _now = 0.0        # Time on the clock of this scheduler, in seconds
+    _advancing = False # Whether advance is calling callbacks (the heap must not be replaced)
+
+    @property
+    def now(self):
+        """The time on the clock of this scheduler, in seconds.
+
+        **Invariant**: a float >= 0; moves on only in `advance`"""
+        return self._now
+
+    def __init__(self):
+        """**Constructor**: an empty scheduler, with its clock at 0"""
+        self._heap = []
+
+    def __len__(self):
+        """Returns: the number of callbacks waiting (not counting cancelled ones)"""
+        return len(self._heap)-self._dead
+
+    def schedule(self,delay,callback,*args,**keywords):
+        """Returns: a `TimerHandle` for callback(*args), called after delay seconds
+
+            :param delay: the time to wait, in seconds
+            **Precondition**: a non-negative number (int or float)
+
+            :param callback: the function to call
+            **Precondition**: a function that takes the arguments args
+
+            :param owner: (keyword only) the object the callback belongs to
+            **Precondition**: any object, or None
+
+        A callback with delay 0 is called at the next `advance`."""
+        assert type(delay) in (int,float) and delay >= 0, `delay`+' is not a valid delay'
+        handle = TimerHandle(self,callback,args,keywords.get('owner'))
+        heapq.heappush(self._heap,[self._now+delay,self._count,handle])
+        self._count += 1
+        return handle
+
+    def clear(self,owner=None):
+        """Cancels every waiting callback of owner, or all of them if owner is None
+
+            :param owner: the owner whose callbacks to cancel
+            **Precondition**: any object, or None"""
+        for entry in self._heap:
+            handle = entry[2]
+            if owner is None or handle._owner is owner:
+                handle.cancel()
+
+    def advance(self,dt):
+        """Moves the clock on by dt seconds, and calls the callbacks now due
+
+            :param dt: the time that has passed, in seconds
+            **Precondition**: a non-negative number (int or float)
+
+        Callbacks scheduled by these callbacks wait for the next call, even
+        if they are already due, so that a callback that schedules itself
+        again cannot keep this method from returning.  Callbacks may cancel
+        any others; the heap is only compacted once they have all been called."""
+        self._now += dt
+        heap = self._heap
+        last = self._count
+        later = []
+        self._advancing = True
+        try:
+            while heap and heap[0][0] <= self._now:
+                entry = heapq.heappop(heap)
+                handle = entry[2]
+                if handle._callback is None:
+                    self._dead -= 1
+                elif entry[1] >= last:
+                    later.append(entry)
+                else:
+                    (callback, args) = (handle._callback, handle._args)
+                    handle._callback = None
+                    handle._args = ()
+                    callback(*args)
+        finally:
+            self._advancing = False
+            for entry in later:
+                heapq.heappush(heap,entry)
+            self._compact()
+        assert 0 <= self._dead <= len(self._heap), 'scheduler lost count of its cancelled callbacks'
+
+    def _cancelled(self):
+        """Counts a cancelled callback, compacting the heap if they fill most of it"""
+        self._dead += 1
+        if not self._advancing:
+            self._compact()
+
+    def _compact(self):
+        """Drops the cancelled callbacks from the heap, if they make up most of it"""
+        if self._dead > SCHEDULER_SLACK and 2*self._dead > len(self._heap):
+            self._heap = [entry for entry in self._heap if not entry[2]._callback is None]
+            heapq.heapify(self._heap)
+            self._dead = 0
 
 
 class GameView(FloatLayout):
@@ -644,8 +1854,15 @@ class GameView(FloatLayout):
     `GObject` instances.  However, you will never need to construct one.
     You should only use the one provided in the `view` attribute of
     `GameController`.  See `GameController` for more information."""
-    # Hidden Field.  Necessary to maintain strong references to delayed events.
-    _events = []
+    # Hidden Field.  The scheduler of the controller, set by the controller.
+    _scheduler = None
+
+    def __init__(self,**keywords):
+        """**Constructor**: creates a new, empty view.
+
+        Loads the Kivy language file first, if it has not been loaded yet."""
+        _load_rules()
+        super(GameView,self).__init__(**keywords)
 
     def add(self,widget,timeout=0,callback=None):
         """Add a new `GObject` to this view.
@@ -665,13 +1882,19 @@ class GameView(FloatLayout):
 
         The `timeout` attribute is a simple way to provide a widget that quickly
         flashes up on screen, though the `delay` method in `GameController` has
-        the same effect."""
+        the same effect.  The removal is owned by this view in the scheduler of
+        the controller."""
         assert isinstance(widget,GObject)
         self.add_widget(widget)
+        widget._attach()
         if timeout > 0:
-            timer = _ClockEvent(self,widget,callback)
-            self._events.append(timer)
-            Clock.schedule_once(timer.awaken, timeout)
+            self._scheduler.schedule(timeout,self._expire,widget,callback,owner=self)
+
+    def _expire(self,widget,callback):
+        """Removes a widget added with a timeout, and calls its callback (if any)"""
+        self.remove(widget)
+        if not callback is None:
+            callback(widget)
 
     def remove(self,widget):
         """Removes the widget from this view.
@@ -685,7 +1908,9 @@ class GameView(FloatLayout):
         remove the widget for you.
 
         This method does nothing if widget is not in this view."""
-        self.remove_widget(widget)
+        if widget.parent is self:
+            self.remove_widget(widget)
+            widget._detach()
 
 
 class GameController(object):
@@ -700,8 +1925,9 @@ class GameController(object):
         program.  It is preferable to put start-up code here rather than
         in your constructor.
 
-        `update`: Called every animation frame (60x a second). This is
-        where you add any game animation code.
+        `update`: Called every animation frame (60x a second), or once
+        per physics tick in fixed-timestep mode. This is where you add any
+        game animation code.
 
         `on_touch_down`: Called whenever the user presses the mouse or
         a finger (for a touch screen device).
@@ -721,11 +1947,41 @@ class GameController(object):
     Except in very few instances you should never need to add properties
     to a `GameController`.  As the controller, it manages all of the
     objects in the game, and none of the other objects need to access
-    its fields."""
+    its fields.
+
+    By default `update` is called once per rendered frame, so the game
+    runs slower or faster with the frame rate.  A controller created with
+    a `timestep` runs in fixed-timestep mode instead.  Every rendered frame
+    adds the elapsed time to an accumulator, and `update` is called once for
+    each whole `timestep` in it, always with `dt` equal to `timestep`.  At
+    most `maxticks` updates run per frame; any further backlog is dropped
+    so that a slow frame cannot snowball into slower and slower frames.
+
+    Every frame is timed, phase by phase, in the `FrameTimer` in `timer`.
+    The phases are listed in `PHASES`: the whole frame, the touch handlers
+    ('input'), `update`, delayed callbacks ('events') and Kivy's drawing.
+    A subclass may add phases of its own (such as parts of `update`) by
+    extending `PHASES` and adding to them with `timer`.  Pressing F3 shows
+    or hides an overlay with the recent times, and F4 writes them to the
+    file TIMING_FILE."""
+    #: The phases of a frame that are timed
+    PHASES = ('frame','input','update','events','draw')
+
     # Field for the view.  See associated property
     _view = None
-    # Hidden Field.  Necessary to maintain strong references to delayed events.
-    _events = []
+    # Field for the delayed callbacks.  See associated property
+    _scheduler = None
+    # Fields for fixed-timestep mode.  See associated properties
+    _timestep = None
+    _maxticks = 5
+    _ticks = 0
+    _accumulator = 0.0
+    # Hidden Field.  Whether the first frame has been drawn (for the startup trace)
+    _drawn = False
+    # Fields for the frame timings.  See associated property
+    _timer = None
+    _overlay = None    # GLabel showing the timings; None when hidden
+    _drawStart = 0.0   # When Kivy started drawing the current frame
 
     @property
     def view(self):
@@ -737,14 +1993,74 @@ class GameController(object):
         in this attribute to add and remove graphics objects."""
         return self._view
 
+    @property
+    def timestep(self):
+        """The length of a physics tick in seconds.
+
+        This attribute is None if the controller is not in fixed-timestep
+        mode, in which case `update` is called once per rendered frame.
+
+        **Invariant**: a positive number (int or float) or None; immutable"""
+        return self._timestep
+
+    @property
+    def ticks(self):
+        """The number of times `update` was called in the last frame.
+
+        Always 1 if the controller is not in fixed-timestep mode.
+
+        **Invariant**: an int between 0 and `maxticks`, inclusive"""
+        return self._ticks
+
+    @property
+    def remainder(self):
+        """The time left over in the accumulator after the last frame.
+
+        This is the part of a physics tick that has elapsed but not yet been
+        simulated.  Divide by `timestep` to interpolate drawing between ticks.
+        Always 0.0 if the controller is not in fixed-timestep mode.
+
+        **Invariant**: a float between 0.0 and `timestep`"""
+        return self._accumulator
+
+    @property
+    def scheduler(self):
+        """The callbacks waiting to be called, by `delay` and by the view.
+
+        The scheduler is moved on once every frame, after `update`.  Its time
+        spent calling callbacks counts toward the 'events' phase.
+
+        **Invariant**: a `Scheduler` owned by this controller; immutable"""
+        return self._scheduler
+
+    @property
+    def timer(self):
+        """The timings of the recent frames, phase by phase.
+
+        **Invariant**: a `FrameTimer` with the phases in `PHASES`; immutable"""
+        return self._timer
+
     # VISIBLE METHODS
 
-    def __init__(self):
-        """**Constructor**: Creates a game with this controller"""
+    def __init__(self,timestep=None,maxticks=5):
+        """**Constructor**: Creates a game with this controller
+
+            :param timestep: length of a physics tick in seconds; None for one update per frame
+            **Precondition**: a positive number (int or float) or None
+
+            :param maxticks: maximum number of physics ticks run per frame
+            **Precondition**: a positive int"""
+        assert timestep is None or (type(timestep) in (int,float) and timestep > 0), `timestep`+' is not a valid timestep'
+        assert type(maxticks) == int and maxticks > 0, `maxticks`+' is not a positive int'
+        self._timestep = timestep
+        self._maxticks = maxticks
+        self._timer = FrameTimer(self.PHASES)
+        self._scheduler = Scheduler()
         self._view = GameView()
-        self._view.bind(on_touch_down=self.on_touch_down)
-        self._view.bind(on_touch_move=self.on_touch_move)
-        self._view.bind(on_touch_up=self.on_touch_up)
+        self._view._scheduler = self._scheduler
+        self._view.bind(on_touch_down=self._touch_down)
+        self._view.bind(on_touch_move=self._touch_move)
+        self._view.bind(on_touch_up=self._touch_up)
         Clock.schedule_once(self._start_up,-1)
 
     def delay(self,callback,time):
@@ -756,13 +2072,49 @@ class GameController(object):
             :param time: time to wait in seconds before calling the function.
             **Precondition**: a positive number (int or float)
 
-        You may have multiple callbacks delayed at any given time.  However,
-        you be careful about called `delay` inside of callback functions already
-        delayed.  The result is similar to recursion in that it can run out
-        of memory if you do it too much."""
-        timer = _ClockEvent(self,None,callback)
-        self._events.append(timer)
-        Clock.schedule_once(timer.awaken,time)
+        Returns a `TimerHandle`; call its `cancel` method to call off the
+        callback.  The callback is owned by this controller, so `cancel_delays`
+        calls off all the callbacks at once (say, when a game is reset).
+
+        You may have multiple callbacks delayed at any given time.  A delayed
+        callback may call `delay` again; the new callback waits at least until
+        the next frame."""
+        return self._scheduler.schedule(time,callback,owner=self)
+
+    def cancel_delays(self):
+        """Calls off every callback still waiting from `delay`.
+
+        Widgets added to the view with a timeout are still removed on time."""
+        self._scheduler.clear(self)
+
+    def show_timings(self,visible=None):
+        """Shows or hides the overlay with the recent frame timings.
+
+            :param visible: True to show, False to hide; None to toggle
+            **Precondition**: a bool or None
+
+        The overlay lists the average and worst time of each phase over the
+        frames kept in `timer`, and is refreshed every TIMING_REFRESH seconds."""
+        if visible is None:
+            visible = self._overlay is None
+        if visible and self._overlay is None:
+            self._overlay = GLabel(text='',font_size=TIMING_FONT_SIZE,linecolor=colormodel.YELLOW,
+                                   halign='left',valign='top',x=0,top=self._view.height)
+            self._refresh_timings(0)
+            Clock.schedule_interval(self._refresh_timings,TIMING_REFRESH)
+        elif not visible and not self._overlay is None:
+            Clock.unschedule(self._refresh_timings)
+            self._view.remove(self._overlay)
+            self._overlay = None
+
+    def export_timings(self,filename=None):
+        """Writes the recent frame timings to a CSV file.
+
+            :param filename: the file to write; None for TIMING_FILE
+            **Precondition**: a string or None
+
+        See `FrameTimer.write_csv` for the format."""
+        self._timer.write_csv(TIMING_FILE if filename is None else filename)
 
     def initialize(self):
         """Called to initialize the game features.
@@ -841,6 +2193,18 @@ class GameController(object):
         *Override this method to provide code specific to your game.*"""
         pass
 
+    def on_key_down(self,key):
+        """Called when the user presses a key that the controller does not use itself
+
+            :param key: the Kivy key code of the key
+            **Precondition**: an int
+
+        Returns True if the key was used, so that Kivy does nothing more
+        with it.  The keys TIMING_KEY and EXPORT_KEY never get here.
+
+        *Override this method to provide code specific to your game.*"""
+        return False
+
 
     # Hidden helper methods
     def _start_up(self,dt):
@@ -850,5 +2214,102 @@ class GameController(object):
         Necessary as much of the size and position information in
         the application is not available until the constructor is
         finished."""
-        Clock.schedule_interval(self.update,1.0/60.0)
-        self.initialize()
+        if self._timestep is None:
+            Clock.schedule_interval(self._frame,1.0/60.0)
+        else:
+            Clock.schedule_interval(self._frame,0)
+        from kivy.core.window import Window
+        Window.bind(on_draw=self._draw_began,on_flip=self._draw_ended,
+                    on_key_down=self._key_down)
+        with startup.phase('initialize'):
+            self.initialize()
+
+    def _touch_down(self,view,touch):
+        """Calls `on_touch_down`, timing it as input"""
+        began = FrameTimer.clock()
+        result = self.on_touch_down(view,touch)
+        self._timer.add('input',FrameTimer.clock()-began)
+        return result
+
+    def _touch_move(self,view,touch):
+        """Calls `on_touch_move`, timing it as input"""
+        began = FrameTimer.clock()
+        result = self.on_touch_move(view,touch)
+        self._timer.add('input',FrameTimer.clock()-began)
+        return result
+
+    def _touch_up(self,view,touch):
+        """Calls `on_touch_up`, timing it as input"""
+        began = FrameTimer.clock()
+        result = self.on_touch_up(view,touch)
+        self._timer.add('input',FrameTimer.clock()-began)
+        return result
+
+    def _draw_began(self,window):
+        """Notes when Kivy starts drawing a frame"""
+        self._drawStart = FrameTimer.clock()
+
+    def _draw_ended(self,window):
+        """Times the drawing that just finished (before the buffers are swapped)"""
+        self._timer.add('draw',FrameTimer.clock()-self._drawStart)
+
+    def _key_down(self,window,key,scancode,codepoint,modifiers):
+        """Shows or hides the timings on F3, writes them out on F4, and passes on other keys"""
+        if key == TIMING_KEY:
+            self.show_timings()
+            return True
+        elif key == EXPORT_KEY:
+            self.export_timings()
+            return True
+        return self.on_key_down(key)
+
+    def _refresh_timings(self,dt):
+        """Redraws the timings overlay, keeping it on top of the view"""
+        lines = ['%-9s %6s %6s' % ('ms','mean','worst')]
+        for phase in self._timer.phases:
+            lines.append('%-9s %6.2f %6.2f' % (phase,self._timer.mean(phase)*1000,
+                                               self._timer.worst(phase)*1000))
+        self._overlay.text = '\n'.join(lines)
+        self._overlay.top = self._view.height
+        self._view.remove(self._overlay)
+        self._view.add(self._overlay)
+
+    def _frame(self,dt):
+        """Advance the game by one rendered frame.
+
+        Calls `update` once, or in fixed-timestep mode as many times as
+        there are whole physics ticks in the accumulator (up to `maxticks`).
+        Then moves the scheduler on by the time that was simulated, so that
+        delayed callbacks keep time with the game."""
+        if not self._drawn:
+            self._drawn = True
+            startup.mark('first frame')
+            startup.report()
+        self._timer.next()
+        self._timer.add('frame',dt)
+        began = FrameTimer.clock()
+        if self._timestep is None:
+            self._ticks = 1
+            self.update(dt)
+            self._timer.add('update',FrameTimer.clock()-began)
+            self._advance(dt)
+            return
+
+        self._accumulator += dt
+        ticks = 0
+        while self._accumulator >= self._timestep and ticks < self._maxticks:
+            self.update(self._timestep)
+            self._accumulator -= self._timestep
+            ticks += 1
+        self._timer.add('update',FrameTimer.clock()-began)
+        if self._accumulator >= self._timestep:
+            # Too far behind to catch up; drop the backlog
+            self._accumulator = self._accumulator % self._timestep
+        self._ticks = ticks
+        self._advance(ticks*self._timestep)
+
+    def _advance(self,dt):
+        """Moves the scheduler on by dt seconds, timing the callbacks as 'events'"""
+        began = FrameTimer.clock()
+        self._scheduler.advance(dt)
+        self._timer.add('events',FrameTimer.clock()-began)
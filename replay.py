@@ -0,0 +1,343 @@
+"""Input recording and replay for Breakout
+
+This module saves a game as the seed of its Simulation and every touch the
+player made, and plays such a recording back without a window:
+
+    python __main__.py --record session.brk        (play, and record)
+    python replay.py session.brk                   (replay and check it)
+
+Because all the randomness of a game comes from the random number generator
+of its Simulation, the seed and the touches are enough to play a game again
+exactly.  A touch is stored with the number of physics ticks (calls to
+Simulation.update) that came before it, so a replay does not depend on how
+fast the frames were drawn.  The replay runs the ticks as fast as it can,
+and compares the checksum (Simulation.checksum) of the final state with the
+one that was recorded.
+
+A recording is a binary file in four parts:
+
+    header      HEADER: a magic string, the version, the seed and the board
+    events      EVENT for each touch, in order: tick, kind and x
+    index       INDEX for every INDEX_EVERY ticks: the tick, the file offset
+                of the first event from then on, and the checksum then
+    footer      FOOTER: a magic string, where the index starts, how many
+                entries it has, and the final tick and checksum
+
+The index lets a reader find the events from a given tick on without
+reading the ones before, and lets a replay check that it is still on track
+long before the end.  A recording that was cut short (say, the game
+crashed) has no index or footer; its events can still be replayed, but
+there is nothing to check them against."""
+import argparse
+import bisect
+import numbers
+import random
+import struct
+import sys
+import timeit
+
+import simulation
+
+# Version of the file format written by Recorder.  Version 2 games use the
+# CompactRandom generator of Simulation, so version 1 games no longer replay.
+# Version 3 adds the most balls in play to the header.  Version 4 games cap
+# the speed of the ball (MAX_BALL_SPEED), so long version 3 games play out
+# differently
+VERSION = 4
+
+# Kinds of events
+TOUCH_DOWN = 0
+TOUCH_MOVE = 1
+TOUCH_UP   = 2
+
+# File layout (all little endian)
+# Header: magic, version, seed, columns, rows, paddle width, ball diameter,
+# turns, swept, board width, board height, most balls
+HEADER = struct.Struct('<4sBqiiddiBddH')
+HEADER_MAGIC = b'BRKR'
+# Event: tick, kind, x
+EVENT = struct.Struct('<IBd')
+# Index entry: tick, offset of the next event, checksum
+INDEX = struct.Struct('<IQQ')
+# Footer: magic, offset of the index, index entries, final tick, final checksum
+FOOTER = struct.Struct('<4sQIIQ')
+FOOTER_MAGIC = b'BRKI'
+
+# Ticks between index entries
+INDEX_EVERY = 600
+
+
+class Recorder(object):
+    """Instance records the touches given to one Simulation in a file.
+
+    The touches are passed on through the methods touch_down, touch_move
+    and touch_up, which record them and then give them to the simulation.
+    Call close when done, to add the index and the footer."""
+
+    def __init__(self,sim,filename):
+        """Constructor: starts recording sim, which has not been played yet, to filename
+
+        Precondition: sim is a Simulation made with an int seed, with no
+        ticks yet; filename is a string"""
+        assert isinstance(sim.seed,numbers.Integral), `sim.seed`+' is not an int seed'
+        assert sim.ticks == 0, 'the simulation has already been played'
+        self.sim = sim
+        self._file = open(filename,'wb')
+        self._file.write(HEADER.pack(HEADER_MAGIC,VERSION,sim.seed,sim.columns,sim.rows,
+                                     sim.paddlewidth,sim.balldiameter,sim.turns,
+                                     int(sim.swept),sim.width,sim.height,sim.maxballs))
+        self._index = []
+        self._next = INDEX_EVERY
+
+    @property
+    def closed(self):
+        """Whether close has been called. Read only"""
+        return self._file is None
+
+    def touch_down(self,x):
+        """Records a touch down at x, then gives it to the simulation
+
+        Precondition: x is a number"""
+        self._record(TOUCH_DOWN,x)
+        self.sim.touch_down(x)
+
+    def touch_move(self,x):
+        """Records a touch move to x, then gives it to the simulation
+
+        Precondition: x is a number"""
+        self._record(TOUCH_MOVE,x)
+        self.sim.touch_move(x)
+
+    def touch_up(self,x):
+        """Records a touch up at x, then gives it to the simulation
+
+        Precondition: x is a number"""
+        self._record(TOUCH_UP,x)
+        self.sim.touch_up(x)
+
+    def close(self):
+        """Writes the index and the footer, and closes the file
+
+        Does nothing if the recorder is already closed."""
+        if self._file is None:
+            return
+        self._checkpoint()
+        offset = self._file.tell()
+        for entry in self._index:
+            self._file.write(INDEX.pack(*entry))
+        self._file.write(FOOTER.pack(FOOTER_MAGIC,offset,len(self._index),
+                                     self.sim.ticks,self.sim.checksum()))
+        self._file.close()
+        self._file = None
+
+    def _record(self,kind,x):
+        """Writes one event, after any index entries that are due"""
+        self._checkpoint()
+        self._file.write(EVENT.pack(self.sim.ticks,kind,x))
+
+    def _checkpoint(self):
+        """Adds an index entry if INDEX_EVERY ticks have passed since the last one
+
+        The entry is for the tick now, which is the first tick with no
+        events recorded yet."""
+        if self.sim.ticks >= self._next:
+            self._index.append((self.sim.ticks,self._file.tell(),self.sim.checksum()))
+            self._next = self.sim.ticks-self.sim.ticks % INDEX_EVERY+INDEX_EVERY
+
+
+class Recording(object):
+    """Instance is a recording read back from a file.
+
+    The whole file is read into memory; events are only unpacked as they
+    are asked for."""
+    # FIELDS.
+
+    # The arguments of the recorded Simulation
+    # Invariant: a dictionary of Simulation constructor arguments
+    settings = None
+
+    # Ticks played and checksum at the end of the game
+    # Invariant: ints, or None if the recording was cut short
+    ticks = None
+    checksum = None
+
+    # Index entries
+    # Invariant: a list of (tick, offset, checksum) tuples, by tick
+    index = None
+
+    def __init__(self,filename):
+        """Constructor: reads the recording in filename
+
+        Raises ValueError if the file is not a recording of this version.
+
+        Precondition: filename is a string"""
+        with open(filename,'rb') as f:
+            self._data = f.read()
+        data = self._data
+        if len(data) < HEADER.size:
+            raise ValueError(filename+' is too short to be a recording')
+        fields = HEADER.unpack_from(data,0)
+        if fields[0] != HEADER_MAGIC or fields[1] != VERSION:
+            raise ValueError(filename+' is not a recording of version '+str(VERSION))
+        self.settings = {'seed': fields[2], 'columns': fields[3], 'rows': fields[4],
+                         'paddlewidth': fields[5], 'balldiameter': fields[6],
+                         'turns': fields[7], 'swept': bool(fields[8]),
+                         'width': fields[9], 'height': fields[10], 'maxballs': fields[11]}
+        self.index = []
+        self._end = len(data)
+        if len(data) >= HEADER.size+FOOTER.size:
+            footer = FOOTER.unpack_from(data,len(data)-FOOTER.size)
+            if footer[0] == FOOTER_MAGIC:
+                (magic, offset, count, self.ticks, self.checksum) = footer
+                self._end = offset
+                self.index = [INDEX.unpack_from(data,offset+i*INDEX.size) for i in range(count)]
+        # A recording cut short may end in the middle of an event
+        self._end -= (self._end-HEADER.size) % EVENT.size
+        self._ticks = [entry[0] for entry in self.index]
+
+    def __len__(self):
+        """Returns: the number of events recorded"""
+        return (self._end-HEADER.size)//EVENT.size
+
+    def simulation(self):
+        """Returns: a new Simulation set up like the one that was recorded"""
+        return simulation.Simulation(**self.settings)
+
+    def events(self,start=0):
+        """Yields each event from tick start on, as a tuple (tick, kind, x)
+
+        Uses the index to skip the events before start.
+
+        Precondition: start is an int >= 0"""
+        offset = self.seek(start)
+        while offset < self._end:
+            event = EVENT.unpack_from(self._data,offset)
+            offset += EVENT.size
+            if event[0] >= start:
+                yield event
+
+    def seek(self,tick):
+        """Returns: the file offset to read events from to get all events from tick on
+
+        This is the offset of the last index entry at or before tick, so a
+        few events before tick may come first.
+
+        Precondition: tick is an int >= 0"""
+        i = bisect.bisect_right(self._ticks,tick)
+        return HEADER.size if i == 0 else self.index[i-1][1]
+
+
+class Replayer(object):
+    """Instance replays a Recording on a new Simulation, as fast as it can.
+
+    Every event is given to the simulation after the same number of ticks
+    as in the recorded game, and the simulation is checked against every
+    index entry as it passes it."""
+
+    def __init__(self,recording):
+        """Constructor: a replay of recording, from the start
+
+        Precondition: recording is a Recording"""
+        self.recording = recording
+        self.sim = recording.simulation()
+        self._events = recording.events()
+        self._pending = next(self._events,None)
+        self._index = list(recording.index)
+        self._checked = 0
+
+    @property
+    def checked(self):
+        """Number of index entries checked so far. Read only"""
+        return self._checked
+
+    @property
+    def finished(self):
+        """Whether the replay has reached the end of the recording. Read only"""
+        end = self.recording.ticks
+        if end is None:
+            return self._pending is None
+        return self._pending is None and self.sim.ticks >= end
+
+    def run(self,until=None):
+        """Replays up to tick until (or to the end if None)
+
+        Raises ValueError when the simulation does not match an index entry
+        (or the end of the recording): the replay went differently than
+        the recorded game.
+
+        Precondition: until is None or an int >= 0"""
+        sim = self.sim
+        end = self.recording.ticks
+        if until is None:
+            until = end if end is not None else float('inf')
+        if end is not None:
+            until = min(until,end)
+        while True:
+            # Give the events of this tick, then run it
+            while self._pending is not None and self._pending[0] == sim.ticks:
+                self._check()
+                (tick, kind, x) = self._pending
+                if kind == TOUCH_DOWN:
+                    sim.touch_down(x)
+                elif kind == TOUCH_MOVE:
+                    sim.touch_move(x)
+                else:
+                    sim.touch_up(x)
+                self._pending = next(self._events,None)
+            self._check()
+            if sim.ticks >= until or (self._pending is None and end is None):
+                break
+            sim.update()
+        if self.finished and end is not None and sim.checksum() != self.recording.checksum:
+            raise ValueError('replay differs from the recording at the end (tick %d)' % sim.ticks)
+
+    def _check(self):
+        """Compares the simulation with the next index entry, if it is for this tick"""
+        if self._index and self._index[0][0] == self.sim.ticks:
+            (tick, offset, checksum) = self._index.pop(0)
+            if self.sim.checksum() != checksum:
+                raise ValueError('replay differs from the recording at tick %d' % tick)
+            self._checked += 1
+
+
+def newSeed():
+    """Returns: a random seed for a game to be recorded"""
+    return random.randrange(2**31)
+
+
+def main(args):
+    """Replays the recording named in the command line arguments args
+
+    Returns the exit status: 1 if the replay did not match the recording,
+    0 otherwise.
+
+    Precondition: args is a list of strings (without the program name)"""
+    parser = argparse.ArgumentParser(description='Replay a recorded game of Breakout.')
+    parser.add_argument('recording',help='file written by __main__.py --record')
+    parser.add_argument('--until',type=int,default=None,help='stop at this tick')
+    options = parser.parse_args(args)
+
+    recording = Recording(options.recording)
+    replayer = Replayer(recording)
+    start = timeit.default_timer()
+    try:
+        replayer.run(options.until)
+    except ValueError as e:
+        print('FAILED: %s' % e)
+        return 1
+    elapsed = timeit.default_timer()-start
+    sim = replayer.sim
+    print('%d events, %d ticks in %.3f s (%.0f ticks/s), %d checkpoints passed' %
+          (len(recording),sim.ticks,elapsed,sim.ticks/max(elapsed,1e-9),replayer.checked))
+    print('score %s, turns left %d, bricks left %d, checksum %016x' %
+          (sim.score,sim.turnsLeft,len(sim.bricks),sim.checksum()))
+    if recording.ticks is None:
+        print('recording was cut short: nothing to check the end against')
+    elif replayer.finished:
+        print('final state matches the recording')
+    return 0
+
+
+# Application code
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
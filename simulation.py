@@ -0,0 +1,1188 @@
+# simulation.py
+# Physics and rules for Breakout, without any graphics
+
+"""Simulation module for Breakout
+
+This module contains the game physics and rules for Breakout, together with
+the global constants that describe the board.  It is plain Python: it does
+not import kivy or pygame, so a game can be simulated without a window, a
+.kv file or a sound mixer.
+
+The class Simulation holds the complete state of one game.  The controller
+in controller.py drives a Simulation with the player's touches and one call
+to update per physics tick, and mirrors the result into widgets.  Anything
+the controller needs to draw or play (a brick breaking, a bounce sound, a
+power-up) is reported back as a list of events."""
+import array
+import hashlib
+import os
+import random
+import math
+import numbers
+import struct
+
+# CONSTANTS
+
+# Width of the game display (all coordinates are in pixels)
+GAME_WIDTH  = 400
+# Height of the game display
+GAME_HEIGHT = 620
+
+# Width of the paddle
+PADDLE_WIDTH = 58
+# Height of the paddle
+PADDLE_HEIGHT = 11
+# Distance of the (bottom of the) paddle up from the bottom
+PADDLE_OFFSET = 30
+
+# Horizontal separation between bricks
+BRICK_SEP_H = 3
+# Vertical separation between bricks
+BRICK_SEP_V = 3
+
+# Offset of the top brick row from the top
+BRICK_Y_OFFSET = 70
+
+# Number of bricks per row
+BRICKS_IN_ROW = 5
+# Number of rows of bricks, in range 1..10.
+BRICK_ROWS = 10
+# Width of a brick
+BRICK_WIDTH = GAME_WIDTH / BRICKS_IN_ROW - BRICK_SEP_H
+# Height of a brick
+BRICK_HEIGHT = 15
+# Number of brick colors; the bricks in row q have color q % BRICK_COLOR_COUNT
+BRICK_COLOR_COUNT = 10
+
+# Narrowest brick on a board made by boardSize, in pixels
+MIN_BRICK_WIDTH = 4
+# Least room between the bottom of the wall and the bottom of a board made
+# by boardSize, in pixels
+PLAY_HEIGHT = 350
+
+# Diameter of the ball in pixels
+BALL_DIAMETER = 18
+
+# Number of attempts in a game
+NUMBER_TURNS = 3
+
+# Length of one physics tick in seconds.  All velocities are in pixels per tick
+TIMESTEP = 1.0/60.0
+
+# Whether the ball uses continuous (swept) collision detection.  If False,
+# the ball jumps a whole frame at a time and only its end position is tested
+SWEPT_COLLISIONS = True
+# Maximum number of impacts the ball resolves in a single frame
+MAX_IMPACTS = 4
+
+# Chance that a broken brick drops a power up
+POWER_CHANCE = 0.25
+# Score for catching a power up
+POWER_SCORE = 50
+# Width and height of a power up
+POWER_SIZE = 20
+# Falling speed of a power up
+POWER_SPEED = -4.0
+
+# Kinds of power up
+# Ball speed decreased
+POWER_SLOW   = 1
+# Paddle size increased
+POWER_PADDLE = 2
+# Random brick kill
+POWER_KILL   = 3
+# Ball size increased
+POWER_BIG    = 4
+# Every ball split in SPLIT_BALLS (only in games with more than one ball allowed)
+POWER_SPLIT  = 5
+
+# Number of balls a ball splits into when the player catches POWER_SPLIT
+SPLIT_BALLS = 3
+# Most balls in play at once.  With 1, there is no POWER_SPLIT
+MAX_BALLS = 1
+# Slowest vertical speed of a ball made by a split, in pixels per tick
+SPLIT_MIN_VY = 1.0
+
+# Fastest a ball gets from bouncing off the paddle, in pixels per tick.  It
+# is less than BALL_DIAMETER, so a ball cannot jump past a wall in one tick,
+# and less than AUTOPILOT_SPEED, so the paddle can always keep up with it.
+MAX_BALL_SPEED = 15.0
+
+# Farthest the autopilot moves the paddle in one tick, in pixels
+AUTOPILOT_SPEED = 20.0
+
+# Basic game states
+# Game has not started yet
+STATE_INACTIVE = 0
+# Game is active, but waiting for next ball
+STATE_PAUSED   = 1
+# Ball is in play and being animated
+STATE_ACTIVE   = 2
+# Game is over, deactivate all actions
+STATE_COMPLETE = 3
+
+# Events reported by Simulation.update.  Each event is a tuple whose first
+# element is one of these, followed by the object the event is about (if any)
+# The ball bounced off the paddle: (EVENT_BOUNCE,)
+EVENT_BOUNCE = 'bounce'
+# A brick was removed: (EVENT_BRICK, index of the brick in the BrickStore)
+EVENT_BRICK  = 'brick'
+# A power up started falling: (EVENT_DROP, powerup)
+EVENT_DROP   = 'drop'
+# The paddle caught the power up: (EVENT_POWER, kind)
+EVENT_POWER  = 'power'
+# The power up fell past the paddle: (EVENT_MISS,)
+EVENT_MISS   = 'miss'
+# The ball fell off the bottom, but the player has turns left: (EVENT_LOST, ball)
+EVENT_LOST   = 'lost'
+# The last brick was removed: (EVENT_WIN,)
+EVENT_WIN    = 'win'
+# The ball fell off the bottom on the last turn: (EVENT_LOSE, ball)
+EVENT_LOSE   = 'lose'
+# Balls were split off the balls in play: (EVENT_SPLIT, list of new balls)
+EVENT_SPLIT  = 'split'
+# A ball fell off the bottom, but other balls are still in play: (EVENT_GONE, ball)
+EVENT_GONE   = 'gone'
+
+# Layout of a snapshot (see Simulation.snapshot), all little endian.  The
+# head holds the magic string, the version, state, turnsLeft, ticks, number
+# of bricks standing, number of ball slots, score, rng state, the touch the
+# paddle is dragged from (paddle x and touch x) and the paddle (x, y, width,
+# height)
+SNAPSHOT_HEAD = struct.Struct('<4sBBHIIHdQdd4d')
+SNAPSHOT_MAGIC = b'BRKS'
+SNAPSHOT_VERSION = 2
+# Then a slot for each ball the game allows (maxballs), in the order of
+# balls, and one for the power up: whether there is one, x, y, width,
+# height, vx, vy.  Last comes one byte per brick: 1 if standing, 0 if not
+SNAPSHOT_BODY = struct.Struct('<B6d')
+
+
+# CLASSES
+class CompactRandom(random.Random):
+    """Instance is a random number generator with a state of only 64 bits.
+
+    It has all the methods of random.Random, but its numbers come from the
+    splitmix64 generator.  The state is a single int (see getstate), so the
+    generator costs 8 bytes in a snapshot of the game, where the Mersenne
+    Twister of random.Random would cost 2.5 KB.  The methods random and
+    getrandbits give the same numbers in every version of Python."""
+    # Invariant: an int between 0 and 2**64-1
+    _state = 0
+
+    def seed(self,a=None):
+        """Starts the generator from a, or from the system if a is None
+
+        Precondition: a is None, an int, or any other value with a repr"""
+        if a is None:
+            a = struct.unpack('<Q',os.urandom(8))[0]
+        elif not isinstance(a,numbers.Integral):
+            a = struct.unpack('<Q',hashlib.sha1(repr(a).encode('utf-8')).digest()[:8])[0]
+        self._state = a & 0xFFFFFFFFFFFFFFFF
+        self.gauss_next = None
+
+    def getstate(self):
+        """Returns: the state of the generator, an int between 0 and 2**64-1"""
+        return self._state
+
+    def setstate(self,state):
+        """Puts the generator back in a state returned by getstate
+
+        Precondition: state is an int between 0 and 2**64-1"""
+        self._state = state
+        self.gauss_next = None
+
+    def next64(self):
+        """Returns: the next random int between 0 and 2**64-1"""
+        self._state = z = (self._state+0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        z = ((z ^ (z >> 30))*0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        z = ((z ^ (z >> 27))*0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        return z ^ (z >> 31)
+
+    def random(self):
+        """Returns: the next random float in [0.0, 1.0)"""
+        return (self.next64() >> 11)*(1.0/9007199254740992.0)
+
+    def getrandbits(self,k):
+        """Returns: an int with k random bits
+
+        Precondition: k is an int > 0"""
+        bits = 0
+        for i in range(0,k,64):
+            bits = (bits << 64) | self.next64()
+        return bits >> (-k % 64)
+
+
+class Rect(object):
+    """Instance is an axis-aligned rectangle in game coordinates.
+
+    This is the plain counterpart of a GRectangle.  The bottom left corner
+    is (x, y), and collide_point follows the same (inclusive) rules as the
+    Kivy widget method of the same name."""
+
+    def __init__(self,x,y,width,height):
+        """Constructor: creates a rectangle with bottom left corner (x,y)
+
+        Precondition: x, y, width and height are numbers (int or float)"""
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    @property
+    def right(self):
+        """The x coordinate of the right edge. Read only"""
+        return self.x+self.width
+
+    @property
+    def top(self):
+        """The y coordinate of the top edge. Read only"""
+        return self.y+self.height
+
+    def collide_point(self,x,y):
+        """Returns: True if the point (x,y) is inside or on this rectangle"""
+        return self.x <= x <= self.x+self.width and self.y <= y <= self.y+self.height
+
+
+class Body(Rect):
+    """Instance is a moving rectangle (the ball or a power up).
+
+    The velocity is in pixels per tick."""
+
+    def __init__(self,x,y,width,height,vx=0.0,vy=0.0):
+        """Constructor: creates a body at (x,y) moving with velocity (vx,vy)
+
+        Precondition: all arguments are numbers (int or float)"""
+        super(Body,self).__init__(x,y,width,height)
+        self.vx = float(vx)
+        self.vy = float(vy)
+
+
+class BrickStore(object):
+    """Instance is the wall of bricks, stored as flat arrays.
+
+    A brick is known by its index.  The bricks are numbered column by
+    column, top row first, so brick i is in column i // rows and row
+    i % rows.  The store keeps one alive flag per brick in a bytearray, with
+    the position and color of each brick in parallel arrays, and counts the
+    bricks still standing.  Removing a brick and checking for an empty wall
+    both take constant time, and the memory used is a few bytes per brick.
+
+    Because the bricks sit in a regular grid, the bricks under any box can
+    be computed directly from its coordinates.  The ball only asks for the
+    few bricks under its bounding box, which makes a collision lookup cost
+    depend on the size of the ball and not on the number of bricks.
+
+    All bricks have the same width and height.  The fields can be read
+    freely, but should only be changed through the methods."""
+    # FIELDS.
+
+    # Whether each brick is still standing
+    # Invariant: a bytearray of length rows*columns, each entry 0 or 1
+    alive = None
+
+    # Left and bottom edges of each brick
+    # Invariant: array('d') objects of length rows*columns
+    x = None
+    y = None
+
+    # Color index of each brick (its row modulo BRICK_COLOR_COUNT)
+    # Invariant: an array('B') of length rows*columns
+    color = None
+
+    # Number of bricks still standing
+    # Invariant: an int, the number of 1 entries in alive
+    count = 0
+
+    def __init__(self,rows,columns,width,top=None):
+        """Constructor: creates a full wall of rows x columns bricks
+
+        The top of the wall is BRICK_Y_OFFSET below top, which is the top
+        of the board (GAME_HEIGHT if not given).
+
+        Precondition: rows and columns are positive ints, width is the
+        width of a brick (a positive number) and top is None or a number"""
+        if top is None:
+            top = GAME_HEIGHT
+        self.rows = rows
+        self.columns = columns
+        self.width = float(width)
+        self.height = float(BRICK_HEIGHT)
+        self._top  = float(top-BRICK_Y_OFFSET)
+        self._left = BRICK_SEP_H/2.0
+        self._pitchx = float(width)+float(BRICK_SEP_H)
+        self._pitchy = float(BRICK_SEP_V+BRICK_HEIGHT)
+        size = rows*columns
+        self.alive = bytearray(b'\x01')*size
+        self.x = array.array('d',[0.0])*size
+        self.y = array.array('d',[0.0])*size
+        self.color = array.array('B',[0])*size
+        for c in range(columns):
+            for q in range(rows):
+                i = c*rows+q
+                self.x[i] = BRICK_SEP_H/2.0+c*(self.width+float(BRICK_SEP_H))
+                self.y[i] = top-(BRICK_Y_OFFSET+(BRICK_SEP_V+BRICK_HEIGHT)*(q+1))
+                self.color[i] = q % BRICK_COLOR_COUNT
+        self.count = size
+
+    def __len__(self):
+        """Returns: number of bricks still standing"""
+        return self.count
+
+    def row(self,i):
+        """Returns: the row of brick i (0 is the top row)"""
+        return i % self.rows
+
+    def col(self,i):
+        """Returns: the column of brick i (0 is the left column)"""
+        return i // self.rows
+
+    def rect(self,i):
+        """Returns: a new Rect with the outline of brick i"""
+        return Rect(self.x[i],self.y[i],self.width,self.height)
+
+    def contains(self,i,x,y):
+        """Returns: True if the point (x,y) is inside or on brick i
+
+        Follows the same (inclusive) rules as Rect.collide_point"""
+        bx = self.x[i]
+        by = self.y[i]
+        return bx <= x <= bx+self.width and by <= y <= by+self.height
+
+    def remove(self,i):
+        """Knocks out brick i.  Returns: True if it was still standing
+
+        Precondition: i is an int in 0..rows*columns-1"""
+        if self.alive[i]:
+            self.alive[i] = 0
+            self.count -= 1
+            return True
+        return False
+
+    def living(self):
+        """Returns: list of the indices of the bricks still standing, in order
+
+        The list is a copy, so bricks can be removed while looping over it"""
+        alive = self.alive
+        return [i for i in range(len(alive)) if alive[i]]
+
+    def near(self,x,y,width,height):
+        """Returns: list of standing bricks whose cells overlap the given box
+
+        This is the broad phase of the collision tests between balls and
+        bricks.  The bricks are stored sorted by column (along x) and then
+        by row, on a regular grid, so the bricks whose x and y ranges
+        overlap the box are found by arithmetic instead of by a search.
+
+        The result may include bricks that do not actually touch the box,
+        so the caller must still test for a real collision.
+
+        Precondition: x, y, width and height are numbers with width and
+        height non-negative"""
+        c0 = max(0,int(math.floor((x-self._left)/self._pitchx)))
+        c1 = min(self.columns-1,int(math.floor((x+width-self._left)/self._pitchx)))
+        r0 = max(0,int(math.floor((self._top-y-height)/self._pitchy))-1)
+        r1 = min(self.rows-1,int(math.floor((self._top-y)/self._pitchy)))
+        result = []
+        alive = self.alive
+        for c in range(c0,c1+1):
+            base = c*self.rows
+            for q in range(r0,r1+1):
+                if alive[base+q]:
+                    result.append(base+q)
+        return result
+
+
+class Simulation(object):
+    """Instance is the complete state of one game of Breakout.
+
+    The methods touch_down, touch_move and touch_up apply the player's
+    input, and update advances the game by one physics tick.  None of them
+    draw anything; update returns a list of events for the caller to show.
+
+    The board is set by the constructor rather than by the module constants,
+    so that several differently sized games can run side by side.  The
+    random number generator is owned by the game, so that a game created
+    with the same seed and given the same input always plays the same way.
+
+    The board is normally GAME_WIDTH x GAME_HEIGHT, but a bigger one can be
+    given, to fit walls with many thousands of bricks (see boardSize).
+
+    A game may allow several balls in play at once (see maxballs and
+    POWER_SPLIT).  Each ball is tested against the bricks near it, and the
+    balls against each other with a sweep and prune along x.
+
+    The fields can be read freely, but should only be changed through
+    the methods."""
+    # FIELDS.
+
+    # Size of the board, in pixels
+    # Invariant: positive numbers, at least GAME_WIDTH x GAME_HEIGHT by default
+    width = GAME_WIDTH
+    height = GAME_HEIGHT
+
+    # Current play state of the game
+    # Invariant: One of STATE_INACTIVE, STATE_PAUSED, STATE_ACTIVE, STATE_COMPLETE
+    state = STATE_INACTIVE
+
+    # The wall of bricks, also used for collision lookup
+    # Invariant: A BrickStore; if it is empty, then state is STATE_COMPLETE
+    bricks = None
+
+    # The player paddle
+    # Invariant: A Rect, or None if state is STATE_INACTIVE
+    paddle = None
+
+    # The balls in play
+    # Invariant: A list of at most maxballs Body objects, empty if there is
+    # no ball on the board
+    balls = None
+
+    # Most balls allowed in play at once (see POWER_SPLIT)
+    # Invariant: an int > 0
+    maxballs = MAX_BALLS
+
+    # The falling power up
+    # Invariant: A Body, or None when no power up is in play
+    powerup = None
+
+    # Score
+    # Invariant: an int or float
+    score = 0
+
+    # Number of turns player has left
+    # Invariant: an int between 0 and turns, inclusive
+    turnsLeft = NUMBER_TURNS
+
+    # Random number generator for all gameplay decisions
+    # Invariant: a CompactRandom object
+    rng = None
+
+    # The seed rng was made with
+    # Invariant: the seed given to the constructor (None if none was given)
+    seed = None
+
+    # Number of calls to update so far
+    # Invariant: an int >= 0
+    ticks = 0
+
+    # Events from the last call to update
+    # Invariant: a list of event tuples (see EVENT_BOUNCE and the rest)
+    events = None
+
+    @property
+    def ball(self):
+        """The first ball in play, or None if there is none. Read only"""
+        return self.balls[0] if self.balls else None
+
+    def __init__(self,columns=None,rows=None,paddlewidth=None,balldiameter=None,
+                 turns=None,swept=None,seed=None,width=None,height=None,maxballs=None):
+        """Constructor: creates a new game waiting for its first touch
+
+        Every argument is optional; if it is None, the module constant of
+        the same meaning is used instead.  width and height are the size of
+        the board (GAME_WIDTH and GAME_HEIGHT by default).  maxballs is the
+        most balls in play at once (MAX_BALLS by default); with more than
+        one, the POWER_SPLIT power up is in the game.
+
+        Precondition: columns, rows and turns are positive ints; paddlewidth
+        and balldiameter are positive numbers; swept is a bool; seed is any
+        value accepted by random.Random; width and height are positive numbers
+        with room for the wall; maxballs is a positive int"""
+        self.width = GAME_WIDTH if width is None else width
+        self.height = GAME_HEIGHT if height is None else height
+        self.columns = BRICKS_IN_ROW if columns is None else columns
+        self.rows = BRICK_ROWS if rows is None else rows
+        self.paddlewidth = PADDLE_WIDTH if paddlewidth is None else paddlewidth
+        self.balldiameter = BALL_DIAMETER if balldiameter is None else balldiameter
+        self.turns = NUMBER_TURNS if turns is None else turns
+        self.swept = SWEPT_COLLISIONS if swept is None else swept
+        self.maxballs = MAX_BALLS if maxballs is None else maxballs
+        self.balls = []
+        self._order = []
+        self.brickwidth = float(self.width)/self.columns-BRICK_SEP_H
+        self.seed = seed
+        self.rng = CompactRandom(seed)
+        self.bricks = BrickStore(self.rows,self.columns,self.brickwidth,self.height)
+        self.events = []
+        self.state = STATE_INACTIVE
+        self.score = 0
+        self.turnsLeft = self.turns
+        self._initPadX = 0
+        self._initTouchX = 0
+
+    def newGame(self):
+        """Sets up a fresh board: full wall, paddle at the left, no ball
+
+        Resets the score and the turns, and sets the state to STATE_PAUSED"""
+        self.bricks = BrickStore(self.rows,self.columns,self.brickwidth,self.height)
+        self.paddle = Rect(0,PADDLE_OFFSET,self.paddlewidth,PADDLE_HEIGHT)
+        self.balls = []
+        self._order = []
+        self.powerup = None
+        self.score = 0
+        self.turnsLeft = self.turns
+        self.state = STATE_PAUSED
+
+    def newBall(self):
+        """Returns: a new ball just below the wall, heading down and to the right"""
+        return Body(0,self.height-(BRICK_Y_OFFSET+(BRICK_SEP_V+BRICK_HEIGHT)*self.rows)-35,
+                    self.balldiameter,self.balldiameter,
+                    self.rng.uniform(1.0,5.0),-5.0)
+
+    def serve(self):
+        """Puts a ball in play (if there is not one already) and starts play"""
+        if self.balls == []:
+            self._addBall(self.newBall())
+        self.state = STATE_ACTIVE
+
+    # INPUT
+
+    def touch_down(self,x):
+        """Respond to the player pressing at horizontal position x
+
+        Starts a game, serves a ball, grabs the paddle or restarts a
+        finished game, depending on the state.
+
+        Precondition: x is a number"""
+        if self.state == STATE_INACTIVE:
+            self.newGame()
+        elif self.state == STATE_PAUSED:
+            self._initPadX = self.paddle.x
+            self._initTouchX = x
+            self.serve()
+        elif self.state == STATE_ACTIVE:
+            self._initPadX = self.paddle.x
+            self._initTouchX = x
+        elif self.state == STATE_COMPLETE:
+            self.newGame()
+            self._addBall(self.newBall())
+
+    def touch_move(self,x):
+        """Respond to the player dragging to horizontal position x
+
+        Moves the paddle by the distance dragged since touch_down.
+
+        Precondition: x is a number"""
+        if self.state == STATE_ACTIVE or self.state == STATE_PAUSED:
+            self.movePaddle(x+self._initPadX-self._initTouchX)
+
+    def touch_up(self,x):
+        """Respond to the player releasing at horizontal position x
+
+        The paddle simply stays where it is.
+
+        Precondition: x is a number"""
+        pass
+
+    def movePaddle(self,x):
+        """Moves the paddle to x, kept inside the game display
+
+        Precondition: x is a number"""
+        self.paddle.x = min(max(0,x),self.width-self.paddlewidth)
+
+    # PHYSICS
+
+    def update(self):
+        """Animate a single physics tick.
+
+        Moves the ball and looks for any collisions.  If there is a
+        collision, it changes the velocity of the ball and removes any
+        bricks if necessary.  Moves the power up and checks if the paddle
+        caught it.  Changes state to STATE_PAUSED or STATE_COMPLETE if the
+        ball falls off the bottom, or to STATE_COMPLETE if the last brick is
+        removed.
+
+        Returns the list of events that happened during this tick"""
+        self.ticks += 1
+        self.events = []
+        if self.state == STATE_ACTIVE:
+            hit = False
+            for ball in list(self.balls):
+                if self.swept:
+                    hits = self._sweep(ball)
+                    for brick in hits:
+                        self.updateBrick(brick)
+                    hit = hit or hits != []
+                else:
+                    brick = self._getCollidingObject(ball)
+                    if brick != None:
+                        self.updateBrick(brick)
+                        hit = True
+            if not hit and self._hitsPaddle():
+                self.activatePower()
+            if self.powerup != None:
+                self.powerup.y += self.powerup.vy
+            if len(self.balls) > 1:
+                self._collideBalls()
+            for ball in list(self.balls):
+                self.updateBall(ball)
+        return self.events
+
+    def updateBrick(self,brick):
+        """Removes brick after the ball hit it, and checks for a win
+
+        Adds to the score, and randomly drops a power up.
+
+        Precondition: brick is the index of a standing brick"""
+        self._removeBrick(brick)
+        self.score += self.bricks.y[brick]-300
+        if self.rng.random()<POWER_CHANCE and self.powerup is None:
+            self.powerup = Body(self.bricks.x[brick]+self.brickwidth/2.0,self.bricks.y[brick],
+                                POWER_SIZE,POWER_SIZE,0.0,POWER_SPEED)
+            self.events.append((EVENT_DROP,self.powerup))
+        self._checkWin()
+
+    def updateBall(self,ball):
+        """Moves a ball, bounces it off the walls and checks for losses
+
+        With swept collisions the ball has already been moved by _sweep,
+        so only the walls are checked.  A ball that falls off the bottom
+        leaves play; the turn is only lost with the last ball.
+
+        Precondition: ball is one of the balls in play"""
+        if not self.swept:
+            ball.x += ball.vx
+            ball.y += ball.vy
+        if ball.x<0.1 and ball.vx<0.0:
+            ball.vx = -1 * ball.vx
+        elif ball.x+ball.width>self.width-0.1:
+            ball.vx = -1 * ball.vx
+        if ball.y+ball.height>self.height-0.1:
+            ball.vy = -1 * ball.vy
+        elif ball.y<5.0:
+            self._dropBall(ball)
+            if self.balls != []:
+                self.events.append((EVENT_GONE,ball))
+                return
+            self.paddle.width = self.paddlewidth
+            self.paddle.height = PADDLE_HEIGHT
+            self.turnsLeft -= 1
+            if self.turnsLeft == 0:
+                self.state = STATE_COMPLETE
+                self.events.append((EVENT_LOSE,ball))
+            else:
+                self.powerup = None
+                self.state = STATE_PAUSED
+                self.events.append((EVENT_LOST,ball))
+
+    def activatePower(self):
+        """Activates a randomly chosen power up after the paddle caught one
+
+        Adds POWER_SCORE to the score.  The power ups are slower balls, a
+        longer paddle, fewer bricks, larger balls and, if the game allows
+        more than one ball, splitting every ball"""
+        self.score += POWER_SCORE
+        kinds = [POWER_SLOW,POWER_PADDLE,POWER_KILL,POWER_BIG]
+        if self.maxballs > 1:
+            kinds.append(POWER_SPLIT)
+        kind = self.rng.choice(kinds)
+        if kind == POWER_SLOW:
+            for ball in self.balls:
+                ball.vx = ball.vx * 0.75
+                ball.vy = ball.vy * 0.75
+        elif kind == POWER_PADDLE:
+            self.paddle.width += self.paddlewidth/4.0
+        elif kind == POWER_KILL:
+            for brick in self.bricks.living():
+                if self.rng.random()<.20:
+                    self._removeBrick(brick)
+            self._checkWin()
+        elif kind == POWER_BIG:
+            for ball in self.balls:
+                ball.width += self.balldiameter/5.0
+                ball.height += self.balldiameter/5.0
+        elif kind == POWER_SPLIT:
+            self.split(SPLIT_BALLS)
+        self.events.append((EVENT_POWER,kind))
+
+    def split(self,count):
+        """Splits every ball in play into count balls, as far as maxballs allows
+
+        The new balls start where the ball they split from is, at the same
+        speed, with their directions spread evenly around the circle.  A
+        direction that is nearly level is tilted to at least SPLIT_MIN_VY,
+        so that no ball bounces from wall to wall forever.
+
+        Precondition: count is an int > 0"""
+        made = []
+        for ball in list(self.balls):
+            for k in range(1,count):
+                if len(self.balls) >= self.maxballs:
+                    break
+                angle = 2*math.pi*k/count
+                (cos, sin) = (math.cos(angle), math.sin(angle))
+                vx = ball.vx*cos-ball.vy*sin
+                vy = ball.vx*sin+ball.vy*cos
+                if abs(vy) < SPLIT_MIN_VY:
+                    vy = SPLIT_MIN_VY if vy >= 0 else -SPLIT_MIN_VY
+                new = Body(ball.x,ball.y,ball.width,ball.height,vx,vy)
+                self._addBall(new)
+                made.append(new)
+        if made != []:
+            self.events.append((EVENT_SPLIT,made))
+
+    def checksum(self):
+        """Returns: a 64 bit int summing up the complete state of the game
+
+        Two games have the same checksum when they are in the same state,
+        down to the last bit of every position and the state of rng, so a
+        replayed game can be checked against the game it was recorded from."""
+        digest = hashlib.sha1()
+        digest.update(struct.pack('<iidiiddd',self.state,self.ticks,self.score,
+                                  self.turnsLeft,self.bricks.count,
+                                  getattr(self,'_initPadX',0.0),
+                                  getattr(self,'_initTouchX',0.0),
+                                  self.brickwidth))
+        for body in [self.paddle,self.ball,self.powerup]+self.balls[1:]:
+            if body is None:
+                digest.update(b'-')
+            else:
+                digest.update(struct.pack('<dddddd',body.x,body.y,body.width,body.height,
+                                          getattr(body,'vx',0.0),getattr(body,'vy',0.0)))
+        digest.update(bytes(self.bricks.alive))
+        digest.update(struct.pack('<Q',self.rng.getstate()))
+        return struct.unpack('<Q',digest.digest()[:8])[0]
+
+    # SNAPSHOTS
+
+    def snapshotSize(self):
+        """Returns: the number of bytes in a snapshot of this game
+
+        This is the same for the whole game, as it only depends on the
+        number of bricks and on maxballs."""
+        return SNAPSHOT_HEAD.size+(self.maxballs+1)*SNAPSHOT_BODY.size+len(self.bricks.alive)
+
+    def snapshot(self):
+        """Returns: the complete state of the game, as a string of bytes
+
+        The state can be put back with restore, on this game or on any game
+        made with the same board.  A snapshot of a standard board is a few
+        hundred bytes, and cheap enough to take every tick."""
+        data = bytearray(self.snapshotSize())
+        self.snapshotInto(data)
+        return bytes(data)
+
+    def snapshotInto(self,buffer,offset=0):
+        """Writes a snapshot of the game into buffer, starting at offset
+
+        Nothing is allocated, so this is the cheapest way to take many
+        snapshots (see Rewind).
+
+        Precondition: buffer is a writable buffer (such as a bytearray) with
+        snapshotSize() bytes from offset on; offset is an int >= 0"""
+        paddle = self.paddle if self.paddle != None else Rect(0,0,0,0)
+        SNAPSHOT_HEAD.pack_into(buffer,offset,SNAPSHOT_MAGIC,SNAPSHOT_VERSION,
+                                self.state,self.turnsLeft,self.ticks,self.bricks.count,
+                                self.maxballs,self.score,self.rng.getstate(),
+                                getattr(self,'_initPadX',0.0),getattr(self,'_initTouchX',0.0),
+                                paddle.x,paddle.y,paddle.width,paddle.height)
+        offset += SNAPSHOT_HEAD.size
+        for body in self.balls+[None]*(self.maxballs-len(self.balls))+[self.powerup]:
+            if body is None:
+                SNAPSHOT_BODY.pack_into(buffer,offset,0,0.0,0.0,0.0,0.0,0.0,0.0)
+            else:
+                SNAPSHOT_BODY.pack_into(buffer,offset,1,body.x,body.y,body.width,
+                                        body.height,body.vx,body.vy)
+            offset += SNAPSHOT_BODY.size
+        alive = self.bricks.alive
+        buffer[offset:offset+len(alive)] = alive
+
+    def restore(self,data,offset=0):
+        """Puts the game back in the state saved in a snapshot
+
+        Raises ValueError if data does not hold a snapshot of a game with
+        this board.
+
+        Precondition: data is a string of bytes or a buffer, holding a
+        snapshot (as made by snapshot or snapshotInto) from offset on"""
+        head = SNAPSHOT_HEAD.unpack_from(data,offset)
+        if head[0] != SNAPSHOT_MAGIC or head[1] != SNAPSHOT_VERSION:
+            raise ValueError('data is not a snapshot of version '+str(SNAPSHOT_VERSION))
+        if head[6] != self.maxballs:
+            raise ValueError('snapshot is of a game with a different number of balls')
+        bodies = offset+SNAPSHOT_HEAD.size
+        start = bodies+(self.maxballs+1)*SNAPSHOT_BODY.size
+        alive = bytearray(data[start:start+len(self.bricks.alive)])
+        if len(alive) != len(self.bricks.alive):
+            raise ValueError('snapshot is of a different board')
+        (magic, version, self.state, self.turnsLeft, self.ticks, count, slots, self.score,
+         rng, self._initPadX, self._initTouchX, x, y, width, height) = head
+        self.rng.setstate(rng)
+        self.paddle = None if self.state == STATE_INACTIVE else Rect(x,y,width,height)
+        slots = [self._body(data,bodies+i*SNAPSHOT_BODY.size) for i in range(self.maxballs+1)]
+        self.powerup = slots.pop()
+        self.balls = [ball for ball in slots if ball != None]
+        self._order = list(self.balls)
+        self.bricks.alive[:] = alive
+        self.bricks.count = count
+        self.events = []
+
+    def _body(self,data,offset):
+        """Returns: the Body (or None) saved in a snapshot at offset"""
+        (present, x, y, width, height, vx, vy) = SNAPSHOT_BODY.unpack_from(data,offset)
+        return Body(x,y,width,height,vx,vy) if present else None
+
+    def _addBall(self,ball):
+        """Puts ball in play"""
+        self.balls.append(ball)
+        self._order.append(ball)
+
+    def _dropBall(self,ball):
+        """Takes ball out of play"""
+        self.balls.remove(ball)
+        self._order.remove(ball)
+
+    def _collideBalls(self):
+        """Bounces the balls in play off each other
+
+        This uses sweep and prune along x.  The balls are kept in _order,
+        sorted by their left edge; since they move little in a tick, an
+        insertion sort puts them back in order in about linear time.  Going
+        left to right, each ball is only tested against the balls before it
+        whose right edge it has not passed, so that balls far apart are
+        never compared."""
+        order = self._order
+        for i in range(1,len(order)):
+            ball = order[i]
+            j = i-1
+            while j >= 0 and order[j].x > ball.x:
+                order[j+1] = order[j]
+                j -= 1
+            order[j+1] = ball
+        active = []
+        for ball in order:
+            active = [other for other in active if other.x+other.width >= ball.x]
+            for other in active:
+                if other.y <= ball.y+ball.height and ball.y <= other.y+other.height:
+                    bounceBalls(other,ball)
+            active.append(ball)
+
+    def _removeBrick(self,brick):
+        """Removes brick from play and reports it"""
+        self.bricks.remove(brick)
+        self.events.append((EVENT_BRICK,brick))
+
+    def _checkWin(self):
+        """Ends the game if there are no bricks left"""
+        if self.bricks.count == 0 and self.state != STATE_COMPLETE:
+            self.state = STATE_COMPLETE
+            self.events.append((EVENT_WIN,))
+
+    def _hitsPaddle(self):
+        """Returns: True if the paddle catches the power up
+
+        Checks if the paddle touches the lower left corner of the power up.
+        Removes the power up if it is caught or has fallen off the bottom"""
+        powerup = self.powerup
+        if powerup != None:
+            if self.paddle.collide_point(powerup.x,powerup.y):
+                self.powerup = None
+                return True
+            elif powerup.y<1.0:
+                self.powerup = None
+                self.events.append((EVENT_MISS,))
+        return False
+
+    def _getCollidingObject(self,ball):
+        """Returns the index of the brick ball hits, or None
+
+        Checks paddle for collisions with ball. Then goes through the bricks
+        near the ball and checks for collisions. Changes velocity of ball as
+        appropriate.  Only tests the ball's position at the end of the tick.
+
+        Does not return value if colliding object is paddle"""
+        paddle = self.paddle
+        if paddle.collide_point(ball.x+ball.width,ball.y):
+            self.events.append((EVENT_BOUNCE,))
+            if paddle.collide_point(ball.x+ball.width,ball.y+5):
+                ball.vx = -1 * ball.vx
+            else:
+                self._speedUp(ball)
+        elif paddle.collide_point(ball.x,ball.y):
+            if paddle.collide_point(ball.x,ball.y+5):
+                ball.vx = -1 * ball.vx
+            else:
+                ball.vy = ball.vy * -1
+        else:
+            has = self.bricks.contains
+            for b in self.bricks.near(ball.x,ball.y,ball.width,ball.height):
+                if (has(b,ball.x,ball.y)
+                    or has(b,ball.x,ball.y+ball.height)
+                    or has(b,ball.x+ball.width,ball.y+ball.height)
+                    or has(b,ball.x+ball.width,ball.y)):
+                    if (has(b,ball.x+5,ball.y)
+                        or has(b,ball.x+5,ball.y+ball.height)):
+                        ball.vy = ball.vy * -1
+                    elif (has(b,ball.x,ball.y+5)
+                          or has(b,ball.x+ball.width,ball.y+5)):
+                        ball.vx = ball.vx * -1
+                    return b
+        return None
+
+    def _sweep(self,ball):
+        """Moves ball through one tick and returns the bricks it hits
+
+        Instead of jumping to the end of the tick, the ball travels along
+        its velocity and stops at the earliest impact with the paddle or a
+        brick.  It bounces off that object and continues for the rest of the
+        tick, up to MAX_IMPACTS times.  This keeps a fast ball from passing
+        through bricks.  The walls are still handled by updateBall.
+
+        Returns a (possibly empty) list of brick indices in the order they were hit"""
+        hits = []
+        remaining = 1.0
+        for i in range(MAX_IMPACTS):
+            dx = ball.vx*remaining
+            dy = ball.vy*remaining
+            best = None
+            bestside = None
+            t = 1.0
+            for b in self.bricks.near(min(ball.x,ball.x+dx),min(ball.y,ball.y+dy),
+                                      ball.width+abs(dx),ball.height+abs(dy)):
+                if not b in hits:
+                    impact = timeOfImpact(ball,dx,dy,self.bricks.rect(b))
+                    if impact != None and impact[0] < t:
+                        t, bestside = impact
+                        best = b
+            impact = timeOfImpact(ball,dx,dy,self.paddle)
+            if impact != None and impact[0] < t:
+                t, bestside = impact
+                best = self.paddle
+            if best is None:
+                break
+            ball.x += dx*t
+            ball.y += dy*t
+            remaining *= 1.0-t
+            if best is self.paddle:
+                self.events.append((EVENT_BOUNCE,))
+                if bestside == 'x':
+                    ball.vx = -1 * ball.vx
+                else:
+                    self._speedUp(ball)
+            else:
+                hits.append(best)
+                if bestside == 'x':
+                    ball.vx = -1 * ball.vx
+                else:
+                    ball.vy = -1 * ball.vy
+        ball.x += ball.vx*remaining
+        ball.y += ball.vy*remaining
+        return hits
+
+    def _speedUp(self,ball):
+        """Bounces ball off the top of the paddle, 10% faster than before
+
+        The speed is kept to at most MAX_BALL_SPEED, in the same direction."""
+        ball.vy = ball.vy * -1
+        if ball.vy>0:
+            ball.vy+=ball.vy/10.0
+        else:
+            ball.vy-=ball.vy/10.0
+        ball.vx += ball.vx/10.0
+        speed = math.hypot(ball.vx,ball.vy)
+        if speed > MAX_BALL_SPEED:
+            ball.vx *= MAX_BALL_SPEED/speed
+            ball.vy *= MAX_BALL_SPEED/speed
+
+
+class Rewind(object):
+    """Instance keeps the most recent snapshots of a game, to go back in time.
+
+    The snapshots are packed one after another in a single bytearray used
+    as a ring: once it holds capacity snapshots, each new one takes the
+    place of the oldest.  Taking a snapshot allocates nothing, so one can
+    be taken every tick."""
+    # FIELDS.
+
+    # The game the snapshots are of
+    # Invariant: a Simulation
+    sim = None
+
+    # Largest number of snapshots kept
+    # Invariant: an int > 0
+    capacity = 0
+
+    def __init__(self,sim,capacity):
+        """Constructor: an empty rewind buffer for sim, keeping up to capacity snapshots
+
+        Precondition: sim is a Simulation; capacity is an int > 0"""
+        self.sim = sim
+        self.capacity = capacity
+        self._size = sim.snapshotSize()
+        self._data = bytearray(self._size*capacity)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        """Returns: the number of snapshots kept"""
+        return self._count
+
+    def push(self):
+        """Takes a snapshot of the game"""
+        self.sim.snapshotInto(self._data,self._next*self._size)
+        self._next = (self._next+1) % self.capacity
+        self._count = min(self._count+1,self.capacity)
+
+    def get(self,back=0):
+        """Returns: a copy of a snapshot, back snapshots before the newest
+
+        Precondition: back is an int with 0 <= back < len(self)"""
+        assert 0 <= back < self._count, repr(back)+' is not a kept snapshot'
+        start = ((self._next-1-back) % self.capacity)*self._size
+        return bytes(self._data[start:start+self._size])
+
+    def rewind(self,back=0):
+        """Puts the game back to the snapshot back snapshots before the newest
+
+        The snapshots newer than that one are dropped, so that rewinding
+        again goes further back.
+
+        Precondition: back is an int with 0 <= back < len(self)"""
+        assert 0 <= back < self._count, repr(back)+' is not a kept snapshot'
+        slot = (self._next-1-back) % self.capacity
+        self.sim.restore(self._data,slot*self._size)
+        self._next = (slot+1) % self.capacity
+        self._count -= back
+
+    def clear(self):
+        """Drops all the snapshots"""
+        self._next = 0
+        self._count = 0
+
+
+# FUNCTIONS
+def boardSize(columns,rows):
+    """Returns: (width, height) of the smallest board that fits the given wall
+
+    The board is at least GAME_WIDTH x GAME_HEIGHT.  It is made wider if the
+    bricks would otherwise be narrower than MIN_BRICK_WIDTH, and taller if
+    there would otherwise be less than PLAY_HEIGHT below the wall.
+
+    Precondition: columns and rows are positive ints"""
+    width = max(GAME_WIDTH,columns*(MIN_BRICK_WIDTH+BRICK_SEP_H))
+    height = max(GAME_HEIGHT,BRICK_Y_OFFSET+rows*(BRICK_SEP_V+BRICK_HEIGHT)+PLAY_HEIGHT)
+    return (width,height)
+
+
+def landing(sim,ball):
+    """Returns: (ticks, x) for when and where ball comes down to the paddle, or None
+
+    ticks is the number of ticks until the bottom of ball is level with the
+    top of the paddle, and x is where the center of the ball is then.  The
+    bricks are left out; the ball is taken to fly freely, bouncing off the
+    top and side walls.  Instead of following the bounces one by one, they
+    are unfolded: the ball flies on in a straight line through mirror images
+    of the board, and its position is then folded back into the board.  So
+    the answer takes the same (constant) time however far away it is.
+
+    Returns None if the ball is not moving up or down, or has already passed
+    the paddle.
+
+    Precondition: sim is a Simulation with a paddle; ball is a Body"""
+    line = sim.paddle.y+sim.paddle.height
+    top = sim.height-ball.height
+    if ball.vy < 0.0:
+        ticks = (ball.y-line)/-ball.vy
+    elif ball.vy > 0.0:
+        ticks = ((top-ball.y)+(top-line))/ball.vy
+    else:
+        return None
+    if ticks < 0.0:
+        return None
+    room = sim.width-ball.width
+    x = (ball.x+ball.vx*ticks) % (2*room)
+    if x > room:
+        x = 2*room-x
+    return (ticks,x+ball.width/2.0)
+
+
+def autopilotX(sim,speed=AUTOPILOT_SPEED):
+    """Returns: the x the autopilot moves the paddle of sim to this tick
+
+    The autopilot picks the ball that comes down to the paddle first (see
+    landing), and moves the paddle toward having its center under the
+    point where that ball lands, by at most speed.  The paddle stays where
+    it is if no ball is coming down.  The result is not clamped; pass it to
+    Simulation.movePaddle (or touch_move) to keep the paddle on the board.
+
+    Precondition: sim is a Simulation with a paddle; speed is a number > 0"""
+    paddle = sim.paddle
+    best = None
+    for ball in sim.balls:
+        hit = landing(sim,ball)
+        if hit != None and (best is None or hit[0] < best[0]):
+            best = hit
+    if best is None:
+        return paddle.x
+    step = best[1]-paddle.width/2.0-paddle.x
+    return paddle.x+max(-speed,min(speed,step))
+
+
+def autopilot(sim):
+    """Moves the paddle of sim as the autopilot would (see autopilotX)
+
+    This is a player for sweep.play and other headless games.
+
+    Precondition: sim is a Simulation with a paddle"""
+    sim.movePaddle(autopilotX(sim))
+
+
+def bounceBalls(a,b):
+    """Bounces the balls a and b off each other, if they touch and are closing in
+
+    The balls are treated as circles of the same mass.  The parts of their
+    velocities along the line between their centers are swapped, which is an
+    elastic collision.  Balls that are moving apart are left alone, so that
+    balls that start out on top of each other (after a split) separate.
+
+    Precondition: a and b are Body objects"""
+    dx = (b.x+b.width/2.0)-(a.x+a.width/2.0)
+    dy = (b.y+b.height/2.0)-(a.y+a.height/2.0)
+    reach = (a.width+b.width)/2.0
+    distance = dx*dx+dy*dy
+    if distance == 0.0 or distance > reach*reach:
+        return
+    closing = (a.vx-b.vx)*dx+(a.vy-b.vy)*dy
+    if closing <= 0.0:
+        return
+    p = closing/distance
+    a.vx -= p*dx
+    a.vy -= p*dy
+    b.vx += p*dx
+    b.vy += p*dy
+
+
+def timeOfImpact(ball,dx,dy,box):
+    """Returns: (t, side) for the first contact of the moving ball with box
+
+    The ball is treated as its bounding rectangle, moving by (dx,dy) over the
+    interval t in [0,1].  The value t is the fraction of that motion before
+    the ball touches box, and side is 'x' if it hits a left or right edge and
+    'y' if it hits a top or bottom edge.  Returns None if there is no contact
+    in that interval, or if the ball already overlaps box at the start.
+
+    Precondition: ball and box are rectangles (with x, y, width, height,
+    right and top), and dx and dy are numbers"""
+    entry = -1.0
+    exit = 2.0
+    side = None
+    for (pos,size,d,lo,hi,name) in ((ball.x,ball.width,dx,box.x,box.right,'x'),
+                                    (ball.y,ball.height,dy,box.y,box.top,'y')):
+        # Slab of positions where the ball overlaps box along this axis
+        lo = lo-size
+        if d == 0:
+            if pos <= lo or pos >= hi:
+                return None
+        else:
+            t0 = (lo-pos)/float(d)
+            t1 = (hi-pos)/float(d)
+            if t0 > t1:
+                t0, t1 = t1, t0
+            if t0 > entry:
+                entry = t0
+                side = name
+            exit = min(exit,t1)
+    if side is None or entry < 0.0 or entry > 1.0 or entry >= exit:
+        return None
+    return (entry,side)
@@ -0,0 +1,113 @@
+# startup.py
+# Timing of the imports and set up work done before the first frame
+
+"""Startup trace module for Breakout
+
+This module times the phases of starting the game: importing the modules,
+compiling the Kivy rules, starting the mixer, loading sounds and images,
+and so on up to the first rendered frame.  Each phase is wrapped in a
+`phase` block.  When the trace is on, the time of every phase is printed
+once the first frame is drawn, with nested phases indented under the phase
+they happen in:
+
+    startup trace (ms since start)
+         210.4    210.4  import kivy
+         402.9    192.5  import controller
+         ...
+         811.0           first frame
+
+The first column is when the phase ended, the second how long it took.
+The trace is on if the environment variable BREAKOUT_TRACE is set (to
+anything but the empty string) or if `enable` is called; when it is off,
+a phase costs almost nothing.  Import this module before anything else so
+that its clock starts as early as possible."""
+import os
+import sys
+import time
+
+# Time this module was imported; all times are measured from here
+_start = time.time()
+
+# Whether the trace is on.  See enable
+enabled = bool(os.environ.get('BREAKOUT_TRACE'))
+
+# Phases recorded so far, in the order they started
+# Invariant: list of [depth, name, end, elapsed] lists; end and elapsed are
+# None while the phase is running, and elapsed is None for a mark
+_records = []
+
+# Number of phases currently running
+_depth = 0
+
+# Whether report has printed the trace
+_reported = False
+
+
+def enable(on=True):
+    """Turns the trace on (or off, if on is False)
+
+    Precondition: on is a bool"""
+    global enabled
+    enabled = on
+
+
+class phase(object):
+    """A block of start up work to time, used in a with statement:
+
+        with startup.phase('kv rules'):
+            Builder.load_file(...)
+
+    Phases may be nested.  Nothing is recorded when the trace is off."""
+
+    def __init__(self,name):
+        """Constructor: a phase with the given name
+
+        Precondition: name is a string"""
+        self._name = name
+        self._record = None
+        self._began = 0.0
+
+    def __enter__(self):
+        global _depth
+        if enabled:
+            self._record = [_depth,self._name,None,None]
+            _records.append(self._record)
+            _depth += 1
+            self._began = time.time()
+        return self
+
+    def __exit__(self,kind,value,traceback):
+        global _depth
+        if not self._record is None:
+            now = time.time()
+            _depth -= 1
+            self._record[2] = now-_start
+            self._record[3] = now-self._began
+        return False
+
+
+def mark(name):
+    """Records that the moment name has been reached, such as the first frame
+
+    Precondition: name is a string"""
+    if enabled:
+        _records.append([_depth,name,time.time()-_start,None])
+
+
+def report(stream=None):
+    """Prints the trace to stream (standard error if None), the first time only
+
+    Does nothing if the trace is off or has already been printed.
+
+    Precondition: stream is None or a file-like object"""
+    global _reported
+    if not enabled or _reported:
+        return
+    _reported = True
+    out = sys.stderr if stream is None else stream
+    out.write('startup trace (ms since start)\n')
+    for (depth,name,end,elapsed) in _records:
+        endtext = '' if end is None else '%9.1f' % (end*1000)
+        spent = '' if elapsed is None else '%8.1f' % (elapsed*1000)
+        out.write('%9s %8s  %s%s\n' % (endtext,spent,'  '*depth,name))
+    out.flush()
@@ -0,0 +1,237 @@
+"""Batch runner for Breakout
+
+This module plays many seeded games of Breakout without a window, spread
+across a pool of worker processes, and writes one line per game to a CSV
+results file.  Each game is a Simulation (module simulation) played by a
+computer player: by default one that keeps the paddle under the ball, or
+with --player autopilot, simulation.autopilot, which moves the paddle to
+where the ball will come down.
+
+The board settings are given as comma separated lists, and every
+combination of them is played once for each seed:
+
+    python sweep.py --columns 5,10,20 --rows 10 --paddle 40,58 --seeds 0:500 results.csv
+
+Each line of the results file records the settings, the seed, and the
+score, frames, bricks left, balls lost and outcome of that game.  Lines are written as
+soon as each game finishes.  When the results file already exists, games it
+already has a line for are skipped, so an interrupted sweep can simply be
+run again.
+
+A soak test of the autopilot plays long games and checks that no ball is
+ever lost; the sweep ends with the balls lost over the whole results file:
+
+    python sweep.py soak.csv --player autopilot --turns 1000 --seeds 0:40"""
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os.path
+import sys
+
+import simulation
+
+# Columns of the results file, in order
+FIELDS = ['columns','rows','paddlewidth','balldiameter','turns','seed',
+          'score','frames','bricks','lost','result']
+
+# Columns that identify a game
+KEY_FIELDS = FIELDS[:6]
+
+# Longest game played before it is cut short, in ticks
+MAX_FRAMES = 200000
+
+
+def track(sim):
+    """Moves the paddle of sim so that it is centered under the ball
+
+    Precondition: sim is a Simulation"""
+    if sim.ball != None:
+        sim.movePaddle(sim.ball.x+sim.ball.width/2.0-sim.paddle.width/2.0)
+
+
+# Computer players, by the name given with --player
+PLAYERS = {'track': track, 'autopilot': simulation.autopilot}
+
+
+def play(settings,player=track,maxframes=MAX_FRAMES):
+    """Returns: dictionary with the results of one game, keyed by FIELDS
+
+    The game is played until it is over or maxframes ticks have passed.
+    The result is 'win', 'loss' or 'timeout'.
+
+    Precondition: settings is a dictionary with the keys in KEY_FIELDS;
+    player is a function taking a Simulation; maxframes is a positive int"""
+    sim = simulation.Simulation(columns=settings['columns'],rows=settings['rows'],
+                                paddlewidth=settings['paddlewidth'],
+                                balldiameter=settings['balldiameter'],
+                                turns=settings['turns'],seed=settings['seed'])
+    sim.touch_down(0)
+    frames = 0
+    while sim.state != simulation.STATE_COMPLETE and frames < maxframes:
+        if sim.state == simulation.STATE_PAUSED:
+            sim.touch_down(0)
+        player(sim)
+        sim.update()
+        frames += 1
+    if sim.state != simulation.STATE_COMPLETE:
+        result = 'timeout'
+    elif len(sim.bricks) == 0:
+        result = 'win'
+    else:
+        result = 'loss'
+    row = dict(settings)
+    row.update(score=sim.score,frames=frames,bricks=len(sim.bricks),
+               lost=sim.turns-sim.turnsLeft,result=result)
+    return row
+
+
+def _key(settings):
+    """Returns: tuple identifying the game with the given settings
+
+    Values are compared as strings, so that keys read back from the results
+    file match the keys of new games."""
+    return tuple(str(settings[k]) for k in KEY_FIELDS)
+
+
+def games(grid,seeds):
+    """Yields: settings dictionary for every combination in grid and seed
+
+    Precondition: grid is a list of (name, values) pairs whose names are the
+    first five KEY_FIELDS; seeds is an iterable of ints"""
+    names = [name for (name,values) in grid]
+    for combo in itertools.product(*[values for (name,values) in grid]):
+        for seed in seeds:
+            settings = dict(zip(names,combo))
+            settings['seed'] = seed
+            yield settings
+
+
+def finished(filename):
+    """Returns: set of keys of the games already in the results file
+
+    Raises ValueError if the file has other columns than FIELDS.
+
+    Precondition: filename is a string; the file does not need to exist"""
+    return set(_key(row) for row in results(filename))
+
+
+def results(filename):
+    """Returns: list of the rows (dictionaries of strings) in the results file
+
+    Raises ValueError if the file has other columns than FIELDS.
+
+    Precondition: filename is a string; the file does not need to exist"""
+    if not os.path.exists(filename) or os.path.getsize(filename) == 0:
+        return []
+    with _csvFile(filename,'r') as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames != FIELDS:
+            raise ValueError(filename+' has other columns than '+','.join(FIELDS))
+        return list(reader)
+
+
+def run(grid,seeds,filename,workers=None,maxframes=MAX_FRAMES,player='track'):
+    """Plays every game in grid x seeds not already in filename, appending the results
+
+    Returns the number of games played.
+
+    Precondition: grid and seeds are as in games; filename is a string;
+    workers is None (one per CPU) or a positive int; maxframes is a positive
+    int; player is a key of PLAYERS"""
+    done = finished(filename)
+    todo = [s for s in games(grid,seeds) if not _key(s) in done]
+    if todo == []:
+        return 0
+
+    header = not os.path.exists(filename) or os.path.getsize(filename) == 0
+    pool = multiprocessing.Pool(workers)
+    try:
+        with _csvFile(filename,'a') as f:
+            writer = csv.DictWriter(f,FIELDS)
+            if header:
+                writer.writeheader()
+            jobs = pool.imap_unordered(_play,[(s,maxframes,player) for s in todo],chunksize=4)
+            for row in jobs:
+                writer.writerow(row)
+                f.flush()
+    except:
+        # Stop the workers at once, without waiting for the games left
+        pool.terminate()
+        pool.join()
+        raise
+    pool.close()
+    pool.join()
+    return len(todo)
+
+
+def _csvFile(filename,mode):
+    """Returns: the file filename opened in mode ('r' or 'a') for the csv module
+
+    The csv module handles line endings itself, so it needs a binary file
+    in Python 2, and a text file without newline translation in Python 3."""
+    if sys.version_info[0] < 3:
+        return open(filename,mode+'b')
+    return open(filename,mode,newline='')
+
+
+def _play(job):
+    """Plays one (settings, maxframes, player name) job in a worker process"""
+    return play(job[0],player=PLAYERS[job[2]],maxframes=job[1])
+
+
+def _numbers(text,kind=int):
+    """Returns: list of numbers in a comma separated string"""
+    return [kind(x) for x in text.split(',')]
+
+
+def _seeds(text):
+    """Returns: list of seeds in a string 'a:b' (a to b-1) or 'a,b,c'"""
+    if ':' in text:
+        start, stop = text.split(':')
+        return range(int(start),int(stop))
+    return _numbers(text)
+
+
+def main(args):
+    """Runs the sweep described by the command line arguments args
+
+    Precondition: args is a list of strings (without the program name)"""
+    parser = argparse.ArgumentParser(description='Play many seeded games of Breakout.')
+    parser.add_argument('output',help='CSV file to append results to')
+    parser.add_argument('--columns',default=str(simulation.BRICKS_IN_ROW),
+                        help='bricks per row (comma separated)')
+    parser.add_argument('--rows',default=str(simulation.BRICK_ROWS),
+                        help='rows of bricks (comma separated)')
+    parser.add_argument('--paddle',default=str(simulation.PADDLE_WIDTH),
+                        help='paddle widths (comma separated)')
+    parser.add_argument('--ball',default=str(simulation.BALL_DIAMETER),
+                        help='ball diameters (comma separated)')
+    parser.add_argument('--turns',default=str(simulation.NUMBER_TURNS),
+                        help='turns per game (comma separated)')
+    parser.add_argument('--seeds',default='0:100',
+                        help="seeds as 'first:stop' or a comma separated list")
+    parser.add_argument('--workers',type=int,default=None,
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--max-frames',type=int,default=MAX_FRAMES,
+                        help='longest game in ticks')
+    parser.add_argument('--player',default='track',choices=sorted(PLAYERS),
+                        help='computer player')
+    options = parser.parse_args(args)
+
+    grid = [('columns',_numbers(options.columns)),
+            ('rows',_numbers(options.rows)),
+            ('paddlewidth',_numbers(options.paddle,float)),
+            ('balldiameter',_numbers(options.ball,float)),
+            ('turns',_numbers(options.turns))]
+    count = run(grid,_seeds(options.seeds),options.output,
+                options.workers,options.max_frames,options.player)
+    rows = results(options.output)
+    print('played %d games; %d in %s, %d won, %d balls lost' %
+          (count,len(rows),options.output,sum(r['result'] == 'win' for r in rows),
+           sum(int(r['lost']) for r in rows)))
+
+
+# Application code
+if __name__ == '__main__':
+    main(sys.argv[1:])